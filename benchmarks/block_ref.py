@@ -15,6 +15,7 @@ from chia.consensus.blockchain import Blockchain
 from chia.consensus.default_constants import DEFAULT_CONSTANTS
 from chia.full_node.block_store import BlockStore
 from chia.full_node.coin_store import CoinStore
+from chia.full_node.generator_cache import DEFAULT_GENERATOR_CACHE_SIZE, GeneratorCache
 from chia.types.blockchain_format.serialized_program import SerializedProgram
 from chia.types.blockchain_format.sized_bytes import bytes32
 from chia.util.db_version import lookup_db_version
@@ -39,14 +40,18 @@ class BlockInfo:
     transactions_generator_ref_list: List[uint32]
 
 
-def random_refs() -> List[uint32]:
-    ret = random.sample(transaction_block_heights, DEFAULT_CONSTANTS.MAX_GENERATOR_REF_LIST_SIZE)
+def random_refs(heights: List[int] = transaction_block_heights) -> List[uint32]:
+    ret = random.sample(heights, min(len(heights), DEFAULT_CONSTANTS.MAX_GENERATOR_REF_LIST_SIZE))
     random.shuffle(ret)
     return [uint32(i) for i in ret]
 
 
 REPETITIONS = 100
 
+# during sync, most references are to a small number of popular blocks
+NUM_POPULAR_REFS = 50
+REFS_PER_BLOCK = 10
+
 
 async def main(db_path: Path) -> None:
     random.seed(0x213FB154)
@@ -85,6 +90,43 @@ async def main(db_path: Path) -> None:
             assert gen is not None
 
         print(f"get_block_generator(): {timing/REPETITIONS:0.3f}s")
+        cache = block_store.generator_cache
+        print(f"  generator lookups: {cache.hits + cache.misses} cache hits: {cache.hits}")
+
+        # blocks referencing a few popular generators, as during sync. First
+        # without the generator cache, then with it, and with prefetching
+        popular = random.sample(transaction_block_heights, NUM_POPULAR_REFS)
+        blocks = [
+            BlockInfo(
+                peak.header_hash,
+                SerializedProgram.from_bytes(bytes.fromhex("80")),
+                random_refs(popular)[:REFS_PER_BLOCK],
+            )
+            for _ in range(REPETITIONS)
+        ]
+        num_refs = sum(len(b.transactions_generator_ref_list) for b in blocks)
+
+        for name, cache_size, prefetch in [
+            ("no cache", 0, False),
+            ("cache", DEFAULT_GENERATOR_CACHE_SIZE, False),
+            ("cache + prefetch", DEFAULT_GENERATOR_CACHE_SIZE, True),
+        ]:
+            cache = GeneratorCache(cache_size)
+            block_store.generator_cache = cache
+            start_time = monotonic()
+            prefetched = 0
+            if prefetch:
+                prefetched = await block_store.prefetch_generators(
+                    {h for b in blocks for h in b.transactions_generator_ref_list}
+                )
+            for block in blocks:
+                gen = await blockchain.get_block_generator(block)
+                assert gen is not None
+            timing = monotonic() - start_time
+            print(
+                f"popular refs, {name}: {timing/REPETITIONS:0.3f}s per block, {num_refs} references, "
+                f"{cache.misses} looked up one at a time, {prefetched} prefetched"
+            )
 
         blockchain.shut_down()
 
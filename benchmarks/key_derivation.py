@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures.process import ProcessPoolExecutor
+from time import monotonic
+from typing import List, Tuple
+
+import click
+from chia_rs import AugSchemeMPL, PrivateKey
+
+from chia.types.blockchain_format.sized_bytes import bytes32
+from chia.util.misc import available_logical_cores
+from chia.wallet.derive_keys import (
+    _derive_path,
+    _derive_path_unhardened,
+    derive_wallet_keys,
+    master_sk_to_wallet_sk_intermediate,
+    master_sk_to_wallet_sk_unhardened_intermediate,
+)
+from chia.wallet.puzzles.p2_delegated_puzzle_or_hidden_puzzle import puzzle_hash_for_pk
+from chia.wallet.wallet_state_manager import DERIVATION_POOL_BATCH_SIZE
+
+# to run this benchmark:
+# python -m benchmarks.key_derivation --count 10000 --count 100000 --wallets 5
+
+# The per-index loop is slow, it's only run for up to this many indices and
+# extrapolated from there
+PER_INDEX_LIMIT = 2000
+
+
+def derive_per_index(sk: PrivateKey, sk_unhardened: PrivateKey, count: int) -> List[Tuple[bytes32, bytes32]]:
+    # this is how WalletStateManager.create_more_puzzle_hashes() used to derive
+    # keys, for each wallet
+    return [
+        (
+            puzzle_hash_for_pk(_derive_path(sk, [index]).get_g1()),
+            puzzle_hash_for_pk(_derive_path_unhardened(sk_unhardened, [index]).get_g1()),
+        )
+        for index in range(count)
+    ]
+
+
+async def derive_in_pool(intermediate_sk: bytes, intermediate_pk_unhardened: bytes, count: int, workers: int) -> int:
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        batches = await asyncio.gather(
+            *(
+                loop.run_in_executor(
+                    pool,
+                    derive_wallet_keys,
+                    intermediate_sk,
+                    intermediate_pk_unhardened,
+                    start,
+                    min(start + DERIVATION_POOL_BATCH_SIZE, count),
+                )
+                for start in range(0, count, DERIVATION_POOL_BATCH_SIZE)
+            )
+        )
+    return sum(len(batch) for batch in batches)
+
+
+async def run(counts: List[int], workers: int, wallets: int) -> None:
+    master_sk = AugSchemeMPL.key_gen(b"1" * 32)
+    intermediate_sk = master_sk_to_wallet_sk_intermediate(master_sk)
+    intermediate_sk_unhardened = master_sk_to_wallet_sk_unhardened_intermediate(master_sk)
+    intermediate_pk_unhardened = intermediate_sk_unhardened.get_g1()
+
+    for count in counts:
+        print(f"deriving {count} indices (hardened and unhardened) for {wallets} wallets")
+
+        per_index = min(count, PER_INDEX_LIMIT)
+        start = monotonic()
+        derive_per_index(intermediate_sk, intermediate_sk_unhardened, per_index)
+        # the keys used to be derived again for every wallet
+        duration = (monotonic() - start) * count / per_index * wallets
+        print(f"  one index at a time:       {duration:0.2f}s{' (extrapolated)' if per_index < count else ''}")
+
+        start = monotonic()
+        derive_wallet_keys(bytes(intermediate_sk), bytes(intermediate_pk_unhardened), 0, count)
+        print(f"  derive_wallet_keys():      {monotonic() - start:0.2f}s")
+
+        start = monotonic()
+        derived = await derive_in_pool(bytes(intermediate_sk), bytes(intermediate_pk_unhardened), count, workers)
+        assert derived == count
+        print(f"  {workers} worker processes:     {monotonic() - start:0.2f}s")
+
+
+@click.command()
+@click.option("--count", "-c", multiple=True, type=int, default=[10000, 100000], help="number of indices to derive")
+@click.option("--wallets", type=int, default=1, help="number of wallets requiring derivation paths")
+@click.option("--workers", "-w", type=int, default=max(available_logical_cores() - 1, 1), help="worker processes")
+def entry_point(count: List[int], wallets: int, workers: int) -> None:
+    asyncio.run(run(list(count), workers, wallets))
+
+
+if __name__ == "__main__":
+    # pylint: disable = no-value-for-parameter
+    entry_point()
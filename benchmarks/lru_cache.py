@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import types
+from collections import OrderedDict
+from time import perf_counter
+from typing import Callable, Dict, Generic, List, Optional, Tuple, TypeVar, Union
+
+import click
+
+from chia.util.lru_cache import LRUCache, MeteredLRUCache
+
+# to run this benchmark:
+# python -m benchmarks.lru_cache --capacity 1000
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+class PlainLRUCache(Generic[K, V]):
+    # the LRUCache before it had weights, expiry and counters, for comparison
+    def __init__(self, capacity: int):
+        self.cache: OrderedDict[K, V] = OrderedDict()
+        self.capacity = capacity
+
+    def get(self, key: K) -> Optional[V]:
+        if key not in self.cache:
+            return None
+        else:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+
+    def put(self, key: K, value: V) -> None:
+        self.cache[key] = value
+        self.cache.move_to_end(key)
+        if len(self.cache) > self.capacity:
+            self.cache.popitem(last=False)
+
+    def clear(self) -> None:
+        self.cache.clear()
+
+
+Cache = Union[PlainLRUCache[int, int], LRUCache[int, int]]
+
+
+def own_copy(f: Callable[[Cache, List[int]], float]) -> Callable[[Cache, List[int]], float]:
+    # the interpreter specializes cache.get() and cache.put() to the type of the first cache that calls them. Every
+    # cache times them with its own copy of the code, as a caller that only ever uses one cache would
+    return types.FunctionType(f.__code__.replace(), f.__globals__)
+
+
+def time_per_get(cache: Cache, keys: List[int]) -> float:
+    start = perf_counter()
+    for key in keys:
+        cache.get(key)
+    return (perf_counter() - start) / len(keys) * 1e9
+
+
+def time_per_put(cache: Cache, keys: List[int]) -> float:
+    start = perf_counter()
+    for key in keys:
+        cache.put(key, key)
+    return (perf_counter() - start) / len(keys) * 1e9
+
+
+def run(capacity: int, rounds: int) -> None:
+    hits = list(range(capacity)) * 20
+    misses = list(range(capacity, 2 * capacity)) * 20
+    caches: List[Tuple[str, Cache]] = [
+        ("plain", PlainLRUCache(capacity)),
+        ("LRUCache", LRUCache(capacity)),
+        ("MeteredLRUCache", MeteredLRUCache(capacity)),
+        ("MeteredLRUCache(ttl)", MeteredLRUCache(capacity, ttl=3600)),
+    ]
+    # the caches take turns in every round, so a noisy machine slows them all down alike
+    timings = ["get() hit", "get() miss", "put() replace", "put() new"]
+    best: Dict[str, List[float]] = {name: [float("inf")] * len(timings) for name, _ in caches}
+    timers = {name: (own_copy(time_per_get), own_copy(time_per_put)) for name, _ in caches}
+    for r in range(rounds):
+        for name, cache in caches:
+            get, put = timers[name]
+            cache.clear()
+            for key in range(capacity):
+                cache.put(key, key)
+            # every new key evicts the least recently used one
+            new_keys = list(range((r + 2) * capacity, (r + 3) * capacity))
+            for i, timing in enumerate(
+                [
+                    get(cache, hits),
+                    get(cache, misses),
+                    put(cache, hits),
+                    put(cache, new_keys),
+                ]
+            ):
+                best[name][i] = min(best[name][i], timing)
+    for name, times in best.items():
+        print(f"{name:20} " + "  ".join(f"{timing}: {t:6.1f}ns" for timing, t in zip(timings, times)))
+
+
+@click.command()
+@click.option("--capacity", "-c", type=int, default=1000, help="number of entries in the cache")
+@click.option("--rounds", "-r", type=int, default=200, help="the fastest of this many rounds is reported")
+def entry_point(capacity: int, rounds: int) -> None:
+    run(capacity, rounds)
+
+
+if __name__ == "__main__":
+    # pylint: disable = no-value-for-parameter
+    entry_point()
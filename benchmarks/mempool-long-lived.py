@@ -14,7 +14,7 @@ from chia.types.blockchain_format.coin import Coin
 from chia.types.blockchain_format.program import Program
 from chia.types.blockchain_format.sized_bytes import bytes32
 from chia.types.coin_record import CoinRecord
-from chia.types.coin_spend import CoinSpend
+from chia.types.coin_spend import make_spend
 from chia.types.condition_opcodes import ConditionOpcode
 from chia.types.spend_bundle import SpendBundle
 from chia.util.ints import uint32, uint64
@@ -22,6 +22,9 @@ from chia.util.ints import uint32, uint64
 # this is one week worth of blocks
 NUM_ITERS = 32256
 
+# the number of items in the mempool when measuring reorgs
+NUM_REORG_ITEMS = 10000
+
 
 def make_hash(height: int) -> bytes32:
     return bytes32(height.to_bytes(32, byteorder="big"))
@@ -62,7 +65,7 @@ def make_spend_bundle(coin: Coin, height: int) -> SpendBundle:
             int_to_bytes(coin.amount // 2 - height * 10),
         ],
     ]
-    spend = CoinSpend(coin, IDENTITY_PUZZLE, Program.to(conditions))
+    spend = make_spend(coin, IDENTITY_PUZZLE, Program.to(conditions))
     return SpendBundle([spend], G2Element())
 
 
@@ -131,6 +134,54 @@ async def run_mempool_benchmark() -> None:
     print(f"  per block: {(stop - start) / height * 1000:0.2f}ms")
 
 
+async def run_mempool_reorg_benchmark() -> None:
+    coin_records: Dict[bytes32, CoinRecord] = {}
+
+    async def get_coin_record(coin_ids: Collection[bytes32]) -> List[CoinRecord]:
+        ret: List[CoinRecord] = []
+        for name in coin_ids:
+            r = coin_records.get(name)
+            if r is not None:
+                ret.append(r)
+        return ret
+
+    timestamp = uint64(1631794488)
+    height = uint32(100)
+
+    mempool = MempoolManager(get_coin_record, DEFAULT_CONSTANTS, single_threaded=True)
+    await mempool.new_peak(fake_block_record(height, timestamp), None)
+
+    print(f"\nfilling the mempool with {NUM_REORG_ITEMS} items")
+    coins: List[Coin] = []
+    for i in range(NUM_REORG_ITEMS):
+        coin = Coin(make_hash(i), IDENTITY_PUZZLE_HASH, uint64(10000000 + i * 100))
+        coin_records[coin.name()] = CoinRecord(coin, uint32(1), uint32(0), False, uint64(timestamp // 2))
+        coins.append(coin)
+        sb = make_spend_bundle(coin, 1)
+        spend_bundle_id = sb.name()
+        npc = await mempool.pre_validate_spendbundle(sb, None, spend_bundle_id)
+        await mempool.add_spend_bundle(sb, npc, spend_bundle_id, height)
+    assert mempool.mempool.size() == NUM_REORG_ITEMS
+
+    print("\nrunning new_peak() with a reorg")
+    blocks = 0
+    start = monotonic()
+    for i in range(10):
+        # every reorg spends 1% of the coins in the mempool
+        for coin in coins[i * 100 : (i + 1) * 100]:
+            coin_records[coin.name()] = CoinRecord(coin, uint32(1), height, False, uint64(timestamp // 2))
+        # the new peak is not a child of the current one
+        height = uint32(height + 2)
+        timestamp = uint64(timestamp + 38)
+        await mempool.new_peak(fake_block_record(height, timestamp), None)
+        blocks += 1
+    stop = monotonic()
+
+    print(f"  mempool size: {mempool.mempool.size()}")
+    print(f"  time: {stop - start:0.4f}s")
+    print(f"  per reorg: {(stop - start) / blocks * 1000:0.2f}ms")
+
+
 if __name__ == "__main__":
     import logging
 
@@ -138,3 +189,4 @@ if __name__ == "__main__":
     logger.addHandler(logging.StreamHandler())
     logger.setLevel(logging.WARNING)
     asyncio.run(run_mempool_benchmark())
+    asyncio.run(run_mempool_reorg_benchmark())
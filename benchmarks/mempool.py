@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import asyncio
 import cProfile
+import random
 from contextlib import contextmanager
 from dataclasses import dataclass
 from subprocess import check_call
@@ -10,19 +11,27 @@ from typing import Collection, Dict, Iterator, List, Optional, Tuple
 
 from chia.consensus.coinbase import create_farmer_coin, create_pool_coin
 from chia.consensus.default_constants import DEFAULT_CONSTANTS
+from chia.full_node.bitcoin_fee_estimator import create_bitcoin_fee_estimator
+from chia.full_node.fee_estimation import MempoolInfo
+from chia.full_node.mempool import MEMPOOL_ENGINES
 from chia.full_node.mempool_manager import MempoolManager
 from chia.simulator.wallet_tools import WalletTool
 from chia.types.blockchain_format.coin import Coin
 from chia.types.blockchain_format.sized_bytes import bytes32
+from chia.types.clvm_cost import CLVMCost
 from chia.types.coin_record import CoinRecord
 from chia.types.eligible_coin_spends import UnspentLineageInfo
+from chia.types.fee_rate import FeeRate
 from chia.types.mempool_inclusion_status import MempoolInclusionStatus
+from chia.types.mempool_item import MempoolItem
 from chia.types.spend_bundle import SpendBundle
 from chia.util.ints import uint32, uint64
 from chia.util.misc import to_batches
+from tests.core.mempool.test_mempool_manager import mk_item
 
 NUM_ITERS = 200
 NUM_PEERS = 5
+NUM_ENGINE_ITEMS = 10000
 
 
 @contextmanager
@@ -166,6 +175,34 @@ async def run_mempool_benchmark() -> None:
         else:
             print("\n== Multi-threaded")
 
+        suffix = "st" if single_threaded else "mt"
+
+        # the full node validates up to 200 transactions concurrently
+        for batch_size in [1, 20]:
+            print(f"\nProfiling pre_validate_spendbundle() with batch size {batch_size}")
+            mempool = MempoolManager(
+                get_coin_records,
+                DEFAULT_CONSTANTS,
+                single_threaded=single_threaded,
+                validation_batch_size=batch_size,
+                validation_batch_latency=0.005,
+            )
+            await mempool.new_peak(fake_block_record(start_height, timestamp), None)
+            semaphore = asyncio.Semaphore(200)
+
+            async def pre_validate(tx: SpendBundle) -> None:
+                async with semaphore:
+                    await mempool.pre_validate_spendbundle(tx, None, tx.name())
+
+            all_bundles = [tx for bundles in spend_bundles for tx in bundles]
+            with enable_profiler(True, f"pre-validate-{batch_size}-{suffix}"):
+                start = monotonic()
+                await asyncio.gather(*(pre_validate(tx) for tx in all_bundles))
+                stop = monotonic()
+            mempool.shut_down()
+            print(f"  time: {stop - start:0.4f}s")
+            print(f"  admitted: {len(all_bundles) / (stop - start):0.0f} tx/s")
+
         mempool = MempoolManager(get_coin_records, DEFAULT_CONSTANTS, single_threaded=single_threaded)
 
         height = start_height
@@ -181,8 +218,6 @@ async def run_mempool_benchmark() -> None:
                 assert status == MempoolInclusionStatus.SUCCESS
                 assert error is None
 
-        suffix = "st" if single_threaded else "mt"
-
         print("\nProfiling add_spend_bundle() with large bundles")
         total_bundles = 0
         tasks = []
@@ -195,6 +230,7 @@ async def run_mempool_benchmark() -> None:
             stop = monotonic()
         print(f"  time: {stop - start:0.4f}s")
         print(f"  per call: {(stop - start) / total_bundles * 1000:0.2f}ms")
+        print(f"  admitted: {total_bundles / (stop - start):0.0f} tx/s")
 
         mempool = MempoolManager(get_coin_records, DEFAULT_CONSTANTS, single_threaded=single_threaded)
 
@@ -214,6 +250,7 @@ async def run_mempool_benchmark() -> None:
             stop = monotonic()
         print(f"  time: {stop - start:0.4f}s")
         print(f"  per call: {(stop - start) / total_bundles * 1000:0.2f}ms")
+        print(f"  admitted: {total_bundles / (stop - start):0.0f} tx/s")
 
         print("\nProfiling add_spend_bundle() with replace-by-fee")
         total_bundles = 0
@@ -227,6 +264,7 @@ async def run_mempool_benchmark() -> None:
             stop = monotonic()
         print(f"  time: {stop - start:0.4f}s")
         print(f"  per call: {(stop - start) / total_bundles * 1000:0.2f}ms")
+        print(f"  admitted: {total_bundles / (stop - start):0.0f} tx/s")
 
         print("\nProfiling create_bundle_from_mempool()")
         with enable_profiler(True, f"create-{suffix}"):
@@ -273,6 +311,69 @@ async def run_mempool_benchmark() -> None:
         print(f"  per call: {(stop - start) / len(blocks) * 1000:0.2f}ms")
 
 
+async def run_mempool_engine_benchmark() -> None:
+    """
+    Compares the mempool engines on their own, without validating any CLVM,
+    using items with synthetic costs and fees
+    """
+
+    def always(_: bytes32) -> bool:
+        return True
+
+    async def get_unspent_lineage_info_for_puzzle_hash(_: bytes32) -> Optional[UnspentLineageInfo]:
+        assert False
+
+    rng = random.Random(1337)
+    items: List[MempoolItem] = []
+    for i in range(NUM_ENGINE_ITEMS):
+        coin = Coin(make_hash(i), make_hash(i), uint64(2000000000))
+        cost = rng.randint(1_000_000, 20_000_000)
+        items.append(mk_item([coin], cost=cost, fee=int(cost * rng.uniform(1.0, 100.0))))
+
+    # these pay increasingly higher fee rates, so each of them will evict
+    # items from a full mempool
+    evicting_items: List[MempoolItem] = []
+    for i in range(NUM_ENGINE_ITEMS):
+        coin = Coin(make_hash(NUM_ENGINE_ITEMS + i), make_hash(i), uint64(2000000000))
+        evicting_items.append(mk_item([coin], cost=10_000_000, fee=1_000_000_000 + i * 1000))
+
+    max_block_cost = int(DEFAULT_CONSTANTS.MAX_BLOCK_COST_CLVM * 0.6)
+    large_info = MempoolInfo(
+        CLVMCost(uint64(sum(i.cost for i in items))), FeeRate(uint64(5)), CLVMCost(uint64(max_block_cost))
+    )
+    # only has space for about half the items
+    small_info = MempoolInfo(
+        CLVMCost(uint64(large_info.max_size_in_cost // 2)), FeeRate(uint64(5)), CLVMCost(uint64(max_block_cost))
+    )
+
+    for engine, mempool_class in MEMPOOL_ENGINES.items():
+        print(f"\n== {engine} engine")
+
+        mempool = mempool_class(large_info, create_bitcoin_fee_estimator(uint64(max_block_cost)))
+        start = monotonic()
+        for item in items:
+            mempool.add_to_pool(item)
+        stop = monotonic()
+        print(f"  add_to_pool(): {NUM_ENGINE_ITEMS / (stop - start):0.0f} items/s")
+
+        start = monotonic()
+        for _ in range(20):
+            await mempool.create_bundle_from_mempool_items(
+                always, get_unspent_lineage_info_for_puzzle_hash, DEFAULT_CONSTANTS, uint32(1)
+            )
+        stop = monotonic()
+        print(f"  create_bundle_from_mempool_items(): {20 / (stop - start):0.2f} blocks/s")
+
+        mempool = mempool_class(small_info, create_bitcoin_fee_estimator(uint64(max_block_cost)))
+        for item in items:
+            mempool.add_to_pool(item)
+        start = monotonic()
+        for item in evicting_items:
+            mempool.add_to_pool(item)
+        stop = monotonic()
+        print(f"  add_to_pool() with eviction: {NUM_ENGINE_ITEMS / (stop - start):0.0f} items/s")
+
+
 if __name__ == "__main__":
     import logging
 
@@ -280,3 +381,4 @@ if __name__ == "__main__":
     logger.addHandler(logging.StreamHandler())
     logger.setLevel(logging.WARNING)
     asyncio.run(run_mempool_benchmark())
+    asyncio.run(run_mempool_engine_benchmark())
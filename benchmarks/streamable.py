@@ -1,19 +1,22 @@
 from __future__ import annotations
 
+import io
 import json
 import sys
 from dataclasses import dataclass
 from enum import Enum
 from statistics import stdev
 from time import process_time as clock
-from typing import Any, Callable, Dict, List, Optional, TextIO, Tuple, Type, Union
+from typing import Any, Callable, ClassVar, Dict, List, Optional, TextIO, Tuple, Type, Union
 
 import click
 
 from benchmarks.utils import EnumType, get_commit_hash
+from chia.protocols.protocol_message_types import ProtocolMessageTypes
+from chia.server.outbound_message import Message
 from chia.types.blockchain_format.sized_bytes import bytes32
 from chia.types.full_block import FullBlock
-from chia.util.ints import uint8, uint64
+from chia.util.ints import uint8, uint16, uint64
 from chia.util.streamable import Streamable, streamable
 from tests.util.benchmarks import rand_bytes, rand_full_block, rand_hash
 
@@ -49,6 +52,12 @@ class BenchmarkClass(Streamable):
     e: Tuple[BenchmarkMiddle, BenchmarkMiddle, BenchmarkMiddle]
 
 
+@streamable
+@dataclass(frozen=True)
+class BenchmarkCachedClass(BenchmarkClass):
+    _streamable_cache_bytes: ClassVar[bool] = True
+
+
 def get_random_inner() -> BenchmarkInner:
     return BenchmarkInner(rand_bytes(20).hex())
 
@@ -75,6 +84,15 @@ def get_random_benchmark_object() -> BenchmarkClass:
     return BenchmarkClass(a, b, c, d, e)
 
 
+def get_random_cached_benchmark_object() -> BenchmarkCachedClass:
+    obj = get_random_benchmark_object()
+    return BenchmarkCachedClass(obj.a, obj.b, obj.c, obj.d, obj.e)
+
+
+def get_random_message() -> Message:
+    return Message(uint8(ProtocolMessageTypes.respond_block.value), uint16(1), bytes(rand_full_block()))
+
+
 def print_row(
     *,
     mode: str,
@@ -115,7 +133,9 @@ def print_results(mode: str, bench_result: BenchmarkResults, final: bool) -> Non
 class Data(str, Enum):
     all = "all"
     benchmark = "benchmark"
+    benchmark_cached = "benchmark_cached"
     full_block = "full_block"
+    message = "message"
 
 
 # The strings in this Enum are by purpose. See benchmark.utils.EnumType.
@@ -123,7 +143,10 @@ class Mode(str, Enum):
     all = "all"
     creation = "creation"
     to_bytes = "to_bytes"
+    get_hash = "get_hash"
     from_bytes = "from_bytes"
+    from_bytes_unchecked = "from_bytes_unchecked"
+    from_stream = "from_stream"
     to_json = "to_json"
     from_json = "from_json"
 
@@ -132,6 +155,21 @@ def to_bytes(obj: Any) -> bytes:
     return bytes(obj)
 
 
+def get_hash(obj: Any) -> bytes32:
+    return bytes32(obj.get_hash())
+
+
+def from_stream(cls: Type[Streamable]) -> Callable[[bytes], Streamable]:
+    # the BinaryIO based parsing, to compare with the memoryview based one
+    def parse(blob: bytes) -> Streamable:
+        f = io.BytesIO(blob)
+        parsed = cls.parse(f)
+        assert f.read() == b""
+        return parsed
+
+    return parse
+
+
 @dataclass
 class ModeParameter:
     conversion_cb: Callable[[Any], Any]
@@ -152,11 +190,26 @@ benchmark_parameter: Dict[Data, BenchmarkParameter] = {
         {
             Mode.creation: None,
             Mode.to_bytes: ModeParameter(to_bytes),
+            Mode.get_hash: ModeParameter(get_hash),
             Mode.from_bytes: ModeParameter(BenchmarkClass.from_bytes, to_bytes),
+            Mode.from_bytes_unchecked: ModeParameter(BenchmarkClass.from_bytes_unchecked, to_bytes),
+            Mode.from_stream: ModeParameter(from_stream(BenchmarkClass), to_bytes),
             Mode.to_json: ModeParameter(BenchmarkClass.to_json_dict),
             Mode.from_json: ModeParameter(BenchmarkClass.from_json_dict, BenchmarkClass.to_json_dict),
         },
     ),
+    # the same data, but the serialized bytes and the hash are cached. to_bytes
+    # and get_hash are called on the same object over and over
+    Data.benchmark_cached: BenchmarkParameter(
+        BenchmarkCachedClass,
+        get_random_cached_benchmark_object,
+        {
+            Mode.creation: None,
+            Mode.to_bytes: ModeParameter(to_bytes),
+            Mode.get_hash: ModeParameter(get_hash),
+            Mode.from_bytes: ModeParameter(BenchmarkCachedClass.from_bytes, to_bytes),
+        },
+    ),
     Data.full_block: BenchmarkParameter(
         FullBlock,
         rand_full_block,
@@ -168,6 +221,16 @@ benchmark_parameter: Dict[Data, BenchmarkParameter] = {
             Mode.from_json: ModeParameter(FullBlock.from_json_dict, FullBlock.to_json_dict),
         },
     ),
+    Data.message: BenchmarkParameter(
+        Message,
+        get_random_message,
+        {
+            Mode.creation: None,
+            Mode.to_bytes: ModeParameter(to_bytes),
+            Mode.from_bytes: ModeParameter(Message.from_bytes, to_bytes),
+            Mode.from_stream: ModeParameter(from_stream(Message), to_bytes),
+        },
+    ),
 }
 
 
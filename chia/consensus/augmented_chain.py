@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional
+
+from chia.consensus.block_record import BlockRecord
+from chia.consensus.blockchain import Blockchain
+from chia.consensus.blockchain_interface import BlockchainInterface
+from chia.types.block_protocol import BlockInfo
+from chia.types.blockchain_format.sized_bytes import bytes32
+from chia.types.blockchain_format.sub_epoch_summary import SubEpochSummary
+from chia.types.full_block import FullBlock
+from chia.types.generator_types import BlockGenerator
+from chia.util.ints import uint32
+
+
+class AugmentedBlockchain(BlockchainInterface):
+    """
+    A view of the blockchain, extended with blocks that have passed
+    pre-validation but haven't been added to the chain yet. This lets us
+    pre-validate the next batch of blocks while the previous one is still being
+    added, during a long sync. The extra blocks must extend the main chain.
+    """
+
+    _underlying: Blockchain
+    _extra_blocks: Dict[bytes32, FullBlock]
+    _extra_records: Dict[bytes32, BlockRecord]
+    _height_to_hash: Dict[uint32, bytes32]
+    # block records added by pre-validation. We keep those out of the
+    # blockchain's cache, since the blocks haven't been validated yet
+    _temp_records: Dict[bytes32, BlockRecord]
+
+    def __init__(self, underlying: Blockchain) -> None:
+        self._underlying = underlying
+        self._extra_blocks = {}
+        self._extra_records = {}
+        self._height_to_hash = {}
+        self._temp_records = {}
+
+    def add_extra_block(self, block: FullBlock, block_record: BlockRecord) -> None:
+        self._extra_blocks[block_record.header_hash] = block
+        self._extra_records[block_record.header_hash] = block_record
+        self._height_to_hash[block_record.height] = block_record.header_hash
+
+    def remove_extra_block(self, header_hash: bytes32) -> None:
+        """
+        Called once the block has been added to the underlying blockchain
+        """
+        block_record = self._extra_records.pop(header_hash, None)
+        self._extra_blocks.pop(header_hash, None)
+        if block_record is not None and self._height_to_hash.get(block_record.height) == header_hash:
+            del self._height_to_hash[block_record.height]
+
+    def clear_temp_records(self) -> None:
+        """
+        Called after pre-validating a batch, to drop the records it looked up
+        """
+        self._temp_records.clear()
+
+    def _get_record(self, header_hash: bytes32) -> Optional[BlockRecord]:
+        block_record = self._extra_records.get(header_hash)
+        if block_record is not None:
+            return block_record
+        return self._temp_records.get(header_hash)
+
+    def get_peak(self) -> Optional[BlockRecord]:
+        return self._underlying.get_peak()
+
+    def get_peak_height(self) -> Optional[uint32]:
+        return self._underlying.get_peak_height()
+
+    def block_record(self, header_hash: bytes32) -> BlockRecord:
+        block_record = self._get_record(header_hash)
+        if block_record is not None:
+            return block_record
+        return self._underlying.block_record(header_hash)
+
+    def try_block_record(self, header_hash: bytes32) -> Optional[BlockRecord]:
+        block_record = self._get_record(header_hash)
+        if block_record is not None:
+            return block_record
+        return self._underlying.try_block_record(header_hash)
+
+    def height_to_block_record(self, height: uint32) -> BlockRecord:
+        header_hash = self.height_to_hash(height)
+        if header_hash is None:
+            raise ValueError(f"Height is not in blockchain: {height}")
+        return self.block_record(header_hash)
+
+    def get_ses_heights(self) -> List[uint32]:
+        return self._underlying.get_ses_heights()
+
+    def get_ses(self, height: uint32) -> SubEpochSummary:
+        return self._underlying.get_ses(height)
+
+    def height_to_hash(self, height: uint32) -> Optional[bytes32]:
+        header_hash = self._height_to_hash.get(height)
+        if header_hash is not None:
+            return header_hash
+        return self._underlying.height_to_hash(height)
+
+    def contains_height(self, height: uint32) -> bool:
+        return height in self._height_to_hash or self._underlying.contains_height(height)
+
+    def contains_block(self, header_hash: bytes32) -> bool:
+        return self._get_record(header_hash) is not None or self._underlying.contains_block(header_hash)
+
+    async def contains_block_from_db(self, header_hash: bytes32) -> bool:
+        return self._get_record(header_hash) is not None or await self._underlying.contains_block_from_db(header_hash)
+
+    def add_block_record(self, block_record: BlockRecord) -> None:
+        self._temp_records[block_record.header_hash] = block_record
+
+    def remove_block_record(self, header_hash: bytes32) -> None:
+        del self._temp_records[header_hash]
+
+    async def get_block_record_from_db(self, header_hash: bytes32) -> Optional[BlockRecord]:
+        block_record = self._get_record(header_hash)
+        if block_record is not None:
+            return block_record
+        return await self._underlying.get_block_record_from_db(header_hash)
+
+    async def get_block_generator(
+        self, block: BlockInfo, additional_blocks: Optional[Dict[bytes32, FullBlock]] = None
+    ) -> Optional[BlockGenerator]:
+        if additional_blocks is None:
+            additional_blocks = {}
+        return await self._underlying.get_block_generator(block, {**self._extra_blocks, **additional_blocks})
@@ -45,14 +45,17 @@ from chia.types.header_block import HeaderBlock
 from chia.types.unfinished_block import UnfinishedBlock
 from chia.types.unfinished_header_block import UnfinishedHeaderBlock
 from chia.types.weight_proof import SubEpochChallengeSegment
+from chia.util import cached_bls
 from chia.util.errors import ConsensusError, Err
+from chia.util.files import write_file_async
 from chia.util.generator_tools import get_block_header
 from chia.util.hash import std_hash
 from chia.util.inline_executor import InlineExecutor
 from chia.util.ints import uint16, uint32, uint64, uint128
 from chia.util.misc import available_logical_cores
 from chia.util.priority_mutex import PriorityMutex
-from chia.util.setproctitle import getproctitle, setproctitle
+from chia.util.setproctitle import getproctitle
+from chia.util.streamable import Streamable, streamable
 
 log = logging.getLogger(__name__)
 
@@ -83,6 +86,20 @@ class StateChangeSummary:
     new_rewards: List[Coin]
 
 
+# bump this whenever the layout of BlockRecordSnapshot (or BlockRecord) changes
+BLOCK_RECORD_SNAPSHOT_VERSION = 1
+
+
+@streamable
+@dataclasses.dataclass(frozen=True)
+class BlockRecordSnapshot(Streamable):
+    version: uint32
+    peak_hash: bytes32
+    # the block records with height >= peak height - blocks_n
+    blocks_n: uint32
+    block_records: List[BlockRecord]
+
+
 class BlockchainMutexPriority(enum.IntEnum):
     # lower values are higher priority
     low = 1
@@ -101,6 +118,9 @@ class Blockchain(BlockchainInterface):
     # maps block height (of the current heaviest chain) to block hash and sub
     # epoch summaries
     __height_map: BlockHeightMap
+    # the block records close to the peak are written to this file on shutdown,
+    # and loaded from it on the next startup
+    _snapshot_path: Path
     # Unspent Store
     coin_store: CoinStore
     # Store
@@ -127,6 +147,7 @@ class Blockchain(BlockchainInterface):
         multiprocessing_context: Optional[BaseContext] = None,
         *,
         single_threaded: bool = False,
+        pairing_cache_name: Optional[str] = None,
     ) -> Blockchain:
         """
         Initializes a blockchain with the BlockRecords from disk, assuming they have all been
@@ -146,8 +167,8 @@ class Blockchain(BlockchainInterface):
             self.pool = ProcessPoolExecutor(
                 max_workers=num_workers,
                 mp_context=multiprocessing_context,
-                initializer=setproctitle,
-                initargs=(f"{getproctitle()}_block_validation_worker",),
+                initializer=cached_bls.init_worker,
+                initargs=(f"{getproctitle()}_block_validation_worker", pairing_cache_name, "block_validation"),
             )
             log.info(f"Started {num_workers} processes for block validation")
 
@@ -163,6 +184,14 @@ class Blockchain(BlockchainInterface):
         self._shut_down = True
         self.pool.shutdown(wait=True)
 
+    def close(self) -> None:
+        """
+        Releases the height to hash file. This is called last on shutdown,
+        after write_snapshot() flushed it. The blockchain can't be used after
+        this.
+        """
+        self.__height_map.close()
+
     async def _load_chain_from_store(self, blockchain_dir: Path) -> None:
         """
         Initializes the state of the Blockchain class from the database.
@@ -170,7 +199,12 @@ class Blockchain(BlockchainInterface):
         self.__height_map = await BlockHeightMap.create(blockchain_dir, self.block_store.db_wrapper)
         self.__block_records = {}
         self.__heights_in_cache = {}
-        block_records, peak = await self.block_store.get_block_records_close_to_peak(self.constants.BLOCKS_CACHE_SIZE)
+        self._snapshot_path = blockchain_dir / "block-records"
+        block_records, peak = await self._load_snapshot()
+        if peak is None:
+            block_records, peak = await self.block_store.get_block_records_close_to_peak(
+                self.constants.BLOCKS_CACHE_SIZE
+            )
         for block in block_records.values():
             self.add_block_record(block)
 
@@ -184,6 +218,54 @@ class Blockchain(BlockchainInterface):
         assert self.__height_map.contains_height(self._peak_height)
         assert not self.__height_map.contains_height(uint32(self._peak_height + 1))
 
+    async def _load_snapshot(self) -> Tuple[Dict[bytes32, BlockRecord], Optional[bytes32]]:
+        """
+        Loads the block records written by write_snapshot(), if they match the
+        database. The file is only used once, it's removed after reading it.
+        Returns the same as BlockStore.get_block_records_close_to_peak(), or no
+        peak if the records have to be loaded from the database instead.
+        """
+        try:
+            snapshot = BlockRecordSnapshot.from_bytes(self._snapshot_path.read_bytes())
+        except FileNotFoundError:
+            return {}, None
+        except Exception as e:
+            log.warning(f"failed to read block record snapshot {self._snapshot_path}: {e}")
+            self._snapshot_path.unlink(missing_ok=True)
+            return {}, None
+        self._snapshot_path.unlink(missing_ok=True)
+
+        if snapshot.version != BLOCK_RECORD_SNAPSHOT_VERSION or snapshot.blocks_n != self.constants.BLOCKS_CACHE_SIZE:
+            return {}, None
+        peak = await self.block_store.get_peak()
+        if peak is None or peak[0] != snapshot.peak_hash:
+            log.info("block record snapshot does not match the peak, loading block records from the database")
+            return {}, None
+        # the snapshot has to have all blocks of the window, including orphans
+        min_height = peak[1] - snapshot.blocks_n
+        if await self.block_store.count_blocks_from_height(min_height) != len(snapshot.block_records):
+            log.info("block record snapshot is out of date, loading block records from the database")
+            return {}, None
+        return {br.header_hash: br for br in snapshot.block_records}, peak[0]
+
+    async def write_snapshot(self) -> None:
+        """
+        Writes the block records close to the peak, and flushes the height to
+        hash map. This is called on shutdown, to make the next startup faster.
+        """
+        await self.__height_map.flush()
+        peak = self.get_peak()
+        if peak is None:
+            return
+        min_height = peak.height - self.constants.BLOCKS_CACHE_SIZE
+        snapshot = BlockRecordSnapshot(
+            uint32(BLOCK_RECORD_SNAPSHOT_VERSION),
+            peak.header_hash,
+            uint32(self.constants.BLOCKS_CACHE_SIZE),
+            [br for br in self.__block_records.values() if br.height >= min_height],
+        )
+        await write_file_async(self._snapshot_path, bytes(snapshot))
+
     def get_peak(self) -> Optional[BlockRecord]:
         """
         Return the peak of the blockchain
@@ -468,10 +550,19 @@ class Blockchain(BlockchainInterface):
             # there's a suspension point here, as we leave the async context
             # manager
 
+            # the transaction is committed now, the coins it created can be
+            # served from the cache
+            self.coin_store.publish_unspent_cache()
+
             # make sure to update _peak_height after the transaction is committed,
             # otherwise other tasks may go look for this block before it's available
             if state_change_summary is not None:
                 self.__height_map.rollback(state_change_summary.fork_height)
+                if previous_peak_height is not None and state_change_summary.fork_height < previous_peak_height:
+                    # BlockStore.rollback() already dropped the generators above the
+                    # fork, but readers outside the transaction may have cached the
+                    # ones of the old chain since then
+                    self.block_store.generator_cache.rollback(state_change_summary.fork_height)
             for fetched_block_record in records:
                 self.__height_map.update_height(
                     fetched_block_record.height,
@@ -491,6 +582,7 @@ class Blockchain(BlockchainInterface):
                 pass
             fork_info.rollback(header_hash, -1 if previous_peak_height is None else previous_peak_height)
             self.block_store.rollback_cache_block(header_hash)
+            self.coin_store.clear_unspent_cache()
             self._peak_height = previous_peak_height
             log.error(
                 f"Error while adding block {header_hash} height {block.height},"
@@ -782,6 +874,20 @@ class Blockchain(BlockchainInterface):
 
         return PreValidationResult(None, required_iters, cost_result, False, uint32(0))
 
+    async def prefetch_generators(self, blocks: List[FullBlock]) -> None:
+        """
+        Loads the generators referenced by a batch of blocks into the block
+        store's generator cache, with as few queries as possible, before the
+        blocks are validated one at a time. References to blocks within the
+        batch are resolved from the batch itself, so they're skipped.
+        """
+        if len(blocks) == 0:
+            return
+        first_height = min(block.height for block in blocks)
+        heights = {h for block in blocks for h in block.transactions_generator_ref_list if h < first_height}
+        if len(heights) > 0:
+            await self.block_store.prefetch_generators(heights)
+
     async def pre_validate_blocks_multiprocessing(
         self,
         blocks: List[FullBlock],
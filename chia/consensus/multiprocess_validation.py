@@ -29,6 +29,7 @@ from chia.types.full_block import FullBlock
 from chia.types.generator_types import BlockGenerator
 from chia.types.header_block import HeaderBlock
 from chia.types.unfinished_block import UnfinishedBlock
+from chia.util import cached_bls
 from chia.util.block_cache import BlockCache
 from chia.util.condition_tools import pkm_pairs
 from chia.util.errors import Err, ValidationError
@@ -78,7 +79,7 @@ def batch_pre_validate_blocks(
                 removals: List[bytes32] = []
                 npc_result: Optional[NPCResult] = None
                 if block.height in npc_results:
-                    npc_result = NPCResult.from_bytes(npc_results[block.height])
+                    npc_result = NPCResult.from_bytes_unchecked(npc_results[block.height])
                     assert npc_result is not None
                     if npc_result.conds is not None:
                         removals, tx_additions = tx_removals_and_additions(npc_result.conds)
@@ -89,7 +90,7 @@ def batch_pre_validate_blocks(
                     prev_generator_bytes = prev_transaction_generators[i]
                     assert prev_generator_bytes is not None
                     assert block.transactions_info is not None
-                    block_generator: BlockGenerator = BlockGenerator.from_bytes(prev_generator_bytes)
+                    block_generator: BlockGenerator = BlockGenerator.from_bytes_unchecked(prev_generator_bytes)
                     assert block_generator.program == block.transactions_generator
                     npc_result = get_name_puzzle_conditions(
                         block_generator,
@@ -131,11 +132,23 @@ def batch_pre_validate_blocks(
                         if npc_result is not None and block.transactions_info is not None:
                             assert npc_result.conds
                             pairs_pks, pairs_msgs = pkm_pairs(npc_result.conds, constants.AGG_SIG_ME_ADDITIONAL_DATA)
-                            # Using AugSchemeMPL.aggregate_verify, so it's safe to use from_bytes_unchecked
-                            pks_objects: List[G1Element] = [G1Element.from_bytes_unchecked(pk) for pk in pairs_pks]
-                            if not AugSchemeMPL.aggregate_verify(
-                                pks_objects, pairs_msgs, block.transactions_info.aggregated_signature
-                            ):
+                            shared_cache = cached_bls.shared_cache()
+                            if shared_cache is not None:
+                                # pairings validated by the mempool workers
+                                # can be reused here
+                                valid_signature = cached_bls.aggregate_verify(
+                                    pairs_pks,
+                                    pairs_msgs,
+                                    block.transactions_info.aggregated_signature,
+                                    cache=shared_cache,
+                                )
+                            else:
+                                # Using AugSchemeMPL.aggregate_verify, so it's safe to use from_bytes_unchecked
+                                pks_objects: List[G1Element] = [G1Element.from_bytes_unchecked(pk) for pk in pairs_pks]
+                                valid_signature = AugSchemeMPL.aggregate_verify(
+                                    pks_objects, pairs_msgs, block.transactions_info.aggregated_signature
+                                )
+                            if not valid_signature:
                                 error_int = uint16(Err.BAD_AGGREGATE_SIGNATURE.value)
                             else:
                                 successfully_validated_signatures = True
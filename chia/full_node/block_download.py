@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from chia.server.ws_connection import WSChiaConnection
+from chia.types.blockchain_format.sized_bytes import bytes32
+from chia.types.full_block import FullBlock
+from chia.util.ints import uint32
+
+# a peer that fails a request is not asked for more blocks for this many
+# seconds, doubling with every consecutive failure, up to BACKOFF_MAX
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 60.0
+
+# after this many consecutive failed requests, we disconnect from the peer
+MAX_CONSECUTIVE_FAILURES = 3
+
+
+@dataclass
+class PeerDownloadStats:
+    """
+    How quickly a peer has been serving us blocks during this sync, and whether
+    it's currently backed off because of failed requests
+    """
+
+    blocks: int = 0
+    seconds: float = 0.0
+    in_flight: int = 0
+    failures: int = 0
+    backoff_until: float = 0.0
+
+    def blocks_per_second(self) -> float:
+        # peers we haven't heard from yet are tried first, to learn how fast
+        # they are
+        if self.seconds == 0.0:
+            return float("inf")
+        return self.blocks / self.seconds
+
+
+@dataclass
+class BlockBatchDownloader:
+    """
+    Downloads a range of blocks in batches, keeping up to max_in_flight batch
+    requests outstanding, spread across the peers returned by get_peers(). The
+    fastest peers are asked first. Peers whose requests fail or time out are
+    backed off. Batches are delivered in height order, regardless of the order
+    the responses arrive in. Since we don't request batches further ahead than
+    the window, the memory we use for blocks that arrived out of order is
+    bounded.
+    """
+
+    request_blocks: Callable[[WSChiaConnection, uint32, uint32], Awaitable[Optional[List[FullBlock]]]]
+    get_peers: Callable[[], List[WSChiaConnection]]
+    log: logging.Logger
+    max_in_flight: int = 8
+    max_in_flight_per_peer: int = 2
+    peer_stats: Dict[bytes32, PeerDownloadStats] = field(default_factory=dict)
+
+    def _stats(self, peer: WSChiaConnection) -> PeerDownloadStats:
+        stats = self.peer_stats.get(peer.peer_node_id)
+        if stats is None:
+            stats = PeerDownloadStats()
+            self.peer_stats[peer.peer_node_id] = stats
+        return stats
+
+    def _pick_peer(self, peers: List[WSChiaConnection], failed: Set[bytes32], now: float) -> Optional[WSChiaConnection]:
+        candidates = [
+            peer
+            for peer in peers
+            if peer.peer_node_id not in failed
+            and self._stats(peer).backoff_until <= now
+            and self._stats(peer).in_flight < self.max_in_flight_per_peer
+        ]
+        if len(candidates) == 0:
+            return None
+        # shuffle first, to pick randomly among peers we don't know anything
+        # about yet
+        random.shuffle(candidates)
+        return max(candidates, key=lambda peer: self._stats(peer).blocks_per_second())
+
+    async def _fetch(self, peer: WSChiaConnection, start: uint32, end: uint32) -> Optional[List[FullBlock]]:
+        try:
+            return await self.request_blocks(peer, start, end)
+        except Exception as e:
+            self.log.warning(f"Exception fetching {start} to {end} from {peer.peer_info}: {e}")
+            return None
+
+    async def _failed(self, peer: WSChiaConnection, now: float) -> None:
+        stats = self._stats(peer)
+        stats.failures += 1
+        stats.backoff_until = now + min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (stats.failures - 1))
+        if stats.failures >= MAX_CONSECUTIVE_FAILURES:
+            self.log.info(f"Closing connection to {peer.peer_info} after {stats.failures} failed block requests")
+            await peer.close()
+
+    async def run(
+        self,
+        start_height: int,
+        end_height: int,
+        batch_size: int,
+        deliver: Callable[[WSChiaConnection, List[FullBlock]], Awaitable[None]],
+    ) -> bool:
+        """
+        Fetches blocks start_height to end_height (inclusive) and passes them
+        to deliver() one batch at a time, in order. Returns False if we failed
+        to fetch a batch from any of our peers.
+        """
+        batches: List[Tuple[uint32, uint32]] = [
+            (uint32(start), uint32(min(end_height, start + batch_size - 1)))
+            for start in range(start_height, end_height + 1, batch_size)
+        ]
+        # the indices into batches, that we still need to request
+        to_request: List[int] = list(range(len(batches)))
+        # the peers that have failed to give us a batch
+        failed: Dict[int, Set[bytes32]] = {}
+        received: Dict[int, Tuple[WSChiaConnection, List[FullBlock]]] = {}
+        in_flight: Dict[asyncio.Task[Optional[List[FullBlock]]], Tuple[int, WSChiaConnection, float]] = {}
+        next_to_deliver = 0
+
+        try:
+            while next_to_deliver < len(batches):
+                if next_to_deliver in received:
+                    sender, batch = received.pop(next_to_deliver)
+                    await deliver(sender, batch)
+                    next_to_deliver += 1
+                    continue
+
+                peers = [peer for peer in self.get_peers() if not peer.closed]
+                now = time.monotonic()
+                while (
+                    len(to_request) > 0
+                    and len(in_flight) < self.max_in_flight
+                    and to_request[0] < next_to_deliver + self.max_in_flight
+                ):
+                    index = to_request[0]
+                    picked = self._pick_peer(peers, failed.get(index, set()), now)
+                    if picked is None:
+                        break
+                    heapq.heappop(to_request)
+                    self._stats(picked).in_flight += 1
+                    start, end = batches[index]
+                    task = asyncio.create_task(self._fetch(picked, start, end))
+                    in_flight[task] = (index, picked, now)
+
+                if len(in_flight) == 0:
+                    # we couldn't request the next batch from anyone. Wait for
+                    # backed off peers, unless every peer has already failed to
+                    # give it to us
+                    index = to_request[0]
+                    waiting = [
+                        self._stats(peer).backoff_until
+                        for peer in peers
+                        if peer.peer_node_id not in failed.get(index, set())
+                    ]
+                    if len(waiting) == 0:
+                        start, end = batches[index]
+                        self.log.error(f"failed fetching {start} to {end} from peers")
+                        return False
+                    await asyncio.sleep(max(0.0, min(waiting) - now))
+                    continue
+
+                done, _ = await asyncio.wait(in_flight.keys(), return_when=asyncio.FIRST_COMPLETED)
+                now = time.monotonic()
+                for task in done:
+                    index, sender, started = in_flight.pop(task)
+                    stats = self._stats(sender)
+                    stats.in_flight -= 1
+                    response = task.result()
+                    if response is None:
+                        failed.setdefault(index, set()).add(sender.peer_node_id)
+                        heapq.heappush(to_request, index)
+                        await self._failed(sender, now)
+                        continue
+                    stats.failures = 0
+                    stats.blocks += len(response)
+                    stats.seconds += now - started
+                    received[index] = (sender, response)
+            return True
+        finally:
+            for task in in_flight:
+                task.cancel()
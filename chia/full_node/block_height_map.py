@@ -1,9 +1,11 @@
 from __future__ import annotations
 
 import logging
+import mmap
+import os
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import BinaryIO, Dict, List, Optional, Tuple
 
 import aiofiles
 
@@ -32,8 +34,31 @@ class BlockHeightMap:
     # Defines the path from genesis to the peak, no orphan blocks
     # this buffer contains all block hashes that are part of the current peak
     # ordered by height. i.e. __height_to_hash[0..32] is the genesis hash
-    # __height_to_hash[32..64] is the hash for height 1 and so on
-    __height_to_hash: bytearray
+    # __height_to_hash[32..64] is the hash for height 1 and so on.
+    # It's a memory map of the height-to-hash file, so hashes are only paged in
+    # when they're used, and only the modified pages are written back. Other
+    # processes (e.g. analysis tools) can map the same file read-only. Since
+    # the file is never truncated, it may end with hashes of an abandoned fork,
+    # past the peak, so they take the number of valid hashes from the
+    # height-to-hash-count file. It's None if the file doesn't exist (yet)
+    __height_to_hash: Optional[mmap.mmap]
+
+    # the height-to-hash file that's mapped. New hashes are appended through
+    # this file object (rather than by opening the file again), so they end up
+    # in the file we have mapped even if the file is replaced
+    __file: Optional[BinaryIO]
+
+    # the number of bytes of the file that are mapped by __height_to_hash
+    __mapped_size: int
+
+    # the hashes of the heights past the end of the file, i.e. the blocks
+    # added since the last flush. They are appended to the file when flushing
+    __tail: bytearray
+
+    # the number of bytes of block hashes, i.e. (peak height + 1) * 32. This
+    # may be less than __mapped_size, after a rollback. The number of hashes is
+    # written to the height-to-hash-count file when flushing
+    __size: int
 
     # All sub-epoch summaries that have been included in the blockchain from the beginning until and including the peak
     # (height_included, SubEpochSummary). Note: ONLY for the blocks in the path to the peak
@@ -44,14 +69,13 @@ class BlockHeightMap:
     # disk
     __counter: int
 
-    # this is the lowest height whose hash has been updated since the last flush
-    # to disk. When it's time to write to disk, we can start flushing from this
-    # offset
-    __first_dirty: int
-
     # the file we're saving the height-to-hash cache to
     __height_to_hash_filename: Path
 
+    # the file we're saving the number of valid hashes in the height-to-hash
+    # file to, as a big-endian uint32
+    __height_to_hash_count_filename: Path
+
     # the file we're saving the sub epoch summary cache to
     __ses_filename: Path
 
@@ -63,10 +87,14 @@ class BlockHeightMap:
         self.db = db
 
         self.__counter = 0
-        self.__first_dirty = 0
-        self.__height_to_hash = bytearray()
+        self.__height_to_hash = None
+        self.__file = None
+        self.__mapped_size = 0
+        self.__tail = bytearray()
+        self.__size = 0
         self.__sub_epoch_summaries = {}
         self.__height_to_hash_filename = blockchain_dir / "height-to-hash"
+        self.__height_to_hash_count_filename = blockchain_dir / "height-to-hash-count"
         self.__ses_filename = blockchain_dir / "sub-epoch-summaries"
 
         async with self.db.reader_no_transaction() as conn:
@@ -83,12 +111,7 @@ class BlockHeightMap:
                 if row is None:
                     return self
 
-        try:
-            async with aiofiles.open(self.__height_to_hash_filename, "rb") as f:
-                self.__height_to_hash = bytearray(await f.read())
-        except Exception:
-            # it's OK if this file doesn't exist, we can rebuild it
-            pass
+        self.__map_file()
 
         try:
             async with aiofiles.open(self.__ses_filename, "rb") as f:
@@ -101,16 +124,12 @@ class BlockHeightMap:
         prev_hash: bytes32 = row[1]
         height = row[2]
 
-        # allocate memory for height to hash map
-        # this may also truncate it, if thie file on disk had an invalid size
-        new_size = (height + 1) * 32
-        size = len(self.__height_to_hash)
-        if size > new_size:
-            del self.__height_to_hash[new_size:]
-        else:
-            self.__height_to_hash += bytearray([0] * (new_size - size))
-
-        self.__first_dirty = height + 1
+        # the file on disk may have more blocks than the DB, in which case we
+        # ignore the ones past the peak. If it has fewer, the missing hashes are
+        # kept in memory until the next flush
+        self.__size = (height + 1) * 32
+        if self.__size > self.__mapped_size:
+            self.__tail = bytearray(self.__size - self.__mapped_size)
 
         if self.get_hash(height) != peak:
             self.__set_hash(height, peak)
@@ -130,7 +149,7 @@ class BlockHeightMap:
     def update_height(self, height: uint32, header_hash: bytes32, ses: Optional[SubEpochSummary]) -> None:
         # we're only updating the last hash. If we've reorged, we already rolled
         # back, making this the new peak
-        assert height * 32 <= len(self.__height_to_hash)
+        assert height * 32 <= self.__size
         self.__set_hash(height, header_hash)
         if ses is not None:
             self.__sub_epoch_summaries[height] = bytes(ses)
@@ -138,28 +157,92 @@ class BlockHeightMap:
     async def maybe_flush(self) -> None:
         if self.__counter < 1000:
             return
+        await self.flush()
 
-        assert (len(self.__height_to_hash) % 32) == 0
-        offset = self.__first_dirty * 32
+    async def flush(self) -> None:
+        """
+        Writes the changes since the last flush to disk. This is called on
+        shutdown, so the next startup finds the cache files in sync with the DB.
+        """
+        assert (self.__size % 32) == 0
 
         ses_buf = bytes(SesCache([(k, v) for (k, v) in self.__sub_epoch_summaries.items()]))
 
         self.__counter = 0
 
-        try:
-            async with aiofiles.open(self.__height_to_hash_filename, "r+b") as f:
-                map_buf = self.__height_to_hash[offset:].copy()
-                await f.seek(offset)
-                await f.write(map_buf)
-        except Exception:
-            # if the file doesn't exist, write the whole buffer
-            async with aiofiles.open(self.__height_to_hash_filename, "wb") as f:
-                map_buf = self.__height_to_hash.copy()
-                await f.write(map_buf)
+        # the hashes that are part of the file are written back by the OS, this
+        # just waits for it
+        if self.__height_to_hash is not None:
+            self.__height_to_hash.flush()
+
+        if len(self.__tail) > 0:
+            if self.__file is None:
+                # we don't have a file yet. Write a new one rather than writing
+                # into an existing one, which someone else may have mapped
+                await write_file_async(self.__height_to_hash_filename, self.__get_range(0, self.__size))
+            else:
+                # we never truncate the file, since other processes may have it
+                # mapped
+                self.__file.seek(self.__mapped_size)
+                self.__file.write(self.__tail)
+                self.__file.flush()
+            self.__map_file()
+        # only written once the hashes it counts are in the file
+        await write_file_async(self.__height_to_hash_count_filename, uint32(self.__size // 32).stream_to_bytes())
 
-        self.__first_dirty = len(self.__height_to_hash) // 32
         await write_file_async(self.__ses_filename, ses_buf)
 
+    def close(self) -> None:
+        """
+        Unmaps and closes the height-to-hash file. Changes since the last
+        flush() are not written, and the map can't be used after this.
+        """
+        if self.__height_to_hash is not None:
+            self.__height_to_hash.close()
+            self.__height_to_hash = None
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+        self.__mapped_size = 0
+        self.__tail.clear()
+        self.__size = 0
+
+    def __map_file(self) -> None:
+        """
+        (Re-)maps the whole height-to-hash file, which makes the hashes in the
+        tail part of the mapped memory.
+        """
+        if self.__height_to_hash is not None:
+            self.__height_to_hash.close()
+            self.__height_to_hash = None
+        self.__mapped_size = 0
+        try:
+            if self.__file is None:
+                self.__file = open(self.__height_to_hash_filename, "r+b")
+            # ignore a partial hash at the end of the file
+            size = os.fstat(self.__file.fileno()).st_size
+            size -= size % 32
+            if size > 0:
+                self.__height_to_hash = mmap.mmap(self.__file.fileno(), size, access=mmap.ACCESS_WRITE)
+                self.__mapped_size = size
+        except OSError:
+            # it's OK if this file doesn't exist, we can rebuild it
+            pass
+        if self.__size <= self.__mapped_size:
+            self.__tail.clear()
+        else:
+            del self.__tail[: self.__mapped_size - (self.__size - len(self.__tail))]
+
+    def __get_range(self, start: int, end: int) -> bytes:
+        mapped_end = min(end, self.__mapped_size)
+        ret = b""
+        if start < mapped_end:
+            assert self.__height_to_hash is not None
+            ret = self.__height_to_hash[start:mapped_end]
+        if end > self.__mapped_size:
+            ret += self.__tail[max(start, self.__mapped_size) - self.__mapped_size : end - self.__mapped_size]
+        return ret
+
     # load height-to-hash map entries from the DB starting at height back in
     # time until we hit a match in the existing map, at which point we can
     # assume all previous blocks have already been populated
@@ -218,17 +301,27 @@ class BlockHeightMap:
 
     def __set_hash(self, height: int, block_hash: bytes32) -> None:
         idx = height * 32
-        self.__height_to_hash[idx : idx + 32] = block_hash
+        assert idx <= self.__size
+        if idx < self.__mapped_size:
+            assert self.__height_to_hash is not None
+            self.__height_to_hash[idx : idx + 32] = block_hash
+        else:
+            idx -= self.__mapped_size
+            self.__tail[idx : idx + 32] = block_hash
+        self.__size = max(self.__size, height * 32 + 32)
         self.__counter += 1
-        self.__first_dirty = min(self.__first_dirty, height)
 
     def get_hash(self, height: uint32) -> bytes32:
         idx = height * 32
-        assert idx + 32 <= len(self.__height_to_hash)
-        return bytes32(self.__height_to_hash[idx : idx + 32])
+        assert idx + 32 <= self.__size
+        if idx < self.__mapped_size:
+            assert self.__height_to_hash is not None
+            return bytes32(self.__height_to_hash[idx : idx + 32])
+        idx -= self.__mapped_size
+        return bytes32(self.__tail[idx : idx + 32])
 
     def contains_height(self, height: uint32) -> bool:
-        return height * 32 < len(self.__height_to_hash)
+        return height * 32 < self.__size
 
     def rollback(self, fork_height: int) -> None:
         # fork height may be -1, in which case all blocks are different and we
@@ -239,8 +332,13 @@ class BlockHeightMap:
                 heights_to_delete.append(ses_included_height)
         for height in heights_to_delete:
             del self.__sub_epoch_summaries[height]
-        del self.__height_to_hash[(fork_height + 1) * 32 :]
-        self.__first_dirty = min(self.__first_dirty, fork_height + 1)
+        new_size = (fork_height + 1) * 32
+        if new_size < self.__size:
+            if new_size <= self.__mapped_size:
+                self.__tail.clear()
+            else:
+                del self.__tail[new_size - self.__mapped_size :]
+            self.__size = new_size
 
     def get_ses(self, height: uint32) -> SubEpochSummary:
         return SubEpochSummary.from_bytes(self.__sub_epoch_summaries[height])
@@ -3,12 +3,13 @@ from __future__ import annotations
 import dataclasses
 import logging
 import sqlite3
-from typing import Dict, List, Optional, Tuple
+from typing import AsyncIterator, Collection, Dict, List, Optional, Tuple
 
 import typing_extensions
 import zstd
 
 from chia.consensus.block_record import BlockRecord
+from chia.full_node.generator_cache import DEFAULT_GENERATOR_CACHE_SIZE, GeneratorCache
 from chia.types.blockchain_format.serialized_program import SerializedProgram
 from chia.types.blockchain_format.sized_bytes import bytes32
 from chia.types.full_block import FullBlock
@@ -17,11 +18,23 @@ from chia.util.db_wrapper import DBWrapper2, execute_fetchone
 from chia.util.errors import Err
 from chia.util.full_block_utils import GeneratorBlockInfo, block_info_from_block, generator_from_block
 from chia.util.ints import uint32
-from chia.util.lru_cache import LRUCache
+from chia.util.lru_cache import MeteredLRUCache
 
 log = logging.getLogger(__name__)
 
 
+# the limit of the memory the cached blocks take up, in bytes, and of their number
+BLOCK_CACHE_SIZE = 50 * 1024 * 1024
+BLOCK_CACHE_BLOCKS = 1000
+# a parsed FullBlock takes up about as much memory as its serialized (uncompressed) form, plus this many bytes
+BLOCK_OVERHEAD = 2500
+
+
+def block_cache_weight(serialized_size: int) -> int:
+    # every block weighs at least its share of BLOCK_CACHE_BLOCKS, which limits their number
+    return max(serialized_size + BLOCK_OVERHEAD, BLOCK_CACHE_SIZE // BLOCK_CACHE_BLOCKS)
+
+
 def decompress(block_bytes: bytes) -> FullBlock:
     return FullBlock.from_bytes(zstd.decompress(block_bytes))
 
@@ -39,9 +52,10 @@ def decompress_blob(block_bytes: bytes) -> bytes:
 @typing_extensions.final
 @dataclasses.dataclass
 class BlockStore:
-    block_cache: LRUCache[bytes32, FullBlock]
+    block_cache: MeteredLRUCache[bytes32, FullBlock]
     db_wrapper: DBWrapper2
-    ses_challenge_cache: LRUCache[bytes32, List[SubEpochChallengeSegment]]
+    ses_challenge_cache: MeteredLRUCache[bytes32, List[SubEpochChallengeSegment]]
+    generator_cache: GeneratorCache
 
     @classmethod
     async def create(cls, db_wrapper: DBWrapper2, *, use_cache: bool = True) -> BlockStore:
@@ -49,9 +63,14 @@ class BlockStore:
             raise RuntimeError(f"BlockStore does not support database schema v{db_wrapper.db_version}")
 
         if use_cache:
-            self = cls(LRUCache(1000), db_wrapper, LRUCache(50))
+            self = cls(
+                MeteredLRUCache(BLOCK_CACHE_SIZE),
+                db_wrapper,
+                MeteredLRUCache(50),
+                GeneratorCache(DEFAULT_GENERATOR_CACHE_SIZE),
+            )
         else:
-            self = cls(LRUCache(0), db_wrapper, LRUCache(0))
+            self = cls(MeteredLRUCache(0), db_wrapper, MeteredLRUCache(0), GeneratorCache(0))
 
         async with self.db_wrapper.writer_maybe_transaction() as conn:
             log.info("DB: Creating block store tables and indexes.")
@@ -105,6 +124,7 @@ class BlockStore:
     async def rollback(self, height: int) -> None:
         async with self.db_wrapper.writer_maybe_transaction() as conn:
             await conn.execute("UPDATE full_blocks SET in_main_chain=0 WHERE height>? AND in_main_chain=1", (height,))
+        self.generator_cache.rollback(height)
 
     async def set_in_chain(self, header_hashes: List[Tuple[bytes32]]) -> None:
         async with self.db_wrapper.writer_maybe_transaction() as conn:
@@ -117,9 +137,10 @@ class BlockStore:
     async def replace_proof(self, header_hash: bytes32, block: FullBlock) -> None:
         assert header_hash == block.header_hash
 
-        block_bytes: bytes = compress(block)
+        serialized = bytes(block)
+        block_bytes: bytes = zstd.compress(serialized)
 
-        self.block_cache.put(header_hash, block)
+        self.block_cache.put(header_hash, block, block_cache_weight(len(serialized)))
 
         async with self.db_wrapper.writer_maybe_transaction() as conn:
             await conn.execute(
@@ -132,7 +153,9 @@ class BlockStore:
             )
 
     async def add_full_block(self, header_hash: bytes32, block: FullBlock, block_record: BlockRecord) -> None:
-        self.block_cache.put(header_hash, block)
+        serialized = bytes(block)
+        block_bytes: bytes = zstd.compress(serialized)
+        self.block_cache.put(header_hash, block, block_cache_weight(len(serialized)))
 
         ses: Optional[bytes] = (
             None if block_record.sub_epoch_summary_included is None else bytes(block_record.sub_epoch_summary_included)
@@ -157,7 +180,7 @@ class BlockStore:
                     ses,
                     int(block.is_fully_compactified()),
                     False,  # in_main_chain
-                    compress(block),
+                    block_bytes,
                     bytes(block_record),
                 ),
             )
@@ -208,8 +231,9 @@ class BlockStore:
             async with conn.execute("SELECT block from full_blocks WHERE header_hash=?", (header_hash,)) as cursor:
                 row = await cursor.fetchone()
         if row is not None:
-            block = decompress(row[0])
-            self.block_cache.put(header_hash, block)
+            serialized = decompress_blob(row[0])
+            block = FullBlock.from_bytes(serialized)
+            self.block_cache.put(header_hash, block, block_cache_weight(len(serialized)))
             return block
         return None
 
@@ -291,6 +315,44 @@ class BlockStore:
             return []
 
         generators: Dict[uint32, SerializedProgram] = {}
+        missing: List[uint32] = []
+        for height in heights:
+            gen = self.generator_cache.get(height)
+            if gen is None:
+                missing.append(height)
+            else:
+                generators[height] = gen
+
+        if len(missing) > 0:
+            for height, maybe_gen in (await self._read_generators_at(missing)).items():
+                if maybe_gen is None:
+                    raise ValueError(Err.GENERATOR_REF_HAS_NO_GENERATOR)
+                generators[height] = maybe_gen
+
+        return [generators[h] for h in heights]
+
+    async def prefetch_generators(self, heights: Collection[uint32]) -> int:
+        """
+        Loads the generators of the main chain blocks at the specified heights
+        into the generator cache, using as few queries as possible. Heights
+        that are missing, or whose blocks don't have a generator, are ignored.
+        Returns the number of generators that were read from the database.
+        """
+        missing = [h for h in set(heights) if h not in self.generator_cache.cache]
+        count = 0
+        chunk_size = self.db_wrapper.host_parameter_limit - 1
+        for i in range(0, len(missing), chunk_size):
+            generators = await self._read_generators_at(missing[i : i + chunk_size])
+            count += sum(1 for gen in generators.values() if gen is not None)
+        return count
+
+    async def _read_generators_at(self, heights: List[uint32]) -> Dict[uint32, Optional[SerializedProgram]]:
+        """
+        Reads the generators of the main chain blocks at the specified heights
+        from the database, and adds them to the generator cache.
+        """
+        generation = self.generator_cache.generation
+        generators: Dict[uint32, Optional[SerializedProgram]] = {}
         formatted_str = (
             f"SELECT block, height from full_blocks "
             f'WHERE in_main_chain=1 AND height in ({"?," * (len(heights) - 1)}?)'
@@ -309,11 +371,15 @@ class BlockStore:
                         # definition of parsing a block
                         b = FullBlock.from_bytes(block_bytes)
                         gen = b.transactions_generator
-                    if gen is None:
-                        raise ValueError(Err.GENERATOR_REF_HAS_NO_GENERATOR)
                     generators[uint32(row[1])] = gen
 
-        return [generators[h] for h in heights]
+        # if the main chain was rolled back while we were reading, these may
+        # be the generators of blocks that are no longer in the main chain
+        if self.generator_cache.generation == generation:
+            for height, maybe_gen in generators.items():
+                if maybe_gen is not None:
+                    self.generator_cache.put(height, maybe_gen, len(bytes(maybe_gen)))
+        return generators
 
     async def get_block_records_by_hash(self, header_hashes: List[bytes32]) -> List[BlockRecord]:
         """
@@ -407,9 +473,10 @@ class BlockStore:
             async with conn.execute(formatted_str, header_hashes) as cursor:
                 for row in await cursor.fetchall():
                     header_hash = bytes32(row[0])
-                    full_block: FullBlock = decompress(row[1])
+                    serialized = decompress_blob(row[1])
+                    full_block: FullBlock = FullBlock.from_bytes(serialized)
                     all_blocks[header_hash] = full_block
-                    self.block_cache.put(header_hash, full_block)
+                    self.block_cache.put(header_hash, full_block, block_cache_weight(len(serialized)))
         ret: List[FullBlock] = []
         for hh in header_hashes:
             if hh not in all_blocks:
@@ -463,16 +530,36 @@ class BlockStore:
         if present.
         """
 
+        return [block_bytes async for block_bytes in self.stream_block_bytes_in_range(start, stop)]
+
+    async def stream_block_bytes_in_range(
+        self, start: int, stop: int, *, chunk_size: int = 32, compressed: bool = False
+    ) -> AsyncIterator[bytes]:
+        """
+        Yields the serialized main chain blocks with start <= height <= stop, in
+        height order. The blocks are read chunk_size heights at a time, and no
+        database connection is held while the caller processes a chunk. With
+        compressed=True the blobs are yielded zstd compressed, as they are
+        stored, for callers that only forward them.
+        Raises ValueError when reaching a chunk with missing blocks.
+        """
+
         assert self.db_wrapper.db_version == 2
-        async with self.db_wrapper.reader_no_transaction() as conn:
-            async with conn.execute(
-                "SELECT block FROM full_blocks WHERE height >= ? AND height <= ? and in_main_chain=1",
-                (start, stop),
-            ) as cursor:
-                rows: List[sqlite3.Row] = list(await cursor.fetchall())
-                if len(rows) != (stop - start) + 1:
-                    raise ValueError(f"Some blocks in range {start}-{stop} were not found.")
-                return [decompress_blob(row[0]) for row in rows]
+        assert chunk_size > 0
+        while start <= stop:
+            chunk_stop = min(start + chunk_size - 1, stop)
+            async with self.db_wrapper.reader_no_transaction() as conn:
+                async with conn.execute(
+                    "SELECT block FROM full_blocks WHERE height >= ? AND height <= ? and in_main_chain=1 "
+                    "ORDER BY height",
+                    (start, chunk_stop),
+                ) as cursor:
+                    rows: List[sqlite3.Row] = list(await cursor.fetchall())
+            if len(rows) != (chunk_stop - start) + 1:
+                raise ValueError(f"Some blocks in range {start}-{chunk_stop} were not found.")
+            for row in rows:
+                yield row[0] if compressed else decompress_blob(row[0])
+            start = chunk_stop + 1
 
     async def get_peak(self) -> Optional[Tuple[bytes32, uint32]]:
         async with self.db_wrapper.reader_no_transaction() as conn:
@@ -511,6 +598,17 @@ class BlockStore:
 
         return ret, peak[0]
 
+    async def count_blocks_from_height(self, height: int) -> int:
+        """
+        Returns the number of blocks with height >= height, including orphans.
+        """
+
+        async with self.db_wrapper.reader_no_transaction() as conn:
+            async with conn.execute("SELECT COUNT(*) FROM full_blocks WHERE height >= ?", (height,)) as cursor:
+                row = await cursor.fetchone()
+        assert row is not None
+        return int(row[0])
+
     async def set_peak(self, header_hash: bytes32) -> None:
         # We need to be in a sqlite transaction here.
         # Note: we do not commit this to the database yet, as we need to also change the coin store
@@ -17,7 +17,7 @@ from chia.types.coin_record import CoinRecord
 from chia.types.eligible_coin_spends import UnspentLineageInfo
 from chia.util.db_wrapper import SQLITE_MAX_VARIABLE_NUMBER, DBWrapper2
 from chia.util.ints import uint32, uint64
-from chia.util.lru_cache import LRUCache
+from chia.util.lru_cache import LRUCache, MeteredLRUCache
 from chia.util.misc import to_batches
 
 log = logging.getLogger(__name__)
@@ -31,13 +31,23 @@ class CoinStore:
     """
 
     db_wrapper: DBWrapper2
-    coins_added_at_height_cache: LRUCache[uint32, List[CoinRecord]]
+    coins_added_at_height_cache: MeteredLRUCache[uint32, List[CoinRecord]]
+    # unspent coins created by recent blocks, keyed by coin name. This is only
+    # ever populated by publish_unspent_cache() (never by reads), so a
+    # concurrent reader can't put back a record that was just spent
+    unspent_cache: LRUCache[bytes32, CoinRecord]
+    unspent_cache_hits: int = 0
+    unspent_cache_misses: int = 0
+    # the unspent coins created by new_block() in the current DB transaction.
+    # They're only added to the cache once it's committed, readers outside of
+    # it must not see them before then
+    _unpublished: Dict[bytes32, CoinRecord] = dataclasses.field(default_factory=dict)
 
     @classmethod
-    async def create(cls, db_wrapper: DBWrapper2) -> CoinStore:
+    async def create(cls, db_wrapper: DBWrapper2, *, unspent_cache_size: int = 100000) -> CoinStore:
         if db_wrapper.db_version != 2:
             raise RuntimeError(f"CoinStore does not support database schema v{db_wrapper.db_version}")
-        self = CoinStore(db_wrapper, LRUCache(100))
+        self = CoinStore(db_wrapper, MeteredLRUCache(100), LRUCache(unspent_cache_size))
 
         async with self.db_wrapper.writer_maybe_transaction() as conn:
             log.info("DB: Creating coin store tables and indexes.")
@@ -124,6 +134,14 @@ class CoinStore:
         await self._add_coin_records(additions)
         await self._set_spent(tx_removals, height)
 
+        # coins created and spent in this same block (ephemeral coins) are
+        # not unspent, so they don't belong in the cache
+        removals = set(tx_removals)
+        for record in additions:
+            name = record.name
+            if name not in removals:
+                self._unpublished[name] = record
+
         end = time.monotonic()
         log.log(
             logging.WARNING if end - start > 10 else logging.DEBUG,
@@ -134,8 +152,31 @@ class CoinStore:
 
         return additions
 
+    def publish_unspent_cache(self) -> None:
+        """
+        Adds the unspent coins created by new_block() to the cache. This must be
+        called once the DB transaction that called new_block() is committed.
+        """
+        for name, record in self._unpublished.items():
+            self.unspent_cache.put(name, record)
+        self._unpublished.clear()
+
+    def clear_unspent_cache(self) -> None:
+        """
+        Drops all cached unspent coin records. This must be called if a DB
+        transaction that called new_block() is rolled back.
+        """
+        self.unspent_cache.clear()
+        self._unpublished.clear()
+
     # Checks DB and DiffStores for CoinRecord with coin_name and returns it
     async def get_coin_record(self, coin_name: bytes32) -> Optional[CoinRecord]:
+        cached = self.unspent_cache.get(coin_name)
+        if cached is not None:
+            self.unspent_cache_hits += 1
+            return cached
+        self.unspent_cache_misses += 1
+
         async with self.db_wrapper.reader_no_transaction() as conn:
             async with conn.execute(
                 "SELECT confirmed_index, spent_index, coinbase, puzzle_hash, "
@@ -153,10 +194,22 @@ class CoinStore:
             return []
 
         coins: List[CoinRecord] = []
+        names_to_fetch: List[bytes32] = []
+        for name in names:
+            cached = self.unspent_cache.get(name)
+            if cached is not None:
+                coins.append(cached)
+            else:
+                names_to_fetch.append(name)
+        self.unspent_cache_hits += len(coins)
+        self.unspent_cache_misses += len(names_to_fetch)
+
+        if len(names_to_fetch) == 0:
+            return coins
 
         async with self.db_wrapper.reader_no_transaction() as conn:
             cursors: List[Cursor] = []
-            for batch in to_batches(names, SQLITE_MAX_VARIABLE_NUMBER):
+            for batch in to_batches(names_to_fetch, SQLITE_MAX_VARIABLE_NUMBER):
                 names_db: Tuple[Any, ...] = tuple(batch.entries)
                 cursors.append(
                     await conn.execute(
@@ -522,6 +575,8 @@ class CoinStore:
                     coin = self.row_to_coin(row)
                     record = CoinRecord(coin, uint32(0), row[1], row[2], uint64(0))
                     coin_changes[record.name] = record
+                    self.unspent_cache.pop(record.name)
+                    self._unpublished.pop(record.name, None)
 
             # Delete reverted blocks from storage
             await conn.execute("DELETE FROM coin_record WHERE confirmed_index>?", (block_index,))
@@ -539,7 +594,7 @@ class CoinStore:
                         coin_changes[record.name] = record
 
             await conn.execute("UPDATE coin_record SET spent_index=0 WHERE spent_index>?", (block_index,))
-        self.coins_added_at_height_cache = LRUCache(self.coins_added_at_height_cache.capacity)
+        self.coins_added_at_height_cache.clear()
         return list(coin_changes.values())
 
     # Store CoinRecord in DB
@@ -572,6 +627,10 @@ class CoinStore:
         if len(coin_names) == 0:
             return None
 
+        for name in coin_names:
+            self.unspent_cache.pop(name)
+            self._unpublished.pop(name, None)
+
         async with self.db_wrapper.writer_maybe_transaction() as conn:
             rows_updated: int = 0
             for batch in to_batches(coin_names, SQLITE_MAX_VARIABLE_NUMBER):
@@ -32,6 +32,7 @@ from typing import (
 from chia_rs import AugSchemeMPL
 from packaging.version import Version
 
+from chia.consensus.augmented_chain import AugmentedBlockchain
 from chia.consensus.block_body_validation import ForkInfo
 from chia.consensus.block_creation import unfinished_block_to_full_block
 from chia.consensus.block_record import BlockRecord
@@ -40,9 +41,11 @@ from chia.consensus.blockchain_interface import BlockchainInterface
 from chia.consensus.constants import ConsensusConstants
 from chia.consensus.cost_calculator import NPCResult
 from chia.consensus.difficulty_adjustment import get_next_sub_slot_iters_and_difficulty
+from chia.consensus.full_block_to_block_record import block_to_block_record
 from chia.consensus.make_sub_epoch_summary import next_sub_epoch_summary
-from chia.consensus.multiprocess_validation import PreValidationResult
+from chia.consensus.multiprocess_validation import PreValidationResult, pre_validate_blocks_multiprocessing
 from chia.consensus.pot_iterations import calculate_sp_iters
+from chia.full_node.block_download import BlockBatchDownloader
 from chia.full_node.block_store import BlockStore
 from chia.full_node.bundle_tools import detect_potential_template_generator
 from chia.full_node.coin_store import CoinStore
@@ -60,7 +63,7 @@ from chia.protocols import farmer_protocol, full_node_protocol, timelord_protoco
 from chia.protocols.farmer_protocol import SignagePointSourceData, SPSubSlotSourceData, SPVDFSourceData
 from chia.protocols.full_node_protocol import RequestBlocks, RespondBlock, RespondBlocks, RespondSignagePoint
 from chia.protocols.protocol_message_types import ProtocolMessageTypes
-from chia.protocols.wallet_protocol import CoinState, CoinStateUpdate
+from chia.protocols.wallet_protocol import CoinStateUpdate
 from chia.rpc.rpc_server import StateChangedProtocol
 from chia.server.node_discovery import FullNodePeers
 from chia.server.outbound_message import Message, NodeType, make_msg
@@ -97,6 +100,7 @@ from chia.util.log_exceptions import log_exceptions
 from chia.util.path import path_from_root
 from chia.util.profiler import enable_profiler, mem_profile_task, profile_task
 from chia.util.safe_cancel_task import cancel_task_safe
+from chia.util.shared_pairing_cache import SharedPairingCache
 
 
 # This is the result of calling peak_post_processing, which is then fed into peak_post_processing_2
@@ -161,6 +165,8 @@ class FullNode:
     _mempool_manager: Optional[MempoolManager] = None
     _init_weight_proof: Optional[asyncio.Task[None]] = None
     _blockchain: Optional[Blockchain] = None
+    # BLS pairings shared with the block and mempool validation workers
+    pairing_cache: Optional[SharedPairingCache] = None
     _timelord_lock: Optional[asyncio.Lock] = None
     weight_proof_handler: Optional[WeightProofHandler] = None
     # hashes of peaks that failed long sync on chip13 Validation
@@ -256,13 +262,23 @@ class FullNode:
 
             self._block_store = await BlockStore.create(self.db_wrapper)
             self._hint_store = await HintStore.create(self.db_wrapper)
-            self._coin_store = await CoinStore.create(self.db_wrapper)
+            self._coin_store = await CoinStore.create(
+                self.db_wrapper, unspent_cache_size=self.config.get("coin_store_unspent_cache_size", 100000)
+            )
             self.log.info("Initializing blockchain from disk")
             start_time = time.monotonic()
             reserved_cores = self.config.get("reserved_cores", 0)
             single_threaded = self.config.get("single_threaded", False)
             multiprocessing_start_method = process_config_start_method(config=self.config, log=self.log)
             self.multiprocessing_context = multiprocessing.get_context(method=multiprocessing_start_method)
+            pairing_cache_size = self.config.get("shared_pairing_cache_size", 50000)
+            if not single_threaded and pairing_cache_size > 0:
+                try:
+                    self.pairing_cache = SharedPairingCache.create(pairing_cache_size)
+                    cached_bls.set_shared_cache(self.pairing_cache)
+                except OSError as e:
+                    self.log.warning(f"failed to create the shared pairing cache: {e}")
+            pairing_cache_name = None if self.pairing_cache is None else self.pairing_cache.name
             self._blockchain = await Blockchain.create(
                 coin_store=self.coin_store,
                 block_store=self.block_store,
@@ -271,6 +287,7 @@ class FullNode:
                 reserved_cores=reserved_cores,
                 multiprocessing_context=self.multiprocessing_context,
                 single_threaded=single_threaded,
+                pairing_cache_name=pairing_cache_name,
             )
 
             self._mempool_manager = MempoolManager(
@@ -278,6 +295,10 @@ class FullNode:
                 consensus_constants=self.constants,
                 multiprocessing_context=self.multiprocessing_context,
                 single_threaded=single_threaded,
+                mempool_engine=self.config.get("mempool_engine", "sqlite"),
+                validation_batch_size=self.config.get("mempool_validation_batch_size", 20),
+                validation_batch_latency=self.config.get("mempool_validation_batch_latency_ms", 5) / 1000,
+                pairing_cache_name=pairing_cache_name,
             )
 
             # Transactions go into this queue from the server, and get sent to respond_transaction
@@ -358,6 +379,12 @@ class FullNode:
                 # same for mempool_manager
                 if self._mempool_manager is not None:
                     self.mempool_manager.shut_down()
+                # the workers using it have exited now
+                if self.pairing_cache is not None:
+                    if cached_bls.shared_cache() is self.pairing_cache:
+                        cached_bls.set_shared_cache(None)
+                    self.pairing_cache.close()
+                    self.pairing_cache = None
 
                 if self.full_node_peers is not None:
                     asyncio.create_task(self.full_node_peers.close())
@@ -375,6 +402,10 @@ class FullNode:
                 if self._sync_task is not None:
                     with contextlib.suppress(asyncio.CancelledError):
                         await self._sync_task
+                if self._blockchain is not None:
+                    with log_exceptions(log=self.log, message="failed to write block record snapshot", consume=True):
+                        await self.blockchain.write_snapshot()
+                    self.blockchain.close()
 
     @property
     def block_store(self) -> BlockStore:
@@ -1056,107 +1087,177 @@ class FullNode:
         # block between the main chain and the fork. Here "fork_point_height"
         # seems to refer to the first diverging block
 
+        async def request_blocks(peer: WSChiaConnection, start: uint32, end: uint32) -> Optional[List[FullBlock]]:
+            response = await peer.call_api(FullNodeAPI.request_blocks, RequestBlocks(start, end, True), timeout=30)
+            if isinstance(response, RespondBlocks):
+                return response.blocks
+            return None
+
+        new_peers_with_peak: List[WSChiaConnection] = peers_with_peak[:]
+
+        def get_peers() -> List[WSChiaConnection]:
+            nonlocal new_peers_with_peak
+            if self.sync_store.peers_changed.is_set():
+                new_peers_with_peak = self.get_peers_with_peak(peak_hash)
+                self.sync_store.peers_changed.clear()
+            return new_peers_with_peak
+
         async def fetch_block_batches(
             batch_queue: asyncio.Queue[Optional[Tuple[WSChiaConnection, List[FullBlock]]]]
         ) -> None:
-            start_height, end_height = 0, 0
-            new_peers_with_peak: List[WSChiaConnection] = peers_with_peak[:]
+            async def deliver(peer: WSChiaConnection, blocks: List[FullBlock]) -> None:
+                await batch_queue.put((peer, blocks))
+
+            downloader = BlockBatchDownloader(
+                request_blocks,
+                get_peers,
+                self.log,
+                max_in_flight=self.config.get("sync_blocks_in_flight", 8),
+            )
             try:
-                # block request ranges are *inclusive*, this requires some
-                # gymnastics of this range (+1 to make it exclusive, like normal
-                # ranges) and then -1 when forming the request message
-                for start_height in range(fork_point_height, target_peak_sb_height + 1, batch_size):
-                    end_height = min(target_peak_sb_height, start_height + batch_size - 1)
-                    request = RequestBlocks(uint32(start_height), uint32(end_height), True)
-                    fetched = False
-                    for peer in random.sample(new_peers_with_peak, len(new_peers_with_peak)):
-                        if peer.closed:
-                            continue
-                        response = await peer.call_api(FullNodeAPI.request_blocks, request, timeout=30)
-                        if response is None:
-                            await peer.close()
-                        elif isinstance(response, RespondBlocks):
-                            await batch_queue.put((peer, response.blocks))
-                            fetched = True
-                            break
-                    if fetched is False:
-                        self.log.error(f"failed fetching {start_height} to {end_height} from peers")
-                        return
-                    if self.sync_store.peers_changed.is_set():
-                        new_peers_with_peak = self.get_peers_with_peak(peak_hash)
-                        self.sync_store.peers_changed.clear()
+                # block request ranges are *inclusive*
+                await downloader.run(fork_point_height, target_peak_sb_height, batch_size, deliver)
             except Exception as e:
-                self.log.error(f"Exception fetching {start_height} to {end_height} from peer {e}")
+                self.log.error(f"Exception fetching {fork_point_height} to {target_peak_sb_height} from peers {e}")
             finally:
+                for peer_id, stats in downloader.peer_stats.items():
+                    self.log.debug(
+                        f"Fetched {stats.blocks} blocks from {peer_id} at {stats.blocks_per_second():.1f} blocks/s, "
+                        f"{stats.failures} failed requests"
+                    )
                 # finished signal with None
                 await batch_queue.put(None)
 
+        async def batch_added(
+            peer: WSChiaConnection,
+            blocks: List[FullBlock],
+            success: bool,
+            state_change_summary: Optional[StateChangeSummary],
+            err: Optional[Err],
+        ) -> None:
+            start_height = blocks[0].height
+            end_height = blocks[-1].height
+            if success is False:
+                await peer.close(600)
+                # check CHIP-0013 exception
+                if err == Err.CHIP_0013_VALIDATION:
+                    self.add_to_bad_peak_cache(peak_hash, target_peak_sb_height)
+                    raise ValidationError(err, f"Failed to validate block batch {start_height} to {end_height}")
+                raise ValueError(f"Failed to validate block batch {start_height} to {end_height}")
+            self.log.info(f"Added blocks {start_height} to {end_height}")
+            peak = self.blockchain.get_peak()
+            if state_change_summary is not None:
+                assert peak is not None
+                # Hints must be added to the DB. The other post-processing tasks are not required when syncing
+                hints_to_add, _ = get_hints_and_subscription_coin_ids(
+                    state_change_summary,
+                    self.subscriptions.has_coin_subscription,
+                    self.subscriptions.has_puzzle_subscription,
+                )
+                await self.hint_store.add_hints(hints_to_add)
+            # Note that end_height is not necessarily the peak at this
+            # point. In case of a re-org, it may even be significantly
+            # higher than _peak_height, and still not be the peak.
+            # clean_block_record() will not necessarily honor this cut-off
+            # height, in that case.
+            self.blockchain.clean_block_record(end_height - self.constants.BLOCKS_CACHE_SIZE)
+
         async def validate_block_batches(
             inner_batch_queue: asyncio.Queue[Optional[Tuple[WSChiaConnection, List[FullBlock]]]]
         ) -> None:
             fork_info: Optional[ForkInfo] = None
 
-            while True:
-                res: Optional[Tuple[WSChiaConnection, List[FullBlock]]] = await inner_batch_queue.get()
-                if res is None:
-                    self.log.debug("done fetching blocks")
-                    return None
-                peer, blocks = res
-                start_height = blocks[0].height
-                end_height = blocks[-1].height
-
-                # in case we're validating a reorg fork (i.e. not extending the
-                # main chain), we need to record the coin set from that fork in
-                # fork_info. Otherwise validation is very expensive, especially
-                # for deep reorgs
-                peak: Optional[BlockRecord]
-                if fork_info is None:
-                    peak = self.blockchain.get_peak()
-                    extending_main_chain: bool = peak is None or (
-                        peak.header_hash == blocks[0].prev_header_hash or peak.header_hash == blocks[0].header_hash
-                    )
-                    # if we're simply extending the main chain, it's important
-                    # *not* to pass in a ForkInfo object, as it can potentially
-                    # accrue a large state (with no value, since we can validate
-                    # against the CoinStore)
-                    if not extending_main_chain:
-                        if fork_point_height == 0:
-                            fork_info = ForkInfo(-1, -1, bytes32([0] * 32))
-                        else:
-                            fork_hash = self.blockchain.height_to_hash(uint32(fork_point_height - 1))
-                            assert fork_hash is not None
-                            fork_info = ForkInfo(fork_point_height - 1, fork_point_height - 1, fork_hash)
-
-                success, state_change_summary, err = await self.add_block_batch(
-                    blocks,
-                    peer.get_peer_logging(),
-                    fork_info,
-                    summaries,
+            # When we're extending the main chain, we pre-validate the next
+            # batch on the process pool while we add the previous one to the
+            # chain. Since the previous batch isn't in the chain yet, the next
+            # one is pre-validated against this augmented view of it.
+            chain = AugmentedBlockchain(self.blockchain)
+            # the batch being pre-validated in the background. We never
+            # pre-validate more than one batch ahead, to bound memory use
+            pending: Optional[Tuple[WSChiaConnection, List[FullBlock], asyncio.Task[List[PreValidationResult]]]] = None
+
+            async def add_pending(next_batch: Optional[Tuple[WSChiaConnection, List[FullBlock]]]) -> None:
+                """
+                Waits for the pending batch's pre-validation to finish and adds
+                it to the chain. If next_batch is specified, it's pre-validated
+                while we do so.
+                """
+                nonlocal pending
+                assert pending is not None
+                peer, blocks, task = pending
+                pending = None
+                pre_validation_results = await task
+                if next_batch is not None and all(pvr.error is None for pvr in pre_validation_results):
+                    for block, pvr in zip(blocks, pre_validation_results):
+                        assert pvr.required_iters is not None
+                        chain.add_extra_block(
+                            block, block_to_block_record(self.constants, chain, pvr.required_iters, block, None)
+                        )
+                    next_task = asyncio.create_task(self.pre_validate_block_batch(next_batch[1], summaries, chain))
+                    pending = (next_batch[0], next_batch[1], next_task)
+                success, state_change_summary, err = await self.add_prevalidated_blocks(
+                    blocks, pre_validation_results, peer.get_peer_logging(), None
                 )
-                if success is False:
-                    await peer.close(600)
-                    # check CHIP-0013 exception
-                    if err == Err.CHIP_0013_VALIDATION:
-                        self.add_to_bad_peak_cache(peak_hash, target_peak_sb_height)
-                        raise ValidationError(err, f"Failed to validate block batch {start_height} to {end_height}")
-                    raise ValueError(f"Failed to validate block batch {start_height} to {end_height}")
-                self.log.info(f"Added blocks {start_height} to {end_height}")
-                peak = self.blockchain.get_peak()
-                if state_change_summary is not None:
-                    assert peak is not None
-                    # Hints must be added to the DB. The other post-processing tasks are not required when syncing
-                    hints_to_add, _ = get_hints_and_subscription_coin_ids(
-                        state_change_summary,
-                        self.subscriptions.has_coin_subscription,
-                        self.subscriptions.has_puzzle_subscription,
+                for block in blocks:
+                    chain.remove_extra_block(block.header_hash)
+                await batch_added(peer, blocks, success, state_change_summary, err)
+
+            try:
+                while True:
+                    res: Optional[Tuple[WSChiaConnection, List[FullBlock]]] = await inner_batch_queue.get()
+                    if res is None:
+                        self.log.debug("done fetching blocks")
+                        break
+                    peer, blocks = res
+
+                    if pending is not None:
+                        if blocks[0].prev_header_hash == pending[1][-1].header_hash:
+                            await add_pending(res)
+                            continue
+                        await add_pending(None)
+
+                    # in case we're validating a reorg fork (i.e. not extending the
+                    # main chain), we need to record the coin set from that fork in
+                    # fork_info. Otherwise validation is very expensive, especially
+                    # for deep reorgs
+                    peak: Optional[BlockRecord]
+                    if fork_info is None:
+                        peak = self.blockchain.get_peak()
+                        extending_main_chain: bool = peak is None or (
+                            peak.header_hash == blocks[0].prev_header_hash or peak.header_hash == blocks[0].header_hash
+                        )
+                        # if we're simply extending the main chain, it's important
+                        # *not* to pass in a ForkInfo object, as it can potentially
+                        # accrue a large state (with no value, since we can validate
+                        # against the CoinStore)
+                        if not extending_main_chain:
+                            if fork_point_height == 0:
+                                fork_info = ForkInfo(-1, -1, bytes32([0] * 32))
+                            else:
+                                fork_hash = self.blockchain.height_to_hash(uint32(fork_point_height - 1))
+                                assert fork_hash is not None
+                                fork_info = ForkInfo(fork_point_height - 1, fork_point_height - 1, fork_hash)
+                        elif peak is not None and peak.header_hash == blocks[0].prev_header_hash:
+                            # none of these blocks can be in the chain already,
+                            # so we can start pre-validating them in the
+                            # background
+                            task = asyncio.create_task(self.pre_validate_block_batch(blocks, summaries, chain))
+                            pending = (peer, blocks, task)
+                            continue
+
+                    success, state_change_summary, err = await self.add_block_batch(
+                        blocks,
+                        peer.get_peer_logging(),
+                        fork_info,
+                        summaries,
                     )
-                    await self.hint_store.add_hints(hints_to_add)
-                # Note that end_height is not necessarily the peak at this
-                # point. In case of a re-org, it may even be significantly
-                # higher than _peak_height, and still not be the peak.
-                # clean_block_record() will not necessarily honor this cut-off
-                # height, in that case.
-                self.blockchain.clean_block_record(end_height - self.constants.BLOCKS_CACHE_SIZE)
+                    await batch_added(peer, blocks, success, state_change_summary, err)
+
+                if pending is not None:
+                    await add_pending(None)
+            finally:
+                if pending is not None:
+                    pending[2].cancel()
 
         batch_queue_input: asyncio.Queue[Optional[Tuple[WSChiaConnection, List[FullBlock]]]] = asyncio.Queue(
             maxsize=buffer_size
@@ -1190,27 +1291,40 @@ class FullNode:
         self.log.debug(
             f"update_wallets - fork_height: {wallet_update.fork_height}, peak_height: {wallet_update.peak.height}"
         )
-        changes_for_peer: Dict[bytes32, Set[CoinState]] = {}
-        for coin_record in wallet_update.coin_records:
-            coin_id = coin_record.name
-            subscribed_peers = self.subscriptions.peers_for_coin_id(coin_id)
-            subscribed_peers.update(self.subscriptions.peers_for_puzzle_hash(coin_record.coin.puzzle_hash))
-            hint = wallet_update.hints.get(coin_id)
-            if hint is not None:
-                subscribed_peers.update(self.subscriptions.peers_for_puzzle_hash(hint))
-            for peer in subscribed_peers:
-                changes_for_peer.setdefault(peer, set()).add(coin_record.coin_state)
-
+        start = time.monotonic()
+        changes_for_peer = self.subscriptions.coin_states_for_peers(wallet_update.coin_records, wallet_update.hints)
+        lookup_time = time.monotonic() - start
+
+        # sending only puts the message on the connection's outgoing queue, the
+        # outbound handler of each connection writes it to the socket. A wallet
+        # that can't keep up would make its queue grow without bounds, so we
+        # disconnect it instead. It will resync once it reconnects
+        max_pending = self.config.get("max_pending_wallet_messages", 1000)
         for peer, changes in changes_for_peer.items():
             connection = self.server.all_connections.get(peer)
-            if connection is not None:
-                state = CoinStateUpdate(
-                    wallet_update.peak.height,
-                    wallet_update.fork_height,
-                    wallet_update.peak.header_hash,
-                    list(changes),
+            if connection is None:
+                continue
+            if connection.outgoing_queue.qsize() >= max_pending:
+                self.log.warning(
+                    f"Closing connection to wallet {connection.peer_info.host}, "
+                    f"it has {connection.outgoing_queue.qsize()} messages queued"
                 )
-                await connection.send_message(make_msg(ProtocolMessageTypes.coin_state_update, state))
+                await connection.close()
+                continue
+            state = CoinStateUpdate(
+                wallet_update.peak.height,
+                wallet_update.fork_height,
+                wallet_update.peak.header_hash,
+                changes,
+            )
+            await connection.send_message(make_msg(ProtocolMessageTypes.coin_state_update, state))
+
+        total_time = time.monotonic() - start
+        self.log.log(
+            logging.WARNING if total_time > 1 else logging.DEBUG,
+            f"update_wallets at height {wallet_update.peak.height}: {len(wallet_update.coin_records)} coin records, "
+            f"{len(changes_for_peer)} peers, lookup: {lookup_time:0.3f}s, total: {total_time:0.3f}s",
+        )
 
         # Tell wallets about the new peak
         new_peak_message = make_msg(
@@ -1271,12 +1385,46 @@ class FullNode:
         if len(blocks_to_validate) == 0:
             return True, None, None
 
+        pre_validation_results = await self.pre_validate_block_batch(blocks_to_validate, wp_summaries)
+        return await self.add_prevalidated_blocks(blocks_to_validate, pre_validation_results, peer_info, fork_info)
+
+    async def pre_validate_block_batch(
+        self,
+        blocks: List[FullBlock],
+        wp_summaries: Optional[List[SubEpochSummary]],
+        chain: Optional[AugmentedBlockchain] = None,
+    ) -> List[PreValidationResult]:
+        """
+        Pre-validates the blocks on the process pool. If chain is specified,
+        the blocks are pre-validated against it, rather than the blockchain.
+        This allows pre-validating blocks whose parents haven't been added to
+        the blockchain yet.
+        """
         # Validates signatures in multiprocessing since they take a while, and we don't have cached transactions
         # for these blocks (unlike during normal operation where we validate one at a time)
         pre_validate_start = time.monotonic()
-        pre_validation_results: List[PreValidationResult] = await self.blockchain.pre_validate_blocks_multiprocessing(
-            blocks_to_validate, {}, wp_summaries=wp_summaries, validate_signatures=True
-        )
+        # the blocks are pre-validated one at a time, so look up the generators
+        # they reference up-front, in a single query
+        await self.blockchain.prefetch_generators(blocks)
+        pre_validation_results: List[PreValidationResult]
+        if chain is None:
+            pre_validation_results = await self.blockchain.pre_validate_blocks_multiprocessing(
+                blocks, {}, wp_summaries=wp_summaries, validate_signatures=True
+            )
+        else:
+            pre_validation_results = await pre_validate_blocks_multiprocessing(
+                self.constants,
+                chain,
+                blocks,
+                self.blockchain.pool,
+                True,
+                {},
+                chain.get_block_generator,
+                4,
+                wp_summaries,
+                validate_signatures=True,
+            )
+            chain.clear_temp_records()
         pre_validate_end = time.monotonic()
         pre_validate_time = pre_validate_end - pre_validate_start
 
@@ -1284,8 +1432,18 @@ class FullNode:
             logging.WARNING if pre_validate_time > 10 else logging.DEBUG,
             f"Block pre-validation: {pre_validate_end - pre_validate_start:0.2f}s "
             f"CLVM: {sum([pvr.timing/1000.0 for pvr in pre_validation_results]):0.2f}s "
-            f"({len(blocks_to_validate)} blocks, start height: {blocks_to_validate[0].height})",
+            f"({len(blocks)} blocks, start height: {blocks[0].height})",
         )
+        return pre_validation_results
+
+    async def add_prevalidated_blocks(
+        self,
+        blocks_to_validate: List[FullBlock],
+        pre_validation_results: List[PreValidationResult],
+        peer_info: PeerInfo,
+        fork_info: Optional[ForkInfo],
+    ) -> Tuple[bool, Optional[StateChangeSummary], Optional[Err]]:
+        add_start = time.monotonic()
         for i, block in enumerate(blocks_to_validate):
             if pre_validation_results[i].error is not None:
                 self.log.error(f"Invalid block from peer: {peer_info} {Err(pre_validation_results[i].error)}")
@@ -1332,7 +1490,7 @@ class FullNode:
         if agg_state_change_summary is not None:
             self._state_changed("new_peak")
             self.log.debug(
-                f"Total time for {len(blocks_to_validate)} blocks: {time.monotonic() - pre_validate_start}, "
+                f"Total time for adding {len(blocks_to_validate)} blocks: {time.monotonic() - add_start}, "
                 f"advanced: True"
             )
         return True, agg_state_change_summary, None
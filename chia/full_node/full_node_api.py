@@ -345,47 +345,32 @@ class FullNodeAPI:
                 msg = make_msg(ProtocolMessageTypes.reject_blocks, reject)
                 return msg
 
-        if not request.include_transaction_block:
-            blocks: List[FullBlock] = []
-            for i in range(request.start_height, request.end_height + 1):
-                header_hash_i: Optional[bytes32] = self.full_node.blockchain.height_to_hash(uint32(i))
-                if header_hash_i is None:
-                    reject = RejectBlocks(request.start_height, request.end_height)
-                    return make_msg(ProtocolMessageTypes.reject_blocks, reject)
-
-                block: Optional[FullBlock] = await self.full_node.block_store.get_full_block(header_hash_i)
-                if block is None:
-                    reject = RejectBlocks(request.start_height, request.end_height)
-                    return make_msg(ProtocolMessageTypes.reject_blocks, reject)
-                block = block.replace(transactions_generator=None)
-                blocks.append(block)
-            msg = make_msg(
-                ProtocolMessageTypes.respond_blocks,
-                full_node_protocol.RespondBlocks(request.start_height, request.end_height, blocks),
-            )
-        else:
-            blocks_bytes: List[bytes] = []
-            for i in range(request.start_height, request.end_height + 1):
-                header_hash_i = self.full_node.blockchain.height_to_hash(uint32(i))
-                if header_hash_i is None:
-                    reject = RejectBlocks(request.start_height, request.end_height)
-                    return make_msg(ProtocolMessageTypes.reject_blocks, reject)
-                block_bytes: Optional[bytes] = await self.full_node.block_store.get_full_block_bytes(header_hash_i)
-                if block_bytes is None:
-                    reject = RejectBlocks(request.start_height, request.end_height)
-                    msg = make_msg(ProtocolMessageTypes.reject_blocks, reject)
-                    return msg
-
-                blocks_bytes.append(block_bytes)
-
-            respond_blocks_manually_streamed: bytes = (
-                uint32(request.start_height).stream_to_bytes()
-                + uint32(request.end_height).stream_to_bytes()
-                + uint32(len(blocks_bytes)).stream_to_bytes()
-            )
-            for block_bytes in blocks_bytes:
-                respond_blocks_manually_streamed += block_bytes
-            msg = make_msg(ProtocolMessageTypes.respond_blocks, respond_blocks_manually_streamed)
+        blocks_stream = self.full_node.block_store.stream_block_bytes_in_range(request.start_height, request.end_height)
+        try:
+            if not request.include_transaction_block:
+                blocks: List[FullBlock] = []
+                async for block_bytes in blocks_stream:
+                    block = FullBlock.from_bytes_unchecked(block_bytes)
+                    blocks.append(block.replace(transactions_generator=None))
+                msg = make_msg(
+                    ProtocolMessageTypes.respond_blocks,
+                    full_node_protocol.RespondBlocks(request.start_height, request.end_height, blocks),
+                )
+            else:
+                # the blocks are already serialized, so we build the message
+                # by concatenating them, rather than parsing them only to
+                # serialize them again
+                respond_blocks_manually_streamed = bytearray(
+                    uint32(request.start_height).stream_to_bytes()
+                    + uint32(request.end_height).stream_to_bytes()
+                    + uint32(request.end_height - request.start_height + 1).stream_to_bytes()
+                )
+                async for block_bytes in blocks_stream:
+                    respond_blocks_manually_streamed += block_bytes
+                msg = make_msg(ProtocolMessageTypes.respond_blocks, bytes(respond_blocks_manually_streamed))
+        except ValueError:
+            reject = RejectBlocks(request.start_height, request.end_height)
+            return make_msg(ProtocolMessageTypes.reject_blocks, reject)
 
         return msg
 
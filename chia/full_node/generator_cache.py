@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from chia.types.blockchain_format.serialized_program import SerializedProgram
+from chia.util.ints import uint32
+from chia.util.lru_cache import MeteredLRUCache
+
+# the default limit of the total size of the cached generators, in bytes
+DEFAULT_GENERATOR_CACHE_SIZE = 64 * 1024 * 1024
+
+
+class GeneratorCache(MeteredLRUCache[uint32, SerializedProgram]):
+    """
+    The transaction generators of main chain blocks, by height. Blocks refer to
+    the generators of earlier blocks, and a few of them are referenced over and
+    over. Every generator is put with its serialized size as its weight, so
+    the least recently used ones are evicted once the cache holds more than
+    max_size bytes.
+    """
+
+    def __init__(self, max_size: int):
+        super().__init__(max_size)
+        # bumped whenever the main chain is rolled back. Generators read from
+        # the database before a rollback must not be added to the cache after it
+        self.generation = 0
+
+    def rollback(self, fork_height: int) -> None:
+        """
+        Removes the generators of all blocks above fork_height, since they are
+        no longer part of the main chain.
+        """
+        self.generation += 1
+        for height in [h for h in self.cache if h > fork_height]:
+            self.remove(height)
@@ -2,11 +2,15 @@ from __future__ import annotations
 
 import logging
 import sqlite3
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
-from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+from typing import Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Type
 
 from chia_rs import AugSchemeMPL, Coin, G2Element
+from chiabip158 import PyBIP158
+from sortedcontainers import SortedList
 
 from chia.consensus.constants import ConsensusConstants
 from chia.consensus.default_constants import DEFAULT_CONSTANTS
@@ -53,8 +57,51 @@ class MempoolRemoveReason(Enum):
     EXPIRED = 4
 
 
-class Mempool:
-    _db_conn: sqlite3.Connection
+@dataclass
+class BlockTemplate:
+    """
+    The state of a block bundle being built from mempool items, in order of
+    decreasing fee rate. It's kept around between calls so that it can be
+    extended with new items, rather than rebuilt from scratch.
+    """
+
+    height: uint32
+    # This contains:
+    # 1. A map of coin ID to a coin spend solution and its isolated cost
+    #   We reconstruct it for every template we create from mempool items because we
+    #   deduplicate on the first coin spend solution that comes with the highest
+    #   fee rate item, and that can change across templates
+    # 2. A map of fast forward eligible singleton puzzle hash to the most
+    #   recent unspent singleton data, to allow chaining fast forward
+    #   singleton spends
+    eligible_coin_spends: EligibleCoinSpends = field(default_factory=EligibleCoinSpends)
+    coin_spends: List[CoinSpend] = field(default_factory=list)
+    sigs: List[G2Element] = field(default_factory=list)
+    additions: List[Coin] = field(default_factory=list)
+    cost_sum: int = 0  # Checks that total cost does not exceed block maximum
+    fee_sum: int = 0  # Checks that total fees don't exceed 64 bits
+    processed_spend_bundles: int = 0
+    skipped_items: int = 0
+    # the items we've looked at, whether they made it into the block or not
+    considered: Set[bytes32] = field(default_factory=set)
+    # the fee rate of the last item we looked at. Items with a higher fee rate
+    # would have been looked at before it
+    lowest_fee_per_cost: Optional[float] = None
+    # set once the block can't take any more items
+    complete: bool = False
+    # items that were added to the mempool after we looked at all the others,
+    # with a lower fee rate than any of them (name and fee)
+    pending: List[Tuple[bytes32, int]] = field(default_factory=list)
+    bundle: Optional[SpendBundle] = None
+
+
+class MempoolBase(ABC):
+    """
+    The state and logic shared by all mempool engines. Subclasses implement the
+    storage and indexing of the items, ordered by fee rate (and insertion order
+    as a tie-breaker).
+    """
+
     # it's expensive to serialize and deserialize G2Element, so we keep those in
     # this separate dictionary
     _items: Dict[bytes32, InternalMempoolItem]
@@ -66,13 +113,338 @@ class Mempool:
     _total_fee: int
     _total_cost: int
 
+    # the block bundle we built most recently, if it's still up to date
+    _block_template: Optional[BlockTemplate]
+
+    # the encoded BIP158 filter of all item names. It's built on demand and
+    # cleared whenever an item is added or removed
+    _filter: Optional[bytes]
+
     def __init__(self, mempool_info: MempoolInfo, fee_estimator: FeeEstimatorInterface):
-        self._db_conn = sqlite3.connect(":memory:")
         self._items = {}
         self._block_height = uint32(0)
         self._timestamp = uint64(0)
         self._total_fee = 0
         self._total_cost = 0
+        self._block_template = None
+        self._filter = None
+        self.mempool_info: MempoolInfo = mempool_info
+        self.fee_estimator: FeeEstimatorInterface = fee_estimator
+
+    def total_mempool_fees(self) -> int:
+        return self._total_fee
+
+    def total_mempool_cost(self) -> CLVMCost:
+        return CLVMCost(uint64(self._total_cost))
+
+    @abstractmethod
+    def all_items(self) -> Iterator[MempoolItem]:
+        ...
+
+    @abstractmethod
+    def all_item_ids(self) -> List[bytes32]:
+        ...
+
+    @abstractmethod
+    def items_by_feerate(self) -> Iterator[MempoolItem]:
+        ...
+
+    @abstractmethod
+    def size(self) -> int:
+        ...
+
+    @abstractmethod
+    def get_item_by_id(self, item_id: bytes32) -> Optional[MempoolItem]:
+        ...
+
+    @abstractmethod
+    def get_items_by_coin_id(self, spent_coin_id: bytes32) -> List[MempoolItem]:
+        ...
+
+    @abstractmethod
+    def get_items_by_coin_ids(self, spent_coin_ids: List[bytes32]) -> List[MempoolItem]:
+        ...
+
+    @abstractmethod
+    def get_min_fee_rate(self, cost: int) -> Optional[float]:
+        """
+        Gets the minimum fpc rate that a transaction with specified cost will need in order to get included.
+        """
+
+    @abstractmethod
+    def new_tx_block(self, block_height: uint32, timestamp: uint64) -> None:
+        """
+        Remove all items that became invalid because of this new height and
+        timestamp. (we don't know about which coins were spent in this new block
+        here, so those are handled separately)
+        """
+
+    @abstractmethod
+    def remove_from_pool(self, items: List[bytes32], reason: MempoolRemoveReason) -> None:
+        """
+        Removes an item from the mempool.
+        """
+
+    @abstractmethod
+    def add_to_pool(self, item: MempoolItem) -> Optional[Err]:
+        """
+        Adds an item to the mempool by kicking out transactions (if it doesn't fit), in order of increasing fee per cost
+        """
+
+    @abstractmethod
+    def _names_and_fees_by_feerate(self) -> Iterator[Tuple[bytes32, int]]:
+        """
+        Yields the name and fee of every item, in the order they should be
+        considered for inclusion in a block
+        """
+
+    @abstractmethod
+    def _names_by_feerate(self, offset: int, limit: int) -> List[bytes32]:
+        """
+        Returns the names of up to limit items, starting at position offset
+        in the order of _names_and_fees_by_feerate()
+        """
+
+    def get_filter(self) -> bytes:
+        """
+        Returns the encoded BIP158 filter of the names of all items
+        """
+        if self._filter is None:
+            tx_filter = PyBIP158([bytearray(name) for name in self._items])
+            self._filter = bytes(tx_filter.GetEncoded())
+        return self._filter
+
+    def spend_bundles_by_feerate(self, page_size: int = 100) -> Iterator[Tuple[bytes32, SpendBundle]]:
+        """
+        Yields the name and spend bundle of every item, in the same order as
+        items_by_feerate(). The names are read from the fee rate index in
+        pages, the first one of page_size and each one after that twice as
+        large, so stopping after n items costs O(n) no matter how many items
+        the mempool holds. The mempool must not be modified while iterating
+        """
+        offset = 0
+        while True:
+            names = self._names_by_feerate(offset, page_size)
+            for name in names:
+                yield name, self._items[name].spend_bundle
+            if len(names) < page_size:
+                return
+            offset += page_size
+            page_size *= 2
+
+    def _items_changed(self) -> None:
+        self._filter = None
+
+    def _notify_removed(self, removed_items: List[MempoolItemInfo]) -> None:
+        info = FeeMempoolInfo(self.mempool_info, self.total_mempool_cost(), self.total_mempool_fees(), datetime.now())
+        for iteminfo in removed_items:
+            self.fee_estimator.remove_mempool_item(info, iteminfo)
+
+    def _notify_added(self, item: MempoolItem) -> None:
+        info = FeeMempoolInfo(self.mempool_info, self.total_mempool_cost(), self.total_mempool_fees(), datetime.now())
+        self.fee_estimator.add_mempool_item(info, MempoolItemInfo(item.cost, item.fee, item.height_added_to_mempool))
+
+    def at_full_capacity(self, cost: int) -> bool:
+        """
+        Checks whether the mempool is at full capacity and cannot accept a transaction with size cost.
+        """
+
+        return self._total_cost + cost > self.mempool_info.max_size_in_cost
+
+    def _template_item_added(self, item: MempoolItem) -> None:
+        """
+        Keeps the block template in sync with a newly added item. Items with a
+        lower fee rate than everything the template has looked at can be
+        appended to it, anything else requires a new scan of the mempool
+        """
+        template = self._block_template
+        if template is None:
+            return
+        if template.lowest_fee_per_cost is not None and item.fee_per_cost > template.lowest_fee_per_cost:
+            self._block_template = None
+        elif not template.complete:
+            template.pending.append((item.name, item.fee))
+            template.lowest_fee_per_cost = item.fee_per_cost
+
+    def _template_items_removed(self, names: List[bytes32]) -> None:
+        template = self._block_template
+        if template is None:
+            return
+        pending = {name for name, _ in template.pending}
+        if any(name in template.considered or name in pending for name in names):
+            self._block_template = None
+
+    async def _add_to_block_template(
+        self,
+        template: BlockTemplate,
+        name: bytes32,
+        fee: int,
+        get_unspent_lineage_info_for_puzzle_hash: Callable[[bytes32], Awaitable[Optional[UnspentLineageInfo]]],
+        constants: ConsensusConstants,
+    ) -> None:
+        """
+        Considers the item for inclusion in the block template, marking the
+        template as complete when it can't take any more items
+        """
+        template.considered.add(name)
+        item = self._items[name]
+        try:
+            assert item.npc_result.conds is not None
+            cost = item.npc_result.conds.cost
+            if template.skipped_items >= PRIORITY_TX_THRESHOLD:
+                # If we've encountered `PRIORITY_TX_THRESHOLD` number of
+                # transactions that don't fit in the remaining block size,
+                # we want to keep looking for smaller transactions that
+                # might fit, but we also want to avoid spending too much
+                # time on potentially expensive ones, hence this shortcut.
+                unique_coin_spends = []
+                unique_additions = []
+                for spend_data in item.bundle_coin_spends.values():
+                    if spend_data.eligible_for_dedup or spend_data.eligible_for_fast_forward:
+                        raise Exception(f"Skipping transaction with eligible coin(s): {name.hex()}")
+                    unique_coin_spends.append(spend_data.coin_spend)
+                    unique_additions.extend(spend_data.additions)
+                cost_saving = 0
+            else:
+                await template.eligible_coin_spends.process_fast_forward_spends(
+                    mempool_item=item,
+                    get_unspent_lineage_info_for_puzzle_hash=get_unspent_lineage_info_for_puzzle_hash,
+                    height=template.height,
+                    constants=constants,
+                )
+                (
+                    unique_coin_spends,
+                    cost_saving,
+                    unique_additions,
+                ) = template.eligible_coin_spends.get_deduplication_info(
+                    bundle_coin_spends=item.bundle_coin_spends, max_cost=cost
+                )
+            item_cost = cost - cost_saving
+            log.info(
+                "Cumulative cost: %d, fee per cost: %0.4f, item cost: %d", template.cost_sum, fee / item_cost, item_cost
+            )
+            new_fee_sum = template.fee_sum + fee
+            if new_fee_sum > DEFAULT_CONSTANTS.MAX_COIN_AMOUNT:
+                # Such a fee is very unlikely to happen but we're defensively
+                # accounting for it
+                template.complete = True  # pragma: no cover
+                return  # pragma: no cover
+            new_cost_sum = template.cost_sum + item_cost
+            if new_cost_sum > self.mempool_info.max_block_clvm_cost:
+                # Let's skip this item
+                log.info(
+                    "Skipping mempool item. Cumulative cost %d exceeds maximum block cost %d",
+                    new_cost_sum,
+                    self.mempool_info.max_block_clvm_cost,
+                )
+                template.skipped_items += 1
+                # Let's stop taking more items if we skipped `MAX_SKIPPED_ITEMS`
+                if template.skipped_items >= MAX_SKIPPED_ITEMS:
+                    template.complete = True
+                return
+            template.coin_spends.extend(unique_coin_spends)
+            template.additions.extend(unique_additions)
+            template.sigs.append(item.spend_bundle.aggregated_signature)
+            template.cost_sum = new_cost_sum
+            template.fee_sum = new_fee_sum
+            template.processed_spend_bundles += 1
+            template.bundle = None
+            # Let's stop taking more items if we don't have enough cost left
+            # for at least `MIN_COST_THRESHOLD` because that would mean we're
+            # getting very close to the limit anyway and *probably* won't
+            # find transactions small enough to fit at this point
+            if self.mempool_info.max_block_clvm_cost - template.cost_sum < MIN_COST_THRESHOLD:
+                template.complete = True
+        except Exception as e:
+            log.debug(f"Exception while checking a mempool item for deduplication: {e}")
+
+    def _block_template_result(self, template: BlockTemplate) -> Optional[Tuple[SpendBundle, List[Coin]]]:
+        if template.processed_spend_bundles == 0:
+            return None
+        log.info(
+            f"Cumulative cost of block (real cost should be less) {template.cost_sum}. Proportion "
+            f"full: {template.cost_sum / self.mempool_info.max_block_clvm_cost}"
+        )
+        if template.bundle is None:
+            aggregated_signature = AugSchemeMPL.aggregate(template.sigs)
+            template.bundle = SpendBundle(template.coin_spends, aggregated_signature)
+        return template.bundle, template.additions[:]
+
+    async def _fill_block_template(
+        self,
+        template: BlockTemplate,
+        names_and_fees: Iterable[Tuple[bytes32, int]],
+        get_unspent_lineage_info_for_puzzle_hash: Callable[[bytes32], Awaitable[Optional[UnspentLineageInfo]]],
+        constants: ConsensusConstants,
+    ) -> None:
+        for name, fee in names_and_fees:
+            if template.complete:
+                break
+            item = self._items[name]
+            assert item.npc_result.conds is not None
+            template.lowest_fee_per_cost = fee / item.npc_result.conds.cost
+            await self._add_to_block_template(template, name, fee, get_unspent_lineage_info_for_puzzle_hash, constants)
+
+    async def create_bundle_from_mempool_items(
+        self,
+        item_inclusion_filter: Callable[[bytes32], bool],
+        get_unspent_lineage_info_for_puzzle_hash: Callable[[bytes32], Awaitable[Optional[UnspentLineageInfo]]],
+        constants: ConsensusConstants,
+        height: uint32,
+    ) -> Optional[Tuple[SpendBundle, List[Coin]]]:
+        template = BlockTemplate(height)
+        log.info(f"Starting to make block, max cost: {self.mempool_info.max_block_clvm_cost}")
+        await self._fill_block_template(
+            template,
+            ((name, fee) for name, fee in self._names_and_fees_by_feerate() if item_inclusion_filter(name)),
+            get_unspent_lineage_info_for_puzzle_hash,
+            constants,
+        )
+        return self._block_template_result(template)
+
+    async def create_bundle_from_block_template(
+        self,
+        get_unspent_lineage_info_for_puzzle_hash: Callable[[bytes32], Awaitable[Optional[UnspentLineageInfo]]],
+        constants: ConsensusConstants,
+        height: uint32,
+    ) -> Optional[Tuple[SpendBundle, List[Coin]]]:
+        """
+        Like create_bundle_from_mempool_items() (including all items), but
+        picks up the block template from the previous call, as long as the
+        mempool hasn't changed in a way that affects it. This makes repeated
+        calls for the same peak cheap, regardless of the size of the mempool.
+        """
+        template = self._block_template
+        if template is None or template.height != height:
+            template = BlockTemplate(height)
+            log.info(f"Starting to make block, max cost: {self.mempool_info.max_block_clvm_cost}")
+            await self._fill_block_template(
+                template, self._names_and_fees_by_feerate(), get_unspent_lineage_info_for_puzzle_hash, constants
+            )
+            self._block_template = template
+        elif len(template.pending) > 0:
+            pending = template.pending
+            template.pending = []
+            for name, fee in pending:
+                if template.complete:
+                    break
+                await self._add_to_block_template(
+                    template, name, fee, get_unspent_lineage_info_for_puzzle_hash, constants
+                )
+        return self._block_template_result(template)
+
+
+class Mempool(MempoolBase):
+    """
+    The default mempool engine, which keeps its items in an in-memory SQLite
+    database
+    """
+
+    _db_conn: sqlite3.Connection
+
+    def __init__(self, mempool_info: MempoolInfo, fee_estimator: FeeEstimatorInterface):
+        super().__init__(mempool_info, fee_estimator)
+        self._db_conn = sqlite3.connect(":memory:")
 
         with self._db_conn:
             # name means SpendBundle hash
@@ -95,7 +467,9 @@ class Mempool:
                 """
             )
             self._db_conn.execute("CREATE INDEX name_idx ON tx(name)")
-            self._db_conn.execute("CREATE INDEX feerate ON tx(fee_per_cost)")
+            # seq is part of the index so that fee rate order can be read from
+            # it, without sorting the items with the same fee rate
+            self._db_conn.execute("CREATE INDEX feerate ON tx(fee_per_cost DESC, seq ASC)")
             self._db_conn.execute(
                 "CREATE INDEX assert_before ON tx(assert_before_height, assert_before_seconds) "
                 "WHERE assert_before_height IS NOT NULL OR assert_before_seconds IS NOT NULL"
@@ -112,9 +486,6 @@ class Mempool:
             self._db_conn.execute("CREATE INDEX spend_by_coin ON spends(coin_id)")
             self._db_conn.execute("CREATE INDEX spend_by_bundle ON spends(tx)")
 
-        self.mempool_info: MempoolInfo = mempool_info
-        self.fee_estimator: FeeEstimatorInterface = fee_estimator
-
     def __del__(self) -> None:
         self._db_conn.close()
 
@@ -138,12 +509,6 @@ class Mempool:
             bundle_coin_spends=item.bundle_coin_spends,
         )
 
-    def total_mempool_fees(self) -> int:
-        return self._total_fee
-
-    def total_mempool_cost(self) -> CLVMCost:
-        return CLVMCost(uint64(self._total_cost))
-
     def all_items(self) -> Iterator[MempoolItem]:
         with self._db_conn:
             cursor = self._db_conn.execute("SELECT * FROM tx")
@@ -197,10 +562,6 @@ class Mempool:
         return items
 
     def get_min_fee_rate(self, cost: int) -> Optional[float]:
-        """
-        Gets the minimum fpc rate that a transaction with specified cost will need in order to get included.
-        """
-
         if not self.at_full_capacity(cost):
             return 0
 
@@ -225,11 +586,6 @@ class Mempool:
             return None
 
     def new_tx_block(self, block_height: uint32, timestamp: uint64) -> None:
-        """
-        Remove all items that became invalid because of this new height and
-        timestamp. (we don't know about which coins were spent in this new block
-        here, so those are handled separately)
-        """
         with self._db_conn:
             cursor = self._db_conn.execute(
                 "SELECT name FROM tx WHERE assert_before_seconds <= ? OR assert_before_height <= ?",
@@ -240,27 +596,33 @@ class Mempool:
         self.remove_from_pool(to_remove, MempoolRemoveReason.EXPIRED)
         self._block_height = block_height
         self._timestamp = timestamp
+        # the coins spent in the new block may have changed the latest
+        # versions of fast forward singletons
+        self._block_template = None
+
+    def _removed_item_infos(self, items: List[bytes32]) -> List[MempoolItemInfo]:
+        removed_items: List[MempoolItemInfo] = []
+        for batch in to_batches(items, SQLITE_MAX_VARIABLE_NUMBER):
+            args = ",".join(["?"] * len(batch.entries))
+            with self._db_conn:
+                cursor = self._db_conn.execute(f"SELECT name, cost, fee FROM tx WHERE name in ({args})", batch.entries)
+                for row in cursor:
+                    name = bytes32(row[0])
+                    internal_item = self._items[name]
+                    item = MempoolItemInfo(int(row[1]), int(row[2]), internal_item.height_added_to_mempool)
+                    removed_items.append(item)
+        return removed_items
 
     def remove_from_pool(self, items: List[bytes32], reason: MempoolRemoveReason) -> None:
-        """
-        Removes an item from the mempool.
-        """
         if items == []:
             return
 
+        self._template_items_removed(items)
+        self._items_changed()
+
         removed_items: List[MempoolItemInfo] = []
         if reason != MempoolRemoveReason.BLOCK_INCLUSION:
-            for batch in to_batches(items, SQLITE_MAX_VARIABLE_NUMBER):
-                args = ",".join(["?"] * len(batch.entries))
-                with self._db_conn:
-                    cursor = self._db_conn.execute(
-                        f"SELECT name, cost, fee FROM tx WHERE name in ({args})", batch.entries
-                    )
-                    for row in cursor:
-                        name = bytes32(row[0])
-                        internal_item = self._items[name]
-                        item = MempoolItemInfo(int(row[1]), int(row[2]), internal_item.height_added_to_mempool)
-                        removed_items.append(item)
+            removed_items = self._removed_item_infos(items)
 
         for name in items:
             self._items.pop(name)
@@ -282,17 +644,9 @@ class Mempool:
             assert self._total_fee >= 0
 
         if reason != MempoolRemoveReason.BLOCK_INCLUSION:
-            info = FeeMempoolInfo(
-                self.mempool_info, self.total_mempool_cost(), self.total_mempool_fees(), datetime.now()
-            )
-            for iteminfo in removed_items:
-                self.fee_estimator.remove_mempool_item(info, iteminfo)
+            self._notify_removed(removed_items)
 
     def add_to_pool(self, item: MempoolItem) -> Optional[Err]:
-        """
-        Adds an item to the mempool by kicking out transactions (if it doesn't fit), in order of increasing fee per cost
-        """
-
         assert item.fee < MEMPOOL_ITEM_FEE_LIMIT
         assert item.npc_result.conds is not None
         assert item.cost <= self.mempool_info.max_block_clvm_cost
@@ -382,119 +736,290 @@ class Mempool:
             self._total_cost += item.cost
             self._total_fee += item.fee
 
-        info = FeeMempoolInfo(self.mempool_info, self.total_mempool_cost(), self.total_mempool_fees(), datetime.now())
-        self.fee_estimator.add_mempool_item(info, MempoolItemInfo(item.cost, item.fee, item.height_added_to_mempool))
+        self._template_item_added(item)
+        self._items_changed()
+        self._notify_added(item)
         return None
 
-    def at_full_capacity(self, cost: int) -> bool:
+    def _names_and_fees_by_feerate(self) -> Iterator[Tuple[bytes32, int]]:
+        with self._db_conn:
+            cursor = self._db_conn.execute("SELECT name, fee FROM tx ORDER BY fee_per_cost DESC, seq ASC")
+        for row in cursor:
+            yield bytes32(row[0]), int(row[1])
+
+    def _names_by_feerate(self, offset: int, limit: int) -> List[bytes32]:
+        with self._db_conn:
+            cursor = self._db_conn.execute(
+                "SELECT name FROM tx ORDER BY fee_per_cost DESC, seq ASC LIMIT ? OFFSET ?", (limit, offset)
+            )
+            return [bytes32(row[0]) for row in cursor]
+
+
+@dataclass(frozen=True)
+class SortedMempoolEntry:
+    cost: int
+    fee: int
+    assert_height: Optional[uint32]
+    assert_before_height: Optional[uint32]
+    assert_before_seconds: Optional[uint64]
+    # the order the item was added to the mempool in. It's used as a
+    # tie-breaker for items with the same fee rate
+    seq: int
+    # the coins spent by the item when it was added. The item's NPCResult may
+    # later be updated by fast-forwarding singleton spends
+    spent_coin_ids: List[bytes32]
+
+    @property
+    def fee_per_cost(self) -> float:
+        return self.fee / self.cost
+
+
+class SortedMempool(MempoolBase):
+    """
+    A mempool engine keeping its items in native containers, rather than in a
+    SQLite database. Items are kept in a list sorted by fee rate, and indexed
+    by the coins they spend and by their expiry. It has the same behavior as the
+    SQLite engine.
+    """
+
+    _entries: Dict[bytes32, SortedMempoolEntry]
+    # (-fee_per_cost, seq, name), i.e. the order items are included in blocks
+    _by_feerate: SortedList[Tuple[float, int, bytes32]]
+    # coin ID -> names of the items spending it
+    _by_coin_id: Dict[bytes32, Set[bytes32]]
+    # (assert_before_height, name) and (assert_before_seconds, name) of items
+    # that expire
+    _by_assert_before_height: SortedList[Tuple[int, bytes32]]
+    _by_assert_before_seconds: SortedList[Tuple[int, bytes32]]
+    _seq: int
+
+    def __init__(self, mempool_info: MempoolInfo, fee_estimator: FeeEstimatorInterface):
+        super().__init__(mempool_info, fee_estimator)
+        self._entries = {}
+        self._by_feerate = SortedList()
+        self._by_coin_id = {}
+        self._by_assert_before_height = SortedList()
+        self._by_assert_before_seconds = SortedList()
+        self._seq = 0
+
+    def _to_item(self, name: bytes32) -> MempoolItem:
+        entry = self._entries[name]
+        item = self._items[name]
+
+        return MempoolItem(
+            item.spend_bundle,
+            uint64(entry.fee),
+            item.npc_result,
+            name,
+            uint32(item.height_added_to_mempool),
+            entry.assert_height,
+            entry.assert_before_height,
+            entry.assert_before_seconds,
+            bundle_coin_spends=item.bundle_coin_spends,
+        )
+
+    def _feerate_key(self, name: bytes32) -> Tuple[float, int, bytes32]:
+        entry = self._entries[name]
+        return (-entry.fee_per_cost, entry.seq, name)
+
+    def _expiring_before(self, block_height: int, timestamp: int) -> List[bytes32]:
         """
-        Checks whether the mempool is at full capacity and cannot accept a transaction with size cost.
+        Returns the names of the items with an assert_before_height or
+        assert_before_seconds less than the specified height or timestamp
         """
+        names: Dict[bytes32, None] = {}
+        for index, limit in (
+            (self._by_assert_before_height, block_height),
+            (self._by_assert_before_seconds, timestamp),
+        ):
+            # the 1-tuple sorts before every (limit, name) tuple
+            for _, name in index.islice(stop=index.bisect_left((limit,))):
+                names[name] = None
+        return list(names)
 
-        return self._total_cost + cost > self.mempool_info.max_size_in_cost
+    def all_items(self) -> Iterator[MempoolItem]:
+        for name in list(self._entries):
+            yield self._to_item(name)
 
-    async def create_bundle_from_mempool_items(
-        self,
-        item_inclusion_filter: Callable[[bytes32], bool],
-        get_unspent_lineage_info_for_puzzle_hash: Callable[[bytes32], Awaitable[Optional[UnspentLineageInfo]]],
-        constants: ConsensusConstants,
-        height: uint32,
-    ) -> Optional[Tuple[SpendBundle, List[Coin]]]:
-        cost_sum = 0  # Checks that total cost does not exceed block maximum
-        fee_sum = 0  # Checks that total fees don't exceed 64 bits
-        processed_spend_bundles = 0
-        additions: List[Coin] = []
-        # This contains:
-        # 1. A map of coin ID to a coin spend solution and its isolated cost
-        #   We reconstruct it for every bundle we create from mempool items because we
-        #   deduplicate on the first coin spend solution that comes with the highest
-        #   fee rate item, and that can change across calls
-        # 2. A map of fast forward eligible singleton puzzle hash to the most
-        #   recent unspent singleton data, to allow chaining fast forward
-        #   singleton spends
-        eligible_coin_spends = EligibleCoinSpends()
-        coin_spends: List[CoinSpend] = []
-        sigs: List[G2Element] = []
-        log.info(f"Starting to make block, max cost: {self.mempool_info.max_block_clvm_cost}")
-        with self._db_conn:
-            cursor = self._db_conn.execute("SELECT name, fee FROM tx ORDER BY fee_per_cost DESC, seq ASC")
-        skipped_items = 0
-        for row in cursor:
-            name = bytes32(row[0])
-            fee = int(row[1])
-            item = self._items[name]
-            if not item_inclusion_filter(name):
-                continue
-            try:
-                assert item.npc_result.conds is not None
-                cost = item.npc_result.conds.cost
-                if skipped_items >= PRIORITY_TX_THRESHOLD:
-                    # If we've encountered `PRIORITY_TX_THRESHOLD` number of
-                    # transactions that don't fit in the remaining block size,
-                    # we want to keep looking for smaller transactions that
-                    # might fit, but we also want to avoid spending too much
-                    # time on potentially expensive ones, hence this shortcut.
-                    unique_coin_spends = []
-                    unique_additions = []
-                    for spend_data in item.bundle_coin_spends.values():
-                        if spend_data.eligible_for_dedup or spend_data.eligible_for_fast_forward:
-                            raise Exception(f"Skipping transaction with eligible coin(s): {name.hex()}")
-                        unique_coin_spends.append(spend_data.coin_spend)
-                        unique_additions.extend(spend_data.additions)
-                    cost_saving = 0
-                else:
-                    await eligible_coin_spends.process_fast_forward_spends(
-                        mempool_item=item,
-                        get_unspent_lineage_info_for_puzzle_hash=get_unspent_lineage_info_for_puzzle_hash,
-                        height=height,
-                        constants=constants,
-                    )
-                    unique_coin_spends, cost_saving, unique_additions = eligible_coin_spends.get_deduplication_info(
-                        bundle_coin_spends=item.bundle_coin_spends, max_cost=cost
-                    )
-                item_cost = cost - cost_saving
-                log.info(
-                    "Cumulative cost: %d, fee per cost: %0.4f, item cost: %d", cost_sum, fee / item_cost, item_cost
-                )
-                new_fee_sum = fee_sum + fee
-                if new_fee_sum > DEFAULT_CONSTANTS.MAX_COIN_AMOUNT:
-                    # Such a fee is very unlikely to happen but we're defensively
-                    # accounting for it
-                    break  # pragma: no cover
-                new_cost_sum = cost_sum + item_cost
-                if new_cost_sum > self.mempool_info.max_block_clvm_cost:
-                    # Let's skip this item
-                    log.info(
-                        "Skipping mempool item. Cumulative cost %d exceeds maximum block cost %d",
-                        new_cost_sum,
-                        self.mempool_info.max_block_clvm_cost,
-                    )
-                    skipped_items += 1
-                    if skipped_items < MAX_SKIPPED_ITEMS:
-                        continue
-                    # Let's stop taking more items if we skipped `MAX_SKIPPED_ITEMS`
-                    break
-                coin_spends.extend(unique_coin_spends)
-                additions.extend(unique_additions)
-                sigs.append(item.spend_bundle.aggregated_signature)
-                cost_sum = new_cost_sum
-                fee_sum = new_fee_sum
-                processed_spend_bundles += 1
-                # Let's stop taking more items if we don't have enough cost left
-                # for at least `MIN_COST_THRESHOLD` because that would mean we're
-                # getting very close to the limit anyway and *probably* won't
-                # find transactions small enough to fit at this point
-                if self.mempool_info.max_block_clvm_cost - cost_sum < MIN_COST_THRESHOLD:
-                    break
-            except Exception as e:
-                log.debug(f"Exception while checking a mempool item for deduplication: {e}")
-                continue
-        if processed_spend_bundles == 0:
+    def all_item_ids(self) -> List[bytes32]:
+        return list(self._entries)
+
+    def items_by_feerate(self) -> Iterator[MempoolItem]:
+        for _, _, name in list(self._by_feerate):
+            yield self._to_item(name)
+
+    def size(self) -> int:
+        return len(self._entries)
+
+    def get_item_by_id(self, item_id: bytes32) -> Optional[MempoolItem]:
+        if item_id not in self._entries:
             return None
+        return self._to_item(item_id)
+
+    def get_items_by_coin_id(self, spent_coin_id: bytes32) -> List[MempoolItem]:
+        return [self._to_item(name) for name in self._by_coin_id.get(spent_coin_id, ())]
+
+    def get_items_by_coin_ids(self, spent_coin_ids: List[bytes32]) -> List[MempoolItem]:
+        names: Dict[bytes32, None] = {}
+        for coin_id in spent_coin_ids:
+            for name in self._by_coin_id.get(coin_id, ()):
+                names[name] = None
+        return [self._to_item(name) for name in names]
+
+    def get_min_fee_rate(self, cost: int) -> Optional[float]:
+        if not self.at_full_capacity(cost):
+            return 0
+
+        current_cost = self._total_cost
+
+        # Iterates through all spends in increasing fee per cost
+        for _, _, name in reversed(self._by_feerate):
+            entry = self._entries[name]
+            current_cost -= entry.cost
+            # Removing one at a time, until our transaction of size cost fits
+            if current_cost + cost <= self.mempool_info.max_size_in_cost:
+                return entry.fee_per_cost
+
         log.info(
-            f"Cumulative cost of block (real cost should be less) {cost_sum}. Proportion "
-            f"full: {cost_sum / self.mempool_info.max_block_clvm_cost}"
+            f"Transaction with cost {cost} does not fit in mempool of max cost {self.mempool_info.max_size_in_cost}"
+        )
+        return None
+
+    def new_tx_block(self, block_height: uint32, timestamp: uint64) -> None:
+        to_remove = self._expiring_before(block_height + 1, timestamp + 1)
+        self.remove_from_pool(to_remove, MempoolRemoveReason.EXPIRED)
+        self._block_height = block_height
+        self._timestamp = timestamp
+        # the coins spent in the new block may have changed the latest
+        # versions of fast forward singletons
+        self._block_template = None
+
+    def remove_from_pool(self, items: List[bytes32], reason: MempoolRemoveReason) -> None:
+        if items == []:
+            return
+
+        self._template_items_removed(items)
+        self._items_changed()
+
+        removed_items: List[MempoolItemInfo] = []
+        for name in items:
+            internal_item = self._items.pop(name)
+            entry = self._entries.pop(name)
+            if reason != MempoolRemoveReason.BLOCK_INCLUSION:
+                removed_items.append(MempoolItemInfo(entry.cost, entry.fee, internal_item.height_added_to_mempool))
+
+            self._by_feerate.remove((-entry.fee_per_cost, entry.seq, name))
+            for coin_id in entry.spent_coin_ids:
+                spending = self._by_coin_id[coin_id]
+                spending.discard(name)
+                if len(spending) == 0:
+                    del self._by_coin_id[coin_id]
+            if entry.assert_before_height is not None:
+                self._by_assert_before_height.remove((entry.assert_before_height, name))
+            if entry.assert_before_seconds is not None:
+                self._by_assert_before_seconds.remove((entry.assert_before_seconds, name))
+
+            self._total_cost -= entry.cost
+            self._total_fee -= entry.fee
+        assert self._total_cost >= 0
+        assert self._total_fee >= 0
+
+        if reason != MempoolRemoveReason.BLOCK_INCLUSION:
+            self._notify_removed(removed_items)
+
+    def add_to_pool(self, item: MempoolItem) -> Optional[Err]:
+        assert item.fee < MEMPOOL_ITEM_FEE_LIMIT
+        assert item.npc_result.conds is not None
+        assert item.cost <= self.mempool_info.max_block_clvm_cost
+
+        # we have certain limits on transactions that will expire soon
+        # (in the next 15 minutes)
+        block_cutoff = self._block_height + 48
+        time_cutoff = self._timestamp + 900
+        if (item.assert_before_height is not None and item.assert_before_height < block_cutoff) or (
+            item.assert_before_seconds is not None and item.assert_before_seconds < time_cutoff
+        ):
+            # the transactions that expire soon, in order of highest to lowest
+            # fee rate along with the cumulative cost of such transactions
+            expiring: List[Tuple[bytes32, float, int]] = []
+            cumulative_cost = 0
+            for _, _, name in sorted(self._feerate_key(n) for n in self._expiring_before(block_cutoff, time_cutoff)):
+                entry = self._entries[name]
+                cumulative_cost += entry.cost
+                expiring.append((name, entry.fee_per_cost, cumulative_cost))
+
+            to_remove: List[bytes32] = []
+            for name, fee_per_cost, cumulative_cost in reversed(expiring):
+                # there's space for us, stop pruning
+                if cumulative_cost + item.cost <= self.mempool_info.max_block_clvm_cost:
+                    break
+
+                # we can't evict any more transactions, abort (and don't
+                # evict what we put aside in "to_remove" list)
+                if fee_per_cost > item.fee_per_cost:
+                    return Err.INVALID_FEE_LOW_FEE
+                to_remove.append(name)
+
+            self.remove_from_pool(to_remove, MempoolRemoveReason.EXPIRED)
+
+            # if we don't find any entries, it's OK to add this entry
+
+        if self._total_cost + item.cost > self.mempool_info.max_size_in_cost:
+            # evict the items with the lowest fee per cost, until the remaining
+            # ones leave enough space for this item
+            max_cost = self.mempool_info.max_size_in_cost - item.cost
+            current_cost = self._total_cost
+            to_remove = []
+            for _, _, name in reversed(self._by_feerate):
+                if current_cost <= max_cost:
+                    break
+                current_cost -= self._entries[name].cost
+                to_remove.append(name)
+
+            self.remove_from_pool(to_remove, MempoolRemoveReason.POOL_FULL)
+
+        entry = SortedMempoolEntry(
+            item.cost,
+            item.fee,
+            item.assert_height,
+            item.assert_before_height,
+            item.assert_before_seconds,
+            self._seq,
+            [bytes32(s.coin_id) for s in item.npc_result.conds.spends],
         )
-        aggregated_signature = AugSchemeMPL.aggregate(sigs)
-        agg = SpendBundle(coin_spends, aggregated_signature)
-        return agg, additions
+        self._seq += 1
+
+        self._entries[item.name] = entry
+        self._by_feerate.add((-entry.fee_per_cost, entry.seq, item.name))
+        for coin_id in entry.spent_coin_ids:
+            self._by_coin_id.setdefault(coin_id, set()).add(item.name)
+        if entry.assert_before_height is not None:
+            self._by_assert_before_height.add((entry.assert_before_height, item.name))
+        if entry.assert_before_seconds is not None:
+            self._by_assert_before_seconds.add((entry.assert_before_seconds, item.name))
+
+        self._items[item.name] = InternalMempoolItem(
+            item.spend_bundle, item.npc_result, item.height_added_to_mempool, item.bundle_coin_spends
+        )
+
+        self._total_cost += item.cost
+        self._total_fee += item.fee
+
+        self._template_item_added(item)
+        self._items_changed()
+        self._notify_added(item)
+        return None
+
+    def _names_and_fees_by_feerate(self) -> Iterator[Tuple[bytes32, int]]:
+        # block bundles are created under the blockchain lock, so the mempool
+        # can't change while we iterate. Most of the time we stop early, once
+        # the block is full
+        for _, _, name in self._by_feerate:
+            yield name, self._entries[name].fee
+
+    def _names_by_feerate(self, offset: int, limit: int) -> List[bytes32]:
+        return [name for _, _, name in self._by_feerate.islice(offset, offset + limit)]
+
+
+# the mempool engines that can be selected with the "mempool_engine" config option
+MEMPOOL_ENGINES: Dict[str, Type[MempoolBase]] = {"sqlite": Mempool, "sorted": SortedMempool}
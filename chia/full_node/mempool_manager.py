@@ -1,13 +1,14 @@
 from __future__ import annotations
 
 import asyncio
+import functools
 import logging
 import time
 from concurrent.futures import Executor
 from concurrent.futures.process import ProcessPoolExecutor
 from dataclasses import dataclass
 from multiprocessing.context import BaseContext
-from typing import Awaitable, Callable, Collection, Dict, List, Optional, Set, Tuple, TypeVar
+from typing import Awaitable, Callable, Collection, Dict, List, Optional, Set, Tuple, Type, TypeVar
 
 from chia_rs import ELIGIBLE_FOR_DEDUP, ELIGIBLE_FOR_FF
 from chia_rs import CoinSpend as RustCoinSpend
@@ -23,7 +24,7 @@ from chia.full_node.bitcoin_fee_estimator import create_bitcoin_fee_estimator
 from chia.full_node.bundle_tools import simple_solution_generator
 from chia.full_node.fee_estimation import FeeBlockInfo, MempoolInfo, MempoolItemInfo
 from chia.full_node.fee_estimator_interface import FeeEstimatorInterface
-from chia.full_node.mempool import MEMPOOL_ITEM_FEE_LIMIT, Mempool, MempoolRemoveReason
+from chia.full_node.mempool import MEMPOOL_ENGINES, MEMPOOL_ITEM_FEE_LIMIT, MempoolBase, MempoolRemoveReason
 from chia.full_node.mempool_check_conditions import get_name_puzzle_conditions, mempool_check_time_locks
 from chia.full_node.pending_tx_cache import ConflictTxCache, PendingTxCache
 from chia.types.blockchain_format.coin import Coin
@@ -44,7 +45,7 @@ from chia.util.errors import Err, ValidationError
 from chia.util.inline_executor import InlineExecutor
 from chia.util.ints import uint32, uint64
 from chia.util.lru_cache import LRUCache
-from chia.util.setproctitle import getproctitle, setproctitle
+from chia.util.setproctitle import getproctitle
 
 log = logging.getLogger(__name__)
 
@@ -83,13 +84,19 @@ def validate_clvm_and_signature(
         assert result.conds is not None
         pks, msgs = pkm_pairs(result.conds, additional_data)
 
-        # Verify aggregated signature
-        cache: LRUCache[bytes32, GTElement] = LRUCache(10000)
-        if not cached_bls.aggregate_verify(pks, msgs, bundle.aggregated_signature, True, cache):
-            return Err.BAD_AGGREGATE_SIGNATURE, b"", {}, time.monotonic() - start_time
+        # Verify aggregated signature. With a shared pairing cache, the new
+        # pairings are visible to the full node without returning them
         new_cache_entries: Dict[bytes32, bytes] = {}
-        for k, v in cache.cache.items():
-            new_cache_entries[k] = bytes(v)
+        shared_cache = cached_bls.shared_cache()
+        if shared_cache is not None:
+            if not cached_bls.aggregate_verify(pks, msgs, bundle.aggregated_signature, True, shared_cache):
+                return Err.BAD_AGGREGATE_SIGNATURE, b"", {}, time.monotonic() - start_time
+        else:
+            cache: LRUCache[bytes32, GTElement] = LRUCache(10000)
+            if not cached_bls.aggregate_verify(pks, msgs, bundle.aggregated_signature, True, cache):
+                return Err.BAD_AGGREGATE_SIGNATURE, b"", {}, time.monotonic() - start_time
+            for k, v in cache.cache.items():
+                new_cache_entries[k] = bytes(v)
     except ValidationError as e:
         return e.code, b"", {}, time.monotonic() - start_time
     except Exception:
@@ -98,6 +105,20 @@ def validate_clvm_and_signature(
     return None, bytes(result), new_cache_entries, time.monotonic() - start_time
 
 
+ValidationResult = Tuple[Optional[Err], bytes, Dict[bytes32, bytes], float]
+
+
+def validate_clvm_and_signature_batch(
+    spend_bundles_bytes: List[bytes], max_cost: int, constants: ConsensusConstants, height: uint32
+) -> List[ValidationResult]:
+    """
+    Like validate_clvm_and_signature(), but validates several spend bundles in a
+    single call. This saves sending the constants to the worker process, and the
+    round trip, for each of them.
+    """
+    return [validate_clvm_and_signature(b, max_cost, constants, height) for b in spend_bundles_bytes]
+
+
 @dataclass
 class TimelockConditions:
     assert_height: uint32 = uint32(0)
@@ -167,10 +188,18 @@ class MempoolManager:
     _pending_cache: PendingTxCache
     seen_cache_size: int
     peak: Optional[BlockRecordProtocol]
-    mempool: Mempool
+    mempool: MempoolBase
+    mempool_class: Type[MempoolBase]
     _worker_queue_size: int
     max_block_clvm_cost: uint64
     max_tx_clvm_cost: uint64
+    # spend bundles are validated in batches of up to this many, waiting at
+    # most validation_batch_latency seconds for a batch to fill up
+    validation_batch_size: int
+    validation_batch_latency: float
+    _validation_batch: List[Tuple[bytes, asyncio.Future[ValidationResult]]]
+    _validation_batch_height: uint32
+    _validation_batch_timer: Optional[asyncio.TimerHandle]
 
     def __init__(
         self,
@@ -180,9 +209,17 @@ class MempoolManager:
         *,
         single_threaded: bool = False,
         max_tx_clvm_cost: Optional[uint64] = None,
+        mempool_engine: str = "sqlite",
+        validation_batch_size: int = 1,
+        validation_batch_latency: float = 0.0,
+        pairing_cache_name: Optional[str] = None,
     ):
         self.constants: ConsensusConstants = consensus_constants
 
+        if mempool_engine not in MEMPOOL_ENGINES:
+            raise ValueError(f"unknown mempool engine: {mempool_engine}")
+        self.mempool_class = MEMPOOL_ENGINES[mempool_engine]
+
         # Keep track of seen spend_bundles
         self.seen_bundle_hashes: Dict[bytes32, bytes32] = {}
 
@@ -205,14 +242,19 @@ class MempoolManager:
         self._pending_cache = PendingTxCache(self.constants.MAX_BLOCK_COST_CLVM * 1, 1000)
         self.seen_cache_size = 10000
         self._worker_queue_size = 0
+        self.validation_batch_size = validation_batch_size
+        self.validation_batch_latency = validation_batch_latency
+        self._validation_batch = []
+        self._validation_batch_height = uint32(0)
+        self._validation_batch_timer = None
         if single_threaded:
             self.pool = InlineExecutor()
         else:
             self.pool = ProcessPoolExecutor(
                 max_workers=2,
                 mp_context=multiprocessing_context,
-                initializer=setproctitle,
-                initargs=(f"{getproctitle()}_mempool_worker",),
+                initializer=cached_bls.init_worker,
+                initargs=(f"{getproctitle()}_mempool_worker", pairing_cache_name, "mempool"),
             )
 
         # The mempool will correspond to a certain peak
@@ -223,9 +265,10 @@ class MempoolManager:
             FeeRate(uint64(self.nonzero_fee_minimum_fpc)),
             CLVMCost(uint64(self.max_block_clvm_cost)),
         )
-        self.mempool: Mempool = Mempool(mempool_info, self.fee_estimator)
+        self.mempool: MempoolBase = self.mempool_class(mempool_info, self.fee_estimator)
 
     def shut_down(self) -> None:
+        self._flush_validation_batch()
         self.pool.shutdown(wait=True)
 
     async def create_bundle_from_mempool(
@@ -242,25 +285,17 @@ class MempoolManager:
         if self.peak is None or self.peak.header_hash != last_tb_header_hash:
             return None
         if item_inclusion_filter is None:
-
-            def always(bundle_name: bytes32) -> bool:
-                return True
-
-            item_inclusion_filter = always
+            # the block template is kept up to date as items are added to, and
+            # removed from, the mempool
+            return await self.mempool.create_bundle_from_block_template(
+                get_unspent_lineage_info_for_puzzle_hash, self.constants, self.peak.height
+            )
         return await self.mempool.create_bundle_from_mempool_items(
             item_inclusion_filter, get_unspent_lineage_info_for_puzzle_hash, self.constants, self.peak.height
         )
 
     def get_filter(self) -> bytes:
-        all_transactions: Set[bytes32] = set()
-        byte_array_list = []
-        for key in self.mempool.all_item_ids():
-            if key not in all_transactions:
-                all_transactions.add(key)
-                byte_array_list.append(bytearray(key))
-
-        tx_filter: PyBIP158 = PyBIP158(byte_array_list)
-        return bytes(tx_filter.GetEncoded())
+        return self.mempool.get_filter()
 
     def is_fee_enough(self, fees: uint64, cost: uint64) -> bool:
         """
@@ -308,13 +343,8 @@ class MempoolManager:
 
         self._worker_queue_size += 1
         try:
-            err, cached_result_bytes, new_cache_entries, duration = await asyncio.get_running_loop().run_in_executor(
-                self.pool,
-                validate_clvm_and_signature,
-                new_spend_bytes,
-                self.max_tx_clvm_cost,
-                self.constants,
-                self.peak.height,
+            err, cached_result_bytes, new_cache_entries, duration = await self._validate_clvm_and_signature(
+                new_spend_bytes, self.peak.height
             )
         finally:
             self._worker_queue_size -= 1
@@ -331,6 +361,72 @@ class MempoolManager:
         )
         return ret
 
+    async def _validate_clvm_and_signature(self, spend_bundle_bytes: bytes, height: uint32) -> ValidationResult:
+        loop = asyncio.get_running_loop()
+        if self.validation_batch_size <= 1:
+            return await loop.run_in_executor(
+                self.pool,
+                validate_clvm_and_signature,
+                spend_bundle_bytes,
+                self.max_tx_clvm_cost,
+                self.constants,
+                height,
+            )
+
+        # a batch is validated against a single height
+        if len(self._validation_batch) > 0 and self._validation_batch_height != height:
+            self._flush_validation_batch()
+        future: asyncio.Future[ValidationResult] = loop.create_future()
+        self._validation_batch.append((spend_bundle_bytes, future))
+        self._validation_batch_height = height
+        if len(self._validation_batch) >= self.validation_batch_size:
+            self._flush_validation_batch()
+        elif self._validation_batch_timer is None:
+            self._validation_batch_timer = loop.call_later(self.validation_batch_latency, self._flush_validation_batch)
+        return await future
+
+    def _flush_validation_batch(self) -> None:
+        if self._validation_batch_timer is not None:
+            self._validation_batch_timer.cancel()
+            self._validation_batch_timer = None
+        batch = self._validation_batch
+        if len(batch) == 0:
+            return
+        self._validation_batch = []
+        try:
+            batch_future = asyncio.get_running_loop().run_in_executor(
+                self.pool,
+                validate_clvm_and_signature_batch,
+                [spend_bundle_bytes for spend_bundle_bytes, _ in batch],
+                self.max_tx_clvm_cost,
+                self.constants,
+                self._validation_batch_height,
+            )
+        except Exception as e:
+            # e.g. the pool has been shut down
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        batch_future.add_done_callback(functools.partial(self._validation_batch_done, batch))
+
+    @staticmethod
+    def _validation_batch_done(
+        batch: List[Tuple[bytes, asyncio.Future[ValidationResult]]],
+        batch_future: asyncio.Future[List[ValidationResult]],
+    ) -> None:
+        exception = None if batch_future.cancelled() else batch_future.exception()
+        for index, (_, future) in enumerate(batch):
+            if future.done():
+                # the caller went away
+                continue
+            if batch_future.cancelled():
+                future.cancel()
+            elif exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(batch_future.result()[index])
+
     async def add_spend_bundle(
         self,
         new_spend: SpendBundle,
@@ -710,18 +806,20 @@ class MempoolManager:
                 f"new-peak-prev: {new_peak.prev_transaction_block_hash} "
                 f"coins: {'not set' if spent_coins is None else 'set'}"
             )
-            old_pool = self.mempool
-            self.mempool = Mempool(old_pool.mempool_info, old_pool.fee_estimator)
+            # Instead of re-adding every item to a new mempool, we only
+            # revalidate the items affected by the reorg, i.e. the ones spending
+            # coins that have been spent or that no longer exist, or whose
+            # timelocks are no longer satisfied
             self.seen_bundle_hashes = {}
 
             # in order to make this a bit quicker, we look-up all the spends in
             # a single query, rather than one at a time.
             coin_records: Dict[bytes32, CoinRecord] = {}
 
+            old_items = list(self.mempool.all_items())
             removals: Set[bytes32] = set()
-            for item in old_pool.all_items():
-                for s in item.spend_bundle.coin_spends:
-                    removals.add(s.coin.name())
+            for item in old_items:
+                removals.update(item.bundle_coin_spends.keys())
 
             for record in await self.get_coin_records(removals):
                 name = record.coin.name()
@@ -735,7 +833,19 @@ class MempoolManager:
                         ret.append(r)
                 return ret
 
-            for item in old_pool.all_items():
+            items_to_revalidate: List[MempoolItem] = []
+            for item in old_items:
+                if self._still_valid_after_reorg(item, coin_records):
+                    self.add_and_maybe_pop_seen(item.spend_bundle_name)
+                else:
+                    items_to_revalidate.append(item)
+            # these items are re-added below, so we don't want the fee
+            # estimator to consider them removed
+            self.mempool.remove_from_pool(
+                [item.spend_bundle_name for item in items_to_revalidate], MempoolRemoveReason.BLOCK_INCLUSION
+            )
+
+            for item in items_to_revalidate:
                 _, result, err = await self.add_spend_bundle(
                     item.spend_bundle,
                     item.npc_result,
@@ -774,18 +884,60 @@ class MempoolManager:
         self.mempool.fee_estimator.new_block(FeeBlockInfo(new_peak.height, included_items))
         return txs_added
 
+    def _still_valid_after_reorg(self, item: MempoolItem, coin_records: Dict[bytes32, CoinRecord]) -> bool:
+        """
+        Returns whether the mempool item is still valid, unchanged, on top of
+        the current peak. `coin_records` are the current records of (at least)
+        the coins spent by the item.
+        """
+        assert self.peak is not None
+        assert self.peak.timestamp is not None
+        assert item.npc_result.conds is not None
+        additions: Optional[Set[bytes32]] = None
+        removal_record_dict: Dict[bytes32, CoinRecord] = {}
+        for coin_id, bundle_coin_spend in item.bundle_coin_spends.items():
+            if bundle_coin_spend.eligible_for_fast_forward:
+                # the spend may need to be rebased onto the latest singleton
+                return False
+            record = coin_records.get(coin_id)
+            if record is None:
+                if additions is None:
+                    additions = {coin.name() for coin in item.additions}
+                if coin_id not in additions:
+                    return False
+                # ephemeral coins are treated like in validate_spend_bundle()
+                record = CoinRecord(
+                    bundle_coin_spend.coin_spend.coin,
+                    uint32(self.peak.height + 1),
+                    uint32(0),
+                    False,
+                    self.peak.timestamp,
+                )
+            elif record.spent:
+                return False
+            removal_record_dict[coin_id] = record
+
+        if mempool_check_time_locks(removal_record_dict, item.npc_result.conds, self.peak.height, self.peak.timestamp):
+            return False
+        timelocks = compute_assert_height(removal_record_dict, item.npc_result.conds)
+        return (
+            timelocks.assert_height == item.assert_height
+            and timelocks.assert_before_height == item.assert_before_height
+            and timelocks.assert_before_seconds == item.assert_before_seconds
+        )
+
     def get_items_not_in_filter(self, mempool_filter: PyBIP158, limit: int = 100) -> List[SpendBundle]:
         items: List[SpendBundle] = []
 
         assert limit > 0
 
         # Send 100 with the highest fee per cost
-        for item in self.mempool.items_by_feerate():
+        for name, spend_bundle in self.mempool.spend_bundles_by_feerate(page_size=limit):
             if len(items) >= limit:
                 return items
-            if mempool_filter.Match(bytearray(item.spend_bundle_name)):
+            if mempool_filter.Match(bytearray(name)):
                 continue
-            items.append(item.spend_bundle)
+            items.append(spend_bundle)
 
         return items
 
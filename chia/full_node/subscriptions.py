@@ -4,7 +4,9 @@ import logging
 from dataclasses import dataclass, field
 from typing import Dict, List, Set
 
+from chia.protocols.wallet_protocol import CoinState
 from chia.types.blockchain_format.sized_bytes import bytes32
+from chia.types.coin_record import CoinRecord
 
 log = logging.getLogger(__name__)
 
@@ -202,3 +204,50 @@ class PeerSubscriptions:
 
     def puzzle_subscription_count(self) -> int:
         return self._puzzle_subscriptions.total_count()
+
+    def coin_states_for_peers(
+        self, coin_records: List[CoinRecord], hints: Dict[bytes32, bytes32]
+    ) -> Dict[bytes32, List[CoinState]]:
+        """
+        Resolves the subscribers of a batch of coin records (e.g. the additions
+        and removals of a new peak) in one pass. A peer is subscribed to a coin
+        record by its coin id, its puzzle hash or its hint. Returns the coin
+        states each peer is subscribed to, without duplicates.
+        """
+
+        changes_for_peer: Dict[bytes32, List[CoinState]] = {}
+        if len(coin_records) == 0:
+            return changes_for_peer
+
+        peers_for_coin = self._coin_subscriptions._peers_for_subscription.get
+        peers_for_puzzle = self._puzzle_subscriptions._peers_for_subscription.get
+        seen_coin_states: Set[CoinState] = set()
+
+        for coin_record in coin_records:
+            coin_id = coin_record.name
+            coin_peers = peers_for_coin(coin_id)
+            puzzle_peers = peers_for_puzzle(coin_record.coin.puzzle_hash)
+            hint = hints.get(coin_id)
+            hint_peers = None if hint is None else peers_for_puzzle(hint)
+            if coin_peers is None and puzzle_peers is None and hint_peers is None:
+                continue
+
+            coin_state = coin_record.coin_state
+            if coin_state in seen_coin_states:
+                continue
+            seen_coin_states.add(coin_state)
+
+            # these sets belong to the index, so we must not modify them
+            subscribed_peers: Set[bytes32] = set()
+            for peers in (coin_peers, puzzle_peers, hint_peers):
+                if peers is not None:
+                    subscribed_peers.update(peers)
+
+            for peer_id in subscribed_peers:
+                changes = changes_for_peer.get(peer_id)
+                if changes is None:
+                    changes_for_peer[peer_id] = [coin_state]
+                else:
+                    changes.append(coin_state)
+
+        return changes_for_peer
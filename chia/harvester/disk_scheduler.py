@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# Upper bounds (in seconds) of the latency histogram buckets, the last bucket counts everything above
+LATENCY_BUCKETS: Tuple[float, ...] = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0)
+
+
+@dataclass
+class LatencyHistogram:
+    counts: List[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+    def record(self, seconds: float) -> None:
+        bucket = 0
+        while bucket < len(LATENCY_BUCKETS) and seconds > LATENCY_BUCKETS[bucket]:
+            bucket += 1
+        self.counts[bucket] += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def to_json_dict(self) -> Dict[str, Any]:
+        return {
+            "buckets": list(LATENCY_BUCKETS),
+            "counts": list(self.counts),
+            "count": self.count(),
+            "total_seconds": self.total_seconds,
+            "max_seconds": self.max_seconds,
+        }
+
+
+@dataclass
+class DiskQueue:
+    semaphore: asyncio.Semaphore
+    pending: int = 0
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+
+
+@dataclass
+class DiskScheduler:
+    """
+    Runs blocking plot lookups in `executor`, but at most `max_concurrent_per_disk` at a time for each disk (as
+    identified by `st_dev`). A slow or spun-down drive can then only occupy a few executor threads, and lookups on
+    the other drives keep going. The time each lookup takes is tracked in a histogram per disk.
+    """
+
+    executor: Executor
+    max_concurrent_per_disk: int
+    _disks: Dict[int, DiskQueue] = field(default_factory=dict)
+
+    def _get_disk(self, device: int) -> DiskQueue:
+        disk = self._disks.get(device)
+        if disk is None:
+            disk = DiskQueue(asyncio.Semaphore(self.max_concurrent_per_disk))
+            self._disks[device] = disk
+        return disk
+
+    async def run(self, device: int, function: Callable[..., T], *args: Any) -> T:
+        disk = self._get_disk(device)
+        disk.pending += 1
+        try:
+            async with disk.semaphore:
+                start = time.monotonic()
+                try:
+                    return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+                finally:
+                    disk.latency.record(time.monotonic() - start)
+        finally:
+            disk.pending -= 1
+
+    def get_metrics(self) -> List[Dict[str, Any]]:
+        return [
+            {"device": device, "pending": disk.pending, "latency": disk.latency.to_json_dict()}
+            for device, disk in sorted(self._disks.items())
+        ]
@@ -12,6 +12,7 @@ from typing import TYPE_CHECKING, Any, AsyncIterator, ClassVar, Dict, List, Opti
 from typing_extensions import Literal
 
 from chia.consensus.constants import ConsensusConstants
+from chia.harvester.disk_scheduler import DiskScheduler
 from chia.plot_sync.sender import Sender
 from chia.plotting.manager import PlotManager
 from chia.plotting.util import (
@@ -55,6 +56,7 @@ class Harvester:
     root_path: Path
     _shut_down: bool
     executor: ThreadPoolExecutor
+    disk_scheduler: DiskScheduler
     state_changed_callback: Optional[StateChangedProtocol] = None
     constants: ConsensusConstants
     _refresh_lock: asyncio.Lock
@@ -94,6 +96,7 @@ class Harvester:
         )
         self._shut_down = False
         self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=config["num_threads"])
+        self.disk_scheduler = DiskScheduler(self.executor, config.get("num_threads_per_disk", 4))
         self._server = None
         self.constants = constants
         self.state_changed_callback: Optional[StateChangedProtocol] = None
@@ -211,6 +214,16 @@ class Harvester:
                 [str(s) for s in self.plot_manager.no_key_filenames],
             )
 
+    def get_disk_metrics(self) -> List[Dict[str, Any]]:
+        plot_counts: Dict[int, int] = {}
+        with self.plot_manager:
+            for plot_info in self.plot_manager.plots.values():
+                plot_counts[plot_info.device] = plot_counts.get(plot_info.device, 0) + 1
+        disks = self.disk_scheduler.get_metrics()
+        for disk in disks:
+            disk["plot_count"] = plot_counts.get(disk["device"], 0)
+        return disks
+
     def delete_plot(self, str_path: str) -> Literal[True]:
         remove_plot(Path(str_path))
         self.plot_manager.trigger_refresh()
@@ -17,12 +17,7 @@ from chia.protocols.harvester_protocol import Plot, PlotSyncResponse
 from chia.protocols.protocol_message_types import ProtocolMessageTypes
 from chia.server.outbound_message import Message, make_msg
 from chia.server.ws_connection import WSChiaConnection
-from chia.types.blockchain_format.proof_of_space import (
-    ProofOfSpace,
-    calculate_pos_challenge,
-    generate_plot_public_key,
-    passes_plot_filter,
-)
+from chia.types.blockchain_format.proof_of_space import ProofOfSpace, calculate_pos_challenge, generate_plot_public_key
 from chia.types.blockchain_format.sized_bytes import bytes32
 from chia.util.api_decorators import api_request
 from chia.util.ints import uint8, uint32, uint64
@@ -85,8 +80,6 @@ class HarvesterAPI:
         start = time.time()
         assert len(new_challenge.challenge_hash) == 32
 
-        loop = asyncio.get_running_loop()
-
         def blocking_lookup(filename: Path, plot_info: PlotInfo) -> List[Tuple[bytes32, ProofOfSpace]]:
             # Uses the DiskProver object to lookup qualities. This is a blocking call,
             # so it should be run in a thread pool.
@@ -210,8 +203,8 @@ class HarvesterAPI:
             all_responses: List[harvester_protocol.NewProofOfSpace] = []
             if self.harvester._shut_down:
                 return filename, []
-            proofs_of_space_and_q: List[Tuple[bytes32, ProofOfSpace]] = await loop.run_in_executor(
-                self.harvester.executor, blocking_lookup, filename, plot_info
+            proofs_of_space_and_q: List[Tuple[bytes32, ProofOfSpace]] = await self.harvester.disk_scheduler.run(
+                plot_info.device, blocking_lookup, filename, plot_info
             )
             for quality_str, proof_of_space in proofs_of_space_and_q:
                 all_responses.append(
@@ -229,25 +222,24 @@ class HarvesterAPI:
             return filename, all_responses
 
         awaitables = []
-        passed = 0
-        total = 0
         with self.harvester.plot_manager:
             self.harvester.log.debug("new_signage_point_harvester lock acquired")
-            for try_plot_filename, try_plot_info in self.harvester.plot_manager.plots.items():
-                # Passes the plot filter (does not check sp filter yet though, since we have not reached sp)
-                # This is being executed at the beginning of the slot
-                total += 1
-                if passes_plot_filter(
-                    new_challenge.filter_prefix_bits,
-                    try_plot_info.prover.get_id(),
-                    new_challenge.challenge_hash,
-                    new_challenge.sp_hash,
-                ):
-                    passed += 1
-                    awaitables.append(lookup_challenge(try_plot_filename, try_plot_info))
+            plots = self.harvester.plot_manager.plots
+            total = len(plots)
+            # Passes the plot filter (does not check sp filter yet though, since we have not reached sp)
+            # This is being executed at the beginning of the slot
+            eligible_plots = self.harvester.plot_manager.plot_filter_index.eligible_plots(
+                new_challenge.filter_prefix_bits,
+                new_challenge.challenge_hash,
+                new_challenge.sp_hash,
+            )
+            passed = len(eligible_plots)
+            for try_plot_filename in eligible_plots:
+                awaitables.append(lookup_challenge(try_plot_filename, plots[try_plot_filename]))
             self.harvester.log.debug(f"new_signage_point_harvester {passed} plots passed the plot filter")
 
-        # Concurrently executes all lookups on disk, to take advantage of multiple disk parallelism
+        # Concurrently executes all lookups on disk, to take advantage of multiple disk parallelism. The lookups are
+        # limited per disk, and proofs are sent to the farmer as soon as the lookup of their plot finished.
         time_taken = time.time() - start
         total_proofs_found = 0
         for filename_sublist_awaitable in asyncio.as_completed(awaitables):
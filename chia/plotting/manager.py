@@ -13,6 +13,7 @@ from chiapos import DiskProver, decompressor_context_queue
 
 from chia.consensus.pos_quality import UI_ACTUAL_SPACE_CONSTANT_FACTOR, _expected_plot_size
 from chia.plotting.cache import Cache, CacheEntry
+from chia.plotting.plot_filter_index import PlotFilterIndex
 from chia.plotting.util import (
     HarvestingMode,
     PlotInfo,
@@ -28,6 +29,7 @@ log = logging.getLogger(__name__)
 
 class PlotManager:
     plots: Dict[Path, PlotInfo]
+    plot_filter_index: PlotFilterIndex
     plot_filename_paths: Dict[str, Tuple[str, Set[str]]]
     plot_filename_paths_lock: threading.Lock
     failed_to_open_filenames: Dict[Path, int]
@@ -58,6 +60,7 @@ class PlotManager:
     ):
         self.root_path = root_path
         self.plots = {}
+        self.plot_filter_index = PlotFilterIndex()
         self.plot_filename_paths = {}
         self.plot_filename_paths_lock = threading.Lock()
         self.failed_to_open_filenames = {}
@@ -129,6 +132,7 @@ class PlotManager:
         with self:
             self.last_refresh_time = time.time()
             self.plots.clear()
+            self.plot_filter_index.clear()
             self.plot_filename_paths.clear()
             self.failed_to_open_filenames.clear()
             self.no_key_filenames.clear()
@@ -217,6 +221,7 @@ class PlotManager:
                         with self:
                             if loaded_plot in self.plots:
                                 del self.plots[loaded_plot]
+                                self.plot_filter_index.remove(loaded_plot)
                         total_result.removed.append(loaded_plot)
                         # No need to check the duplicates here since we drop the whole entry
                         continue
@@ -399,6 +404,7 @@ class PlotManager:
                     cache_entry.plot_public_key,
                     stat_info.st_size,
                     stat_info.st_mtime,
+                    stat_info.st_dev,
                 )
 
                 cache_entry.bump_last_use()
@@ -424,6 +430,8 @@ class PlotManager:
                 if new_plot is not None:
                     plots_refreshed[Path(new_plot.prover.get_filename())] = new_plot
             self.plots.update(plots_refreshed)
+            for path, new_plot in plots_refreshed.items():
+                self.plot_filter_index.add(path, new_plot.prover.get_id())
 
         result.duration = time.time() - start_time
 
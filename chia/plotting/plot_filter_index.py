@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from hashlib import sha256
+from pathlib import Path
+from typing import Dict, List
+
+from chia.types.blockchain_format.sized_bytes import bytes32
+
+
+@dataclass
+class PlotFilterIndex:
+    """
+    The plot ids of all loaded plots, kept in a flat list next to their paths.
+    Evaluating the plot filter for a signage point only needs the plot ids, so
+    this lets the harvester find the eligible plots without touching every
+    `PlotInfo` and `DiskProver`.
+    """
+
+    _plot_ids: List[bytes32] = field(default_factory=list)
+    _paths: List[Path] = field(default_factory=list)
+    _positions: Dict[Path, int] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def add(self, path: Path, plot_id: bytes32) -> None:
+        position = self._positions.get(path)
+        if position is not None:
+            self._plot_ids[position] = plot_id
+            return
+        self._positions[path] = len(self._paths)
+        self._plot_ids.append(plot_id)
+        self._paths.append(path)
+
+    def remove(self, path: Path) -> None:
+        position = self._positions.pop(path, None)
+        if position is None:
+            return
+        # move the last entry into the gap, to keep the lists dense
+        last_plot_id = self._plot_ids.pop()
+        last_path = self._paths.pop()
+        if position < len(self._paths):
+            self._plot_ids[position] = last_plot_id
+            self._paths[position] = last_path
+            self._positions[last_path] = position
+
+    def clear(self) -> None:
+        self._plot_ids.clear()
+        self._paths.clear()
+        self._positions.clear()
+
+    def eligible_plots(self, prefix_bits: int, challenge_hash: bytes32, signage_point: bytes32) -> List[Path]:
+        """
+        Returns the paths of the plots which pass the plot filter. This is the
+        same as calling `passes_plot_filter()` for every plot.
+        """
+        if prefix_bits == 0:
+            return list(self._paths)
+        suffix = challenge_hash + signage_point
+        # the plot passes if the first prefix_bits bits of the filter hash are
+        # zero. We only look at the bytes needed to cover them
+        prefix_bytes = (prefix_bits + 7) // 8
+        shift = prefix_bytes * 8 - prefix_bits
+        from_bytes = int.from_bytes
+        paths = self._paths
+        return [
+            paths[i]
+            for i, plot_id in enumerate(self._plot_ids)
+            if from_bytes(sha256(plot_id + suffix).digest()[:prefix_bytes], "big") >> shift == 0
+        ]
@@ -45,6 +45,8 @@ class PlotInfo:
     plot_public_key: G1Element
     file_size: int
     time_modified: float
+    # `st_dev` of the plot file, used to schedule lookups per disk
+    device: int = 0
 
 
 class PlotRefreshEvents(Enum):
@@ -26,6 +26,7 @@ from chia.types.mempool_inclusion_status import MempoolInclusionStatus
 from chia.types.mempool_item import MempoolItem
 from chia.types.spend_bundle import SpendBundle
 from chia.types.unfinished_header_block import UnfinishedHeaderBlock
+from chia.util import cached_bls
 from chia.util.byte_types import hexstr_to_bytes
 from chia.util.ints import uint32, uint64, uint128
 from chia.util.log_exceptions import log_exceptions
@@ -94,6 +95,8 @@ class FullNodeRpcApi:
             "/get_block": self.get_block,
             "/get_blocks": self.get_blocks,
             "/get_block_count_metrics": self.get_block_count_metrics,
+            "/get_pairing_cache_metrics": self.get_pairing_cache_metrics,
+            "/get_cache_metrics": self.get_cache_metrics,
             "/get_block_record_by_height": self.get_block_record_by_height,
             "/get_block_record": self.get_block_record,
             "/get_block_records": self.get_block_records,
@@ -422,6 +425,41 @@ class FullNodeRpcApi:
             json_blocks.append(json)
         return {"blocks": json_blocks}
 
+    async def get_cache_metrics(self, _: Dict[str, Any]) -> EndpointResult:
+        """
+        Returns the size of the full node's caches, and the hits, misses and
+        evictions of the ones in front of the database.
+        """
+        block_store = self.service.block_store
+        coin_store = self.service.coin_store
+        full_node_store = self.service.full_node_store
+        return {
+            "metrics": {
+                "block_store_blocks": block_store.block_cache.get_metrics(),
+                "block_store_ses_challenges": block_store.ses_challenge_cache.get_metrics(),
+                "block_store_generators": block_store.generator_cache.get_metrics(),
+                # the coin store counts the hits and misses of its unspent cache itself
+                "coin_store_unspent": {
+                    **coin_store.unspent_cache.get_metrics(),
+                    "hits": coin_store.unspent_cache_hits,
+                    "misses": coin_store.unspent_cache_misses,
+                },
+                "coin_store_coins_added_at_height": coin_store.coins_added_at_height_cache.get_metrics(),
+                "full_node_store_recent_signage_points": full_node_store.recent_signage_points.get_metrics(),
+                "full_node_store_recent_eos": full_node_store.recent_eos.get_metrics(),
+                "bls_pairings": cached_bls.LOCAL_CACHE.get_metrics(),
+            }
+        }
+
+    async def get_pairing_cache_metrics(self, _: Dict[str, Any]) -> EndpointResult:
+        """
+        Returns the hits and misses of the BLS pairing cache shared with the
+        validation workers, for each process using it.
+        """
+        if self.service.pairing_cache is None:
+            return {"metrics": None}
+        return {"metrics": self.service.pairing_cache.get_metrics()}
+
     async def get_block_count_metrics(self, _: Dict[str, Any]) -> EndpointResult:
         compact_blocks = 0
         uncompact_blocks = 0
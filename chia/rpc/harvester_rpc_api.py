@@ -23,6 +23,7 @@ class HarvesterRpcApi:
             "/remove_plot_directory": self.remove_plot_directory,
             "/get_harvester_config": self.get_harvester_config,
             "/update_harvester_config": self.update_harvester_config,
+            "/get_disk_metrics": self.get_disk_metrics,
         }
 
     async def _state_changed(self, change: str, change_data: Optional[Dict[str, Any]] = None) -> List[WsRpcMessage]:
@@ -60,6 +61,9 @@ class HarvesterRpcApi:
         self.service.plot_manager.trigger_refresh()
         return {}
 
+    async def get_disk_metrics(self, _: Dict[str, Any]) -> EndpointResult:
+        return {"disks": self.service.get_disk_metrics()}
+
     async def delete_plot(self, request: Dict[str, Any]) -> EndpointResult:
         filename = request["filename"]
         if self.service.delete_plot(filename):
@@ -20,6 +20,12 @@ class HarvesterRpcClient(RpcClient):
     async def refresh_plots(self) -> None:
         await self.fetch("refresh_plots", {})
 
+    async def get_disk_metrics(self) -> List[Dict[str, Any]]:
+        response = await self.fetch("get_disk_metrics", {})
+        # TODO: casting due to lack of type checked deserialization
+        result = cast(List[Dict[str, Any]], response["disks"])
+        return result
+
     async def delete_plot(self, filename: str) -> bool:
         response = await self.fetch("delete_plot", {"filename": filename})
         # TODO: casting due to lack of type checked deserialization
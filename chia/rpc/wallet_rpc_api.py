@@ -21,6 +21,7 @@ from chia.protocols.wallet_protocol import CoinState
 from chia.rpc.rpc_server import Endpoint, EndpointResult, default_get_connections
 from chia.rpc.util import marshal, tx_endpoint
 from chia.rpc.wallet_request_types import GetNotifications, GetNotificationsResponse
+from chia.rpc.wallet_state_deltas import DELTA_STATE_CHANGES, WalletStateDeltas
 from chia.server.outbound_message import NodeType, make_msg
 from chia.server.ws_connection import WSChiaConnection
 from chia.simulator.simulator_protocol import FarmNewBlockProtocol
@@ -134,6 +135,8 @@ class WalletRpcApi:
         assert wallet_node is not None
         self.service = wallet_node
         self.service_name = "chia_wallet"
+        # started by the first get_state_deltas request
+        self.state_deltas: Optional[WalletStateDeltas] = None
 
     def get_routes(self) -> Dict[str, Endpoint]:
         return {
@@ -151,6 +154,8 @@ class WalletRpcApi:
             "/set_wallet_resync_on_startup": self.set_wallet_resync_on_startup,
             "/get_sync_status": self.get_sync_status,
             "/get_height_info": self.get_height_info,
+            "/get_cache_metrics": self.get_cache_metrics,
+            "/get_state_deltas": self.get_state_deltas,
             "/push_tx": self.push_tx,
             "/push_transactions": self.push_transactions,
             "/farm_block": self.farm_block,  # Only when node simulator is running
@@ -302,6 +307,18 @@ class WalletRpcApi:
 
         payloads.append(create_payload_dict("state_changed", change_data, self.service_name, "wallet_ui"))
 
+        if self.state_deltas is not None and change in DELTA_STATE_CHANGES and change_data is not None:
+            deltas = await self.state_deltas.changed(change_data.get("wallet_id"))
+            if len(deltas) > 0:
+                payloads.append(
+                    create_payload_dict(
+                        "state_deltas",
+                        {"stream_id": self.state_deltas.stream_id, "cursor": deltas[-1]["seq"], "deltas": deltas},
+                        self.service_name,
+                        "wallet_deltas",
+                    )
+                )
+
         return payloads
 
     async def _stop_wallet(self) -> None:
@@ -594,6 +611,49 @@ class WalletRpcApi:
         height = await self.service.wallet_state_manager.blockchain.get_finished_sync_up_to()
         return {"height": height}
 
+    async def get_cache_metrics(self, request: Dict[str, Any]) -> EndpointResult:
+        """
+        Returns the size of the wallet's caches, and the hits, misses and
+        evictions of the ones in front of the database. The peer request caches
+        are keyed by the node id of the peer.
+        """
+        coin_store = self.service.wallet_state_manager.coin_store
+        puzzle_store = self.service.wallet_state_manager.puzzle_store
+        return {
+            "metrics": {
+                "coin_store_total_count": coin_store.total_count_cache.get_metrics(),
+                "puzzle_store_wallet_identifier": puzzle_store.wallet_identifier_cache.get_metrics(),
+                "peer_requests": {
+                    peer_id.hex(): cache.get_metrics() for peer_id, cache in self.service.peer_caches.items()
+                },
+            }
+        }
+
+    async def get_state_deltas(self, request: Dict[str, Any]) -> EndpointResult:
+        """
+        Returns the changes to the unspent coins, pending transactions and
+        balances of the wallets after the cursor of a previous response, and
+        starts pushing them to the "wallet_deltas" service of the daemon as they
+        happen. Without a cursor, only the current cursor is returned, to follow
+        the changes made after the full state has been fetched. If the deltas
+        after the cursor are no longer available, reset is true and the full
+        state has to be fetched again.
+        """
+        if self.state_deltas is None:
+            self.state_deltas = WalletStateDeltas(self.service)
+        await self.state_deltas.update()
+        stream_id = self.state_deltas.stream_id
+        cursor = request.get("cursor")
+        deltas = None
+        if cursor is not None and request.get("stream_id", stream_id) == stream_id:
+            deltas = self.state_deltas.get_deltas(int(cursor))
+        return {
+            "stream_id": stream_id,
+            "cursor": self.state_deltas.cursor,
+            "deltas": [] if deltas is None else deltas,
+            "reset": cursor is not None and deltas is None,
+        }
+
     async def get_network_info(self, request: Dict[str, Any]) -> EndpointResult:
         network_name = self.service.config["selected_network"]
         address_prefix = self.service.config["network_overrides"]["config"][network_name]["address_prefix"]
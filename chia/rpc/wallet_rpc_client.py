@@ -104,6 +104,14 @@ class WalletRpcClient(RpcClient):
         # TODO: casting due to lack of type checked deserialization
         return cast(uint32, response["height"])
 
+    async def get_state_deltas(self, cursor: Optional[int] = None, stream_id: Optional[str] = None) -> Dict[str, Any]:
+        request: Dict[str, Any] = {}
+        if cursor is not None:
+            request["cursor"] = cursor
+        if stream_id is not None:
+            request["stream_id"] = stream_id
+        return await self.fetch("get_state_deltas", request)
+
     async def push_tx(self, spend_bundle: SpendBundle) -> Dict[str, Any]:
         return await self.fetch("push_tx", {"spend_bundle": bytes(spend_bundle).hex()})
 
@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from chia.types.blockchain_format.sized_bytes import bytes32
+from chia.util.ints import uint32
+from chia.wallet.transaction_record import TransactionRecord
+from chia.wallet.wallet_node import Balance, WalletNode
+
+# the state changes after which the state of the wallet they name, or of all of them if they don't name one, is
+# compared to the previous one. The balances aren't recorded while the wallet syncs, they are once it's done
+DELTA_STATE_CHANGES = {"coin_added", "coin_removed", "pending_transaction", "tx_update", "sync_changed"}
+
+
+@dataclass
+class _WalletSnapshot:
+    # the coin, transaction, trade and puzzle store generations the snapshot was taken at
+    generations: Tuple[int, int, int, int] = (-1, -1, -1, -1)
+    unspent_coin_ids: Set[bytes32] = field(default_factory=set)
+    pending_tx_ids: Set[bytes32] = field(default_factory=set)
+    balance: Optional[Balance] = None
+
+
+def _transaction_delta(tx: TransactionRecord) -> Dict[str, Any]:
+    return {
+        "type": "transaction_added",
+        "wallet_id": tx.wallet_id,
+        "transaction_id": tx.name,
+        "amount": tx.amount,
+        "fee_amount": tx.fee_amount,
+        "to_puzzle_hash": tx.to_puzzle_hash,
+        "transaction_type": tx.type,
+        "created_at_time": tx.created_at_time,
+    }
+
+
+@dataclass
+class WalletStateDeltas:
+    """
+    A numbered log of the changes to the unspent coins, pending transactions
+    and balances of the wallets. The changes are found by comparing the state
+    of a wallet to the one seen the previous time, whenever the wallet reports
+    a state change, so a client only has to fetch the full state once and can
+    then follow the deltas after its cursor.
+
+    The state changes only mark the wallet they name, see changed(). All of
+    the wallets marked while an update is running are compared by the one
+    after it, so a burst of coin events, e.g. while syncing, costs a few
+    comparisons of the whole wallet rather than one per event.
+
+    Only the last max_deltas are kept. A client whose cursor is older than
+    that, or from another stream, i.e. before the wallet was restarted or
+    logged in with another key, has to fetch the full state again.
+    """
+
+    wallet_node: WalletNode
+    max_deltas: int = 10000
+    stream_id: str = ""
+    cursor: int = 0
+    _fingerprint: Optional[int] = None
+    _deltas: Deque[Dict[str, Any]] = field(default_factory=deque)
+    _snapshots: Dict[int, _WalletSnapshot] = field(default_factory=dict)
+    _lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    # the wallets that changed since the last update started, and whether an update is waiting for the lock to
+    # compare them
+    _changed: Set[int] = field(default_factory=set)
+    _update_waiting: bool = False
+
+    async def _reset(self) -> None:
+        self.stream_id = bytes32.secret().hex()
+        self.cursor = 0
+        self._fingerprint = self.wallet_node.logged_in_fingerprint
+        self._deltas.clear()
+        self._snapshots.clear()
+        if self.wallet_node._wallet_state_manager is None:
+            return
+        # the state the wallets are in now is the starting point, it's not reported as deltas
+        for wallet_id in list(self.wallet_node.wallet_state_manager.wallets):
+            snapshot = _WalletSnapshot()
+            await self._diff(wallet_id, snapshot)
+            self._snapshots[wallet_id] = snapshot
+
+    async def update(self, wallet_ids: Optional[Iterable[int]] = None) -> List[Dict[str, Any]]:
+        """
+        Compares the state of the wallets to the previous one, all of them if
+        wallet_ids is None, and returns the new deltas.
+        """
+        async with self._lock:
+            return await self._update(wallet_ids)
+
+    async def changed(self, wallet_id: Optional[int]) -> List[Dict[str, Any]]:
+        """
+        Marks the state of the wallet as changed, or of all of them if
+        wallet_id is None, and returns the new deltas. The call that starts an
+        update returns the deltas of all the wallets marked until it starts,
+        the calls it covers return no deltas.
+        """
+        if wallet_id is not None:
+            self._changed.add(wallet_id)
+        elif self.wallet_node._wallet_state_manager is not None:
+            self._changed.update(self.wallet_node.wallet_state_manager.wallets)
+        if self._update_waiting:
+            return []
+        self._update_waiting = True
+        async with self._lock:
+            self._update_waiting = False
+            wallet_ids = self._changed
+            self._changed = set()
+            return await self._update(wallet_ids)
+
+    async def _update(self, wallet_ids: Optional[Iterable[int]]) -> List[Dict[str, Any]]:
+        if self.stream_id == "" or self._fingerprint != self.wallet_node.logged_in_fingerprint:
+            await self._reset()
+            return []
+        if self.wallet_node._wallet_state_manager is None:
+            return []
+        wallets = self.wallet_node.wallet_state_manager.wallets
+        for wallet_id in list(self._snapshots):
+            if wallet_id not in wallets:
+                del self._snapshots[wallet_id]
+        deltas: List[Dict[str, Any]] = []
+        for wallet_id in list(wallets) if wallet_ids is None else wallet_ids:
+            if wallet_id not in wallets:
+                continue
+            # a wallet created after the stream started is reported from its first coin on
+            snapshot = self._snapshots.setdefault(wallet_id, _WalletSnapshot())
+            deltas.extend(await self._diff(wallet_id, snapshot))
+        for delta in deltas:
+            self.cursor += 1
+            delta["seq"] = self.cursor
+            self._deltas.append(delta)
+        while len(self._deltas) > self.max_deltas:
+            self._deltas.popleft()
+        return deltas
+
+    async def _diff(self, wallet_id: int, snapshot: _WalletSnapshot) -> List[Dict[str, Any]]:
+        wallet_state_manager = self.wallet_node.wallet_state_manager
+        coin_store = wallet_state_manager.coin_store
+        tx_store = wallet_state_manager.tx_store
+        # while the wallet syncs, get_balance() returns the balance from before the sync. While another task writes to
+        # the stores, their generations already count the writes the reads here can't see yet
+        settled = not wallet_state_manager.sync_mode and not wallet_state_manager.db_wrapper.writer_active()
+        # the generations are read first, a write while the state is read leaves the snapshot behind the stores,
+        # which makes the next update read it again
+        generations = (
+            coin_store.generations.of_wallet(wallet_id),
+            tx_store.generations.of_wallet(wallet_id),
+            wallet_state_manager.trade_manager.trade_store.generations.total,
+            # the balance also depends on the derivation paths, see WalletNode._balance_cache_key()
+            wallet_state_manager.puzzle_store.generations.of_wallet(wallet_id),
+        )
+        if generations == snapshot.generations:
+            return []
+        deltas: List[Dict[str, Any]] = []
+
+        if generations[0] != snapshot.generations[0]:
+            # the index is kept up to date by the coin store, the coins are copied before the reads below let it
+            # change
+            unspent = dict((await wallet_state_manager.get_unspent_coin_index(wallet_id)).by_name)
+            for coin_id, record in unspent.items():
+                if coin_id not in snapshot.unspent_coin_ids:
+                    deltas.append(
+                        {
+                            "type": "coin_added",
+                            "wallet_id": wallet_id,
+                            "coin_id": coin_id,
+                            "coin": record.coin,
+                            "confirmed_height": record.confirmed_block_height,
+                        }
+                    )
+            for coin_id in snapshot.unspent_coin_ids.difference(unspent):
+                coin_record = await coin_store.get_coin_record(coin_id)
+                if coin_record is not None and coin_record.spent:
+                    deltas.append(
+                        {
+                            "type": "coin_spent",
+                            "wallet_id": wallet_id,
+                            "coin_id": coin_id,
+                            "spent_height": coin_record.spent_block_height,
+                        }
+                    )
+                else:
+                    # rolled back in a reorg
+                    deltas.append({"type": "coin_removed", "wallet_id": wallet_id, "coin_id": coin_id})
+            snapshot.unspent_coin_ids = set(unspent)
+
+        if generations[1] != snapshot.generations[1]:
+            pending = {tx.name: tx for tx in await tx_store.get_unconfirmed_for_wallet(wallet_id)}
+            for tx_id, tx in pending.items():
+                if tx_id not in snapshot.pending_tx_ids:
+                    deltas.append(_transaction_delta(tx))
+            for tx_id in snapshot.pending_tx_ids.difference(pending):
+                tx_record = await tx_store.get_transaction_record(tx_id)
+                if tx_record is not None and tx_record.confirmed:
+                    deltas.append(
+                        {
+                            "type": "transaction_confirmed",
+                            "wallet_id": wallet_id,
+                            "transaction_id": tx_id,
+                            "confirmed_at_height": tx_record.confirmed_at_height,
+                        }
+                    )
+                else:
+                    deltas.append({"type": "transaction_removed", "wallet_id": wallet_id, "transaction_id": tx_id})
+            snapshot.pending_tx_ids = set(pending)
+
+        # the balance and the generations are only recorded once the wallet is settled, until then every update
+        # compares it again
+        if not settled:
+            return deltas
+        balance = await self.wallet_node.get_balance(uint32(wallet_id))
+        if wallet_state_manager.sync_mode or wallet_state_manager.db_wrapper.writer_active():
+            return deltas
+        if balance != snapshot.balance:
+            deltas.append({"type": "balance", "wallet_id": wallet_id, "balance": balance})
+            snapshot.balance = balance
+        snapshot.generations = generations
+        return deltas
+
+    def get_deltas(self, cursor: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Returns the deltas after cursor, or None if some of them are no longer
+        kept or the cursor is not from this stream.
+        """
+        oldest = self._deltas[0]["seq"] if len(self._deltas) > 0 else self.cursor + 1
+        if cursor < oldest - 1 or cursor > self.cursor:
+            return None
+        return list(itertools.islice(self._deltas, cursor + 1 - oldest, None))
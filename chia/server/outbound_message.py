@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from enum import IntEnum
-from typing import Optional, SupportsBytes, Union
+from typing import ClassVar, Optional, SupportsBytes, Union
 
 from chia.protocols.protocol_message_types import ProtocolMessageTypes
 from chia.util.ints import uint8, uint16
@@ -28,6 +28,10 @@ class Message(Streamable):
     # Message data for that type
     data: bytes
 
+    # when broadcasting, the same message is sent to many peers. This way we
+    # only serialize it once
+    _streamable_cache_bytes: ClassVar[bool] = True
+
 
 def make_msg(msg_type: ProtocolMessageTypes, data: Union[bytes, SupportsBytes]) -> Message:
     return Message(uint8(msg_type.value), None, bytes(data))
@@ -580,10 +580,14 @@ class ChiaServer:
         exclude: Optional[bytes32] = None,
     ) -> None:
         await self.validate_broadcast_message_type(messages, node_type)
-        for _, connection in self.all_connections.items():
-            if connection.connection_type is node_type and connection.peer_node_id != exclude:
-                for message in messages:
-                    await connection.send_message(message)
+        await self._broadcast(
+            messages,
+            [
+                connection
+                for connection in self.all_connections.values()
+                if connection.connection_type is node_type and connection.peer_node_id != exclude
+            ],
+        )
 
     async def send_to_all_if(
         self,
@@ -593,10 +597,29 @@ class ChiaServer:
         exclude: Optional[bytes32] = None,
     ) -> None:
         await self.validate_broadcast_message_type(messages, node_type)
-        for _, connection in self.all_connections.items():
-            if connection.connection_type is node_type and connection.peer_node_id != exclude and predicate(connection):
-                for message in messages:
-                    await connection.send_message(message)
+        await self._broadcast(
+            messages,
+            [
+                connection
+                for connection in self.all_connections.values()
+                if connection.connection_type is node_type
+                and connection.peer_node_id != exclude
+                and predicate(connection)
+            ],
+        )
+
+    async def _broadcast(self, messages: List[Message], connections: List[WSChiaConnection]) -> None:
+        """
+        Queues the messages on each of the connections. Message caches its
+        serialized form, so each message is encoded once here, and all the
+        connections send the same buffer. The actual sending happens
+        concurrently, in each connection's outbound handler.
+        """
+        for message in messages:
+            bytes(message)
+        for connection in connections:
+            for message in messages:
+                await connection.send_message(message)
 
     async def send_to_specific(self, messages: List[Message], node_id: bytes32) -> None:
         if node_id in self.all_connections:
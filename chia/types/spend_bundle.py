@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Any, Dict, List
+from typing import Any, ClassVar, Dict, List
 
 from chia_rs import AugSchemeMPL, G2Element
 
@@ -28,6 +28,10 @@ class SpendBundle(Streamable):
     coin_spends: List[CoinSpend]
     aggregated_signature: G2Element
 
+    # spend bundles are hashed (name()) and serialized many times while they
+    # pass through the mempool and get relayed to peers
+    _streamable_cache_bytes: ClassVar[bool] = True
+
     @classmethod
     def aggregate(cls, spend_bundles: List[SpendBundle]) -> SpendBundle:
         coin_spends: List[CoinSpend] = []
@@ -1,18 +1,30 @@
 from __future__ import annotations
 
 import functools
+import logging
 from typing import Dict, List, Optional, Sequence
 
 from chia_rs import AugSchemeMPL, G1Element, G2Element, GTElement
+from typing_extensions import Protocol
 
 from chia.types.blockchain_format.sized_bytes import bytes32, bytes48
 from chia.util.hash import std_hash
 from chia.util.lru_cache import LRUCache
+from chia.util.setproctitle import setproctitle
+from chia.util.shared_pairing_cache import SharedPairingCache
 
+log = logging.getLogger(__name__)
 
-def get_pairings(
-    cache: LRUCache[bytes32, GTElement], pks: List[bytes48], msgs: Sequence[bytes], force_cache: bool
-) -> List[GTElement]:
+
+class PairingCache(Protocol):
+    def get(self, key: bytes32) -> Optional[GTElement]:
+        ...
+
+    def put(self, key: bytes32, value: GTElement) -> None:
+        ...
+
+
+def get_pairings(cache: PairingCache, pks: List[bytes48], msgs: Sequence[bytes], force_cache: bool) -> List[GTElement]:
     pairings: List[Optional[GTElement]] = []
     missing_count: int = 0
     for pk, msg in zip(pks, msgs):
@@ -56,14 +68,43 @@ def get_pairings(
 # Increasing this number will increase RAM usage, but decrease BLS validation time for blocks and unfinished blocks.
 LOCAL_CACHE: LRUCache[bytes32, GTElement] = LRUCache(50000)
 
+# The pairing cache shared by the full node and its validation workers. When
+# set, it's used instead of LOCAL_CACHE
+_shared_cache: Optional[SharedPairingCache] = None
+
+
+def shared_cache() -> Optional[SharedPairingCache]:
+    return _shared_cache
+
+
+def set_shared_cache(cache: Optional[SharedPairingCache]) -> None:
+    global _shared_cache
+    _shared_cache = cache
+
+
+def init_worker(process_title: str, shared_cache_name: Optional[str], consumer: str) -> None:
+    """
+    The initializer of validation worker processes. It attaches the worker to
+    the shared pairing cache, if there is one.
+    """
+    setproctitle(process_title)
+    if shared_cache_name is None:
+        return
+    try:
+        set_shared_cache(SharedPairingCache.attach(shared_cache_name, consumer))
+    except OSError as e:
+        log.warning(f"failed to attach to the shared pairing cache {shared_cache_name}: {e}")
+
 
 def aggregate_verify(
     pks: List[bytes48],
     msgs: Sequence[bytes],
     sig: G2Element,
     force_cache: bool = False,
-    cache: LRUCache[bytes32, GTElement] = LOCAL_CACHE,
+    cache: Optional[PairingCache] = None,
 ) -> bool:
+    if cache is None:
+        cache = LOCAL_CACHE if _shared_cache is None else _shared_cache
     pairings: List[GTElement] = get_pairings(cache, pks, msgs, force_cache)
     if len(pairings) == 0:
         # Using AugSchemeMPL.aggregate_verify, so it's safe to use from_bytes_unchecked
@@ -112,6 +112,9 @@ class DBWrapper2:
     _in_use: Dict[asyncio.Task[object], aiosqlite.Connection] = field(default_factory=dict)
     _current_writer: Optional[asyncio.Task[object]] = None
     _savepoint_name: int = 0
+    # the number of transactions and savepoints that were rolled back. Callers
+    # that keep the changes they write in memory too can tell when to drop them
+    rollbacks: int = 0
 
     async def add_connection(self, c: aiosqlite.Connection) -> None:
         # this guarantees that reader connections can only be used for reading
@@ -229,6 +232,13 @@ class DBWrapper2:
             if self._log_file is not None:
                 self._log_file.close()
 
+    def writer_active(self) -> bool:
+        """
+        Returns True while a write transaction is in progress. Its changes are
+        not visible to other tasks until it commits.
+        """
+        return self._current_writer is not None
+
     def _next_savepoint(self) -> str:
         name = f"s{self._savepoint_name}"
         self._savepoint_name += 1
@@ -241,6 +251,7 @@ class DBWrapper2:
         try:
             yield
         except:  # noqa E722
+            self.rollbacks += 1
             await self._write_connection.execute(f"ROLLBACK TO {name}")
             raise
         finally:
@@ -1,23 +1,39 @@
 from __future__ import annotations
 
+import time
 from collections import OrderedDict
-from typing import Generic, Optional, TypeVar
+from typing import Any, Dict, Generic, Optional, TypeVar
 
 K = TypeVar("K")
 V = TypeVar("V")
 
+_MISSING: Any = object()
+
 
 class LRUCache(Generic[K, V]):
+    """
+    A least recently used cache of at most capacity entries. get() and put()
+    do no more than an OrderedDict has to, see MeteredLRUCache for a cache
+    that counts its hits and misses, and whose entries can weigh more than 1 or
+    expire.
+    """
+
     def __init__(self, capacity: int):
         self.cache: OrderedDict[K, V] = OrderedDict()
         self.capacity = capacity
 
+    def __len__(self) -> int:
+        return len(self.cache)
+
+    @property
+    def weight(self) -> int:
+        return len(self.cache)
+
     def get(self, key: K) -> Optional[V]:
         if key not in self.cache:
             return None
-        else:
-            self.cache.move_to_end(key)
-            return self.cache[key]
+        self.cache.move_to_end(key)
+        return self.cache[key]
 
     def put(self, key: K, value: V) -> None:
         self.cache[key] = value
@@ -27,3 +43,106 @@ class LRUCache(Generic[K, V]):
 
     def remove(self, key: K) -> None:
         self.cache.pop(key)
+
+    def pop(self, key: K) -> Optional[V]:
+        value = self.cache.pop(key, _MISSING)
+        if value is _MISSING:
+            return None
+        self._forget(key)
+        return value  # type: ignore[no-any-return]
+
+    def _forget(self, key: K) -> None:
+        # drops what subclasses keep about an entry that was removed from the cache
+        pass
+
+    def clear(self) -> None:
+        self.cache.clear()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {"entries": len(self.cache), "weight": self.weight, "capacity": self.capacity}
+
+
+class MeteredLRUCache(LRUCache[K, V]):
+    """
+    An LRUCache that counts its hits, misses and evictions for get_metrics().
+    Every entry has a weight, 1 unless another one is passed to put(), and the
+    least recently used entries are evicted once the total weight exceeds
+    capacity. If ttl is set, entries expire that many seconds after they were
+    put.
+    """
+
+    def __init__(self, capacity: int, *, ttl: Optional[float] = None):
+        super().__init__(capacity)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # the weights of the entries whose weight isn't 1, and how much they add to the number of entries
+        self._weights: Dict[K, int] = {}
+        self._extra_weight = 0
+        self._expires: Optional[Dict[K, float]] = None if ttl is None else {}
+
+    @property
+    def weight(self) -> int:
+        return len(self.cache) + self._extra_weight
+
+    def get(self, key: K) -> Optional[V]:
+        cache = self.cache
+        if key in cache:
+            if self._expires is not None and self._expires[key] <= time.monotonic():
+                self.remove(key)
+            else:
+                cache.move_to_end(key)
+                self.hits += 1
+                return cache[key]
+        self.misses += 1
+        return None
+
+    def put(self, key: K, value: V, weight: int = 1) -> None:
+        cache = self.cache
+        if weight == 1 and not self._weights and self._expires is None:
+            # every entry weighs 1 and doesn't expire
+            cache[key] = value
+            cache.move_to_end(key)
+            if len(cache) > self.capacity:
+                cache.popitem(last=False)
+                self.evictions += 1
+            return
+        if weight > self.capacity:
+            if key in cache:
+                self.remove(key)
+            return
+        if key in cache:
+            cache.move_to_end(key)
+            if self._weights:
+                self._extra_weight -= self._weights.pop(key, 1) - 1
+        cache[key] = value
+        if weight != 1:
+            self._weights[key] = weight
+            self._extra_weight += weight - 1
+        if self._expires is not None:
+            self._expires[key] = time.monotonic() + self.ttl  # type: ignore[operator]
+        while len(cache) + self._extra_weight > self.capacity:
+            evicted, _ = cache.popitem(last=False)
+            self._forget(evicted)
+            self.evictions += 1
+
+    def remove(self, key: K) -> None:
+        self.cache.pop(key)
+        self._forget(key)
+
+    def _forget(self, key: K) -> None:
+        if self._weights:
+            self._extra_weight -= self._weights.pop(key, 1) - 1
+        if self._expires is not None:
+            del self._expires[key]
+
+    def clear(self) -> None:
+        super().clear()
+        self._weights.clear()
+        self._extra_weight = 0
+        if self._expires is not None:
+            self._expires.clear()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {**super().get_metrics(), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import struct
+from dataclasses import dataclass
+from hashlib import sha256
+from multiprocessing.shared_memory import SharedMemory
+from multiprocessing.util import Finalize
+from typing import Any, Dict, Optional, Tuple
+
+from chia_rs import GTElement
+
+from chia.types.blockchain_format.sized_bytes import bytes32
+
+# the processes using the cache. Each keeps its own hit and miss counters
+PAIRING_CACHE_CONSUMERS: Tuple[str, ...] = ("full_node", "block_validation", "mempool")
+
+# each process adds the hits and misses it counted to the shared counters
+# after this many lookups, and when it exits
+COUNTER_FLUSH_INTERVAL = 1000
+
+# the header is the number of slots, followed by the hits and misses of each
+# consumer. Each of these is on its own cache line, so the processes of one
+# consumer don't contend with the others for it
+_CACHE_LINE = 64
+_NUM_SLOTS = struct.Struct("<Q")
+_COUNTERS = struct.Struct("<QQ")
+_HEADER_SIZE = _CACHE_LINE * (1 + len(PAIRING_CACHE_CONSUMERS))
+_KEY_SIZE = 32
+_VALUE_SIZE: int = GTElement.SIZE
+_CHECK_SIZE = 32
+_SLOT_SIZE = _KEY_SIZE + _VALUE_SIZE + _CHECK_SIZE
+
+
+@dataclass
+class SharedPairingCache:
+    """
+    A cache of BLS pairings in shared memory, which the full node and all its
+    validation worker processes read from and write to. Keys are
+    std_hash(pk + msg), the same as cached_bls uses.
+
+    The cache is a fixed size table, each key has exactly one slot it can be
+    stored in, and a new entry replaces whatever was in its slot. There are no
+    locks. Instead, every slot stores the sha256 of its key and value, and a
+    slot that is being written to by another process at the same time will not
+    match it, which makes it a cache miss.
+    """
+
+    shm: SharedMemory
+    num_slots: int
+    consumer: int
+    owner: bool
+    # the hits and misses not added to the shared counters yet
+    hits: int = 0
+    misses: int = 0
+    closed: bool = False
+
+    @classmethod
+    def create(cls, num_slots: int, consumer: str = "full_node") -> SharedPairingCache:
+        if num_slots <= 0:
+            raise ValueError(f"invalid number of slots: {num_slots}")
+        shm = SharedMemory(create=True, size=_HEADER_SIZE + num_slots * _SLOT_SIZE)
+        shm.buf[:_HEADER_SIZE] = bytes(_HEADER_SIZE)
+        _NUM_SLOTS.pack_into(shm.buf, 0, num_slots)
+        return cls(shm, num_slots, PAIRING_CACHE_CONSUMERS.index(consumer), True)
+
+    @classmethod
+    def attach(cls, name: str, consumer: str) -> SharedPairingCache:
+        shm = SharedMemory(name=name)
+        num_slots: int = _NUM_SLOTS.unpack_from(shm.buf, 0)[0]
+        cache = cls(shm, num_slots, PAIRING_CACHE_CONSUMERS.index(consumer), False)
+        # worker processes don't close the cache themselves. This runs when
+        # they exit, so the lookups since the last flush are still counted
+        Finalize(cache, cache.close, exitpriority=0)
+        return cache
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def _slot_offset(self, key: bytes32) -> int:
+        slot = int.from_bytes(key[:8], "little") % self.num_slots
+        return _HEADER_SIZE + slot * _SLOT_SIZE
+
+    def _count(self, miss: bool) -> None:
+        if miss:
+            self.misses += 1
+        else:
+            self.hits += 1
+        if self.hits + self.misses >= COUNTER_FLUSH_INTERVAL:
+            self.flush_counters()
+
+    def flush_counters(self) -> None:
+        """
+        Adds the hits and misses counted by this process to the shared
+        counters of its consumer. Two processes of the same consumer flushing
+        at the same time may lose one of the updates, the counters are only
+        used for metrics.
+        """
+        if self.hits == 0 and self.misses == 0:
+            return
+        offset = _CACHE_LINE * (1 + self.consumer)
+        hits, misses = _COUNTERS.unpack_from(self.shm.buf, offset)
+        _COUNTERS.pack_into(self.shm.buf, offset, hits + self.hits, misses + self.misses)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: bytes32) -> Optional[GTElement]:
+        offset = self._slot_offset(key)
+        slot = bytes(self.shm.buf[offset : offset + _SLOT_SIZE])
+        if slot[:_KEY_SIZE] != key:
+            self._count(miss=True)
+            return None
+        value = slot[_KEY_SIZE : _KEY_SIZE + _VALUE_SIZE]
+        if sha256(slot[: _KEY_SIZE + _VALUE_SIZE]).digest() != slot[_KEY_SIZE + _VALUE_SIZE :]:
+            self._count(miss=True)
+            return None
+        self._count(miss=False)
+        return GTElement.from_bytes_unchecked(value)
+
+    def put(self, key: bytes32, value: GTElement) -> None:
+        entry = key + bytes(value)
+        offset = self._slot_offset(key)
+        self.shm.buf[offset : offset + _SLOT_SIZE] = entry + sha256(entry).digest()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        self.flush_counters()
+        metrics: Dict[str, Any] = {"slots": self.num_slots}
+        for i, consumer in enumerate(PAIRING_CACHE_CONSUMERS):
+            hits, misses = _COUNTERS.unpack_from(self.shm.buf, _CACHE_LINE * (1 + i))
+            metrics[consumer] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses > 0 else 0.0,
+            }
+        return metrics
+
+    def close(self) -> None:
+        """
+        Detaches from the shared memory. The process that created the cache
+        also removes it.
+        """
+        if self.closed:
+            return
+        self.flush_counters()
+        self.closed = True
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
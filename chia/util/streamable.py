@@ -20,15 +20,17 @@ from typing import (
     Type,
     TypeVar,
     Union,
+    cast,
     get_type_hints,
 )
 
 from typing_extensions import Literal, get_args, get_origin
 
 from chia.types.blockchain_format.sized_bytes import bytes32
-from chia.util.byte_types import hexstr_to_bytes
+from chia.util.byte_types import SizedBytes, hexstr_to_bytes
 from chia.util.hash import std_hash
 from chia.util.ints import uint32
+from chia.util.struct_stream import StructStream
 
 if TYPE_CHECKING:
     from _typeshed import DataclassInstance
@@ -84,6 +86,9 @@ class ConversionError(StreamableError):
 _T_Streamable = TypeVar("_T_Streamable", bound="Streamable")
 
 ParseFunctionType = Callable[[BinaryIO], object]
+# takes the buffer, the offset to parse from and whether the data is trusted.
+# Returns the parsed value and the offset of the next item
+ParseViewFunctionType = Callable[[memoryview, int, bool], Tuple[object, int]]
 StreamFunctionType = Callable[[object, BinaryIO], None]
 ConvertFunctionType = Callable[[object], object]
 
@@ -95,6 +100,7 @@ class Field:
     has_default: bool
     stream_function: StreamFunctionType
     parse_function: ParseFunctionType
+    parse_view_function: ParseViewFunctionType
     convert_function: ConvertFunctionType
     post_init_function: ConvertFunctionType
 
@@ -115,6 +121,7 @@ def create_fields(cls: Type[DataclassInstance]) -> StreamableFields:
                 or field.default_factory is not dataclasses.MISSING,
                 stream_function=function_to_stream_one_item(hint),
                 parse_function=function_to_parse_one_item(hint),
+                parse_view_function=function_to_parse_view_one_item(hint),
                 convert_function=function_to_convert_one_item(hint),
                 post_init_function=function_to_post_init_process_one_item(hint),
             )
@@ -408,6 +415,159 @@ def function_to_parse_one_item(f_type: Type[Any]) -> ParseFunctionType:
     raise UnsupportedType(f"Type {f_type} does not have parse")
 
 
+def parse_view_bool(buf: memoryview, pos: int, trusted: bool) -> Tuple[bool, int]:
+    assert pos < len(buf)  # Checks for EOF
+    bool_byte = buf[pos]
+    if bool_byte == 0:
+        return False, pos + 1
+    elif bool_byte == 1:
+        return True, pos + 1
+    else:
+        raise ValueError("Bool byte must be 0 or 1")
+
+
+def parse_view_size(buf: memoryview, pos: int) -> Tuple[int, int]:
+    # the 4 byte size prefix of lists, bytes and str. It's only used for
+    # parsing, so there's no need to construct a uint32
+    end = pos + 4
+    assert end <= len(buf)  # Checks for EOF
+    return int.from_bytes(buf[pos:end], "big"), end
+
+
+def parse_view_optional(
+    buf: memoryview, pos: int, trusted: bool, parse_inner_type_f: ParseViewFunctionType
+) -> Tuple[Optional[object], int]:
+    assert pos < len(buf)  # Checks for EOF
+    is_present = buf[pos]
+    if is_present == 0:
+        return None, pos + 1
+    elif is_present == 1:
+        return parse_inner_type_f(buf, pos + 1, trusted)
+    else:
+        raise ValueError("Optional must be 0 or 1")
+
+
+def parse_view_struct_stream(buf: memoryview, pos: int, f_type: Type[Any]) -> Tuple[Any, int]:
+    end = pos + f_type.SIZE
+    if end > len(buf):
+        raise ValueError(f"{f_type.__name__}.from_bytes() requires {f_type.SIZE} bytes but got: {len(buf) - pos}")
+    # SIZE bytes always fit into the type, so we skip the range check in __init__()
+    return int.__new__(f_type, int.from_bytes(buf[pos:end], "big", signed=f_type.SIGNED)), end
+
+
+def parse_view_sized_bytes(buf: memoryview, pos: int, f_type: Type[Any]) -> Tuple[Any, int]:
+    end = pos + f_type._size
+    if end > len(buf):
+        raise ValueError(f"bad {f_type.__name__} initializer {bytes(buf[pos:end])!r}")
+    # we checked the size already, so we skip SizedBytes.__init__()
+    return bytes.__new__(f_type, buf[pos:end]), end
+
+
+def parse_view_rust(buf: memoryview, pos: int, trusted: bool, f_type: Type[Any]) -> Tuple[Any, int]:
+    ret, advance = f_type.parse_rust(buf[pos:], trusted)
+    return ret, pos + advance
+
+
+class _ViewReader:
+    """
+    The subset of BinaryIO needed by the parse() methods of custom items, like
+    Program. Unlike io.BytesIO, it doesn't copy the underlying buffer.
+    """
+
+    def __init__(self, buf: memoryview, pos: int) -> None:
+        self._buf = buf
+        self._pos = pos
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._buf) if size < 0 else min(len(self._buf), self._pos + size)
+        ret = bytes(self._buf[self._pos : end])
+        self._pos = end
+        return ret
+
+    def tell(self) -> int:
+        return self._pos
+
+
+def parse_view_stream(buf: memoryview, pos: int, parse_f: ParseFunctionType) -> Tuple[object, int]:
+    f = _ViewReader(buf, pos)
+    ret = parse_f(cast(BinaryIO, f))
+    return ret, f.tell()
+
+
+def parse_view_bytes(buf: memoryview, pos: int, trusted: bool) -> Tuple[bytes, int]:
+    size, pos = parse_view_size(buf, pos)
+    end = pos + size
+    assert end <= len(buf)  # Checks for EOF
+    return bytes(buf[pos:end]), end
+
+
+def parse_view_list(
+    buf: memoryview, pos: int, trusted: bool, parse_inner_type_f: ParseViewFunctionType
+) -> Tuple[List[object], int]:
+    full_list: List[object] = []
+    list_size, pos = parse_view_size(buf, pos)
+    for list_index in range(list_size):
+        item, pos = parse_inner_type_f(buf, pos, trusted)
+        full_list.append(item)
+    return full_list, pos
+
+
+def parse_view_tuple(
+    buf: memoryview, pos: int, trusted: bool, list_parse_inner_type_f: List[ParseViewFunctionType]
+) -> Tuple[Tuple[object, ...], int]:
+    full_list: List[object] = []
+    for parse_f in list_parse_inner_type_f:
+        item, pos = parse_f(buf, pos, trusted)
+        full_list.append(item)
+    return tuple(full_list), pos
+
+
+def parse_view_str(buf: memoryview, pos: int, trusted: bool) -> Tuple[str, int]:
+    str_size, pos = parse_view_size(buf, pos)
+    end = pos + str_size
+    assert end <= len(buf)  # Checks for EOF
+    return str(buf[pos:end], "utf-8"), end
+
+
+def function_to_parse_view_one_item(f_type: Type[Any]) -> ParseViewFunctionType:
+    """
+    Like function_to_parse_one_item(), but the returned function parses the value
+    from `buf` at offset `pos`, and returns it along with the offset of the
+    following item. This avoids the copies BinaryIO.read() makes.
+    """
+    inner_type: Type[Any]
+    if f_type is bool:
+        return parse_view_bool
+    if is_type_SpecificOptional(f_type):
+        inner_type = get_args(f_type)[0]
+        parse_inner_type_f = function_to_parse_view_one_item(inner_type)
+        return lambda buf, pos, trusted: parse_view_optional(buf, pos, trusted, parse_inner_type_f)
+    if hasattr(f_type, "parse_rust"):
+        return lambda buf, pos, trusted: parse_view_rust(buf, pos, trusted, f_type)
+    if isinstance(f_type, type) and issubclass(f_type, Streamable):
+        return f_type.parse_view
+    if isinstance(f_type, type) and issubclass(f_type, StructStream):
+        return lambda buf, pos, trusted: parse_view_struct_stream(buf, pos, f_type)
+    if isinstance(f_type, type) and issubclass(f_type, SizedBytes):
+        return lambda buf, pos, trusted: parse_view_sized_bytes(buf, pos, f_type)
+    if hasattr(f_type, "parse"):
+        parse_f = f_type.parse
+        return lambda buf, pos, trusted: parse_view_stream(buf, pos, parse_f)
+    if f_type == bytes:
+        return parse_view_bytes
+    if is_type_List(f_type):
+        inner_type = get_args(f_type)[0]
+        parse_inner_type_f = function_to_parse_view_one_item(inner_type)
+        return lambda buf, pos, trusted: parse_view_list(buf, pos, trusted, parse_inner_type_f)
+    if is_type_Tuple(f_type):
+        inner_types = get_args(f_type)
+        list_parse_inner_type_f = [function_to_parse_view_one_item(_) for _ in inner_types]
+        return lambda buf, pos, trusted: parse_view_tuple(buf, pos, trusted, list_parse_inner_type_f)
+    if f_type is str:
+        return parse_view_str
+    raise UnsupportedType(f"Type {f_type} does not have parse")
+
+
 def stream_optional(stream_inner_type_func: StreamFunctionType, item: Any, f: BinaryIO) -> None:
     if item is None:
         f.write(bytes([0]))
@@ -562,6 +722,11 @@ class Streamable:
     """
 
     _streamable_fields: ClassVar[StreamableFields]
+    # Set this to True in a subclass to keep the serialized form and the hash of
+    # an object once they've been computed. This trades memory for speed, for
+    # objects that are serialized or hashed over and over. Since the objects are
+    # frozen, the cached values can't go stale.
+    _streamable_cache_bytes: ClassVar[bool] = False
 
     @classmethod
     def streamable_fields(cls) -> StreamableFields:
@@ -586,28 +751,72 @@ class Streamable:
             object.__setattr__(obj, field.name, field.parse_function(f))
         return obj
 
+    @classmethod
+    def parse_view(
+        cls: Type[_T_Streamable], buf: memoryview, pos: int, trusted: bool = False
+    ) -> Tuple[_T_Streamable, int]:
+        """
+        Parses the object from `buf` at offset `pos`, without copying the
+        buffer. Returns the object and the offset right after it.
+        """
+        obj: _T_Streamable = object.__new__(cls)
+        for field in cls._streamable_fields:
+            value, pos = field.parse_view_function(buf, pos, trusted)
+            object.__setattr__(obj, field.name, value)
+        return obj, pos
+
     def stream(self, f: BinaryIO) -> None:
+        if self._streamable_cache_bytes:
+            f.write(bytes(self))
+            return
+        self._stream_fields(f)
+
+    def _stream_fields(self, f: BinaryIO) -> None:
         for field in self._streamable_fields:
             field.stream_function(getattr(self, field.name), f)
 
     def get_hash(self) -> bytes32:
+        if self._streamable_cache_bytes:
+            cached_hash: Optional[bytes32] = self.__dict__.get("_cached_hash")
+            if cached_hash is None:
+                cached_hash = std_hash(bytes(self), skip_bytes_conversion=True)
+                object.__setattr__(self, "_cached_hash", cached_hash)
+            return cached_hash
         return std_hash(bytes(self), skip_bytes_conversion=True)
 
     @classmethod
     def from_bytes(cls: Type[_T_Streamable], blob: bytes) -> _T_Streamable:
-        f = io.BytesIO(blob)
-        parsed = cls.parse(f)
-        assert f.read() == b""
+        buf = memoryview(blob)
+        parsed, pos = cls.parse_view(buf, 0)
+        assert pos == len(buf)
+        return parsed
+
+    @classmethod
+    def from_bytes_unchecked(cls: Type[_T_Streamable], blob: bytes) -> _T_Streamable:
+        """
+        Like from_bytes(), but the embedded rust types (e.g. G1Element and
+        G2Element) are parsed as trusted, which skips their validation. Only
+        use this for data we serialized ourselves.
+        """
+        buf = memoryview(blob)
+        parsed, pos = cls.parse_view(buf, 0, True)
+        assert pos == len(buf)
         return parsed
 
     def stream_to_bytes(self) -> bytes:
-        f = io.BytesIO()
-        self.stream(f)
-        return bytes(f.getvalue())
+        return bytes(self)
 
     def __bytes__(self: Any) -> bytes:
+        if self._streamable_cache_bytes:
+            cached_bytes: Optional[bytes] = self.__dict__.get("_cached_bytes")
+            if cached_bytes is None:
+                f = io.BytesIO()
+                self._stream_fields(f)
+                cached_bytes = bytes(f.getvalue())
+                object.__setattr__(self, "_cached_bytes", cached_bytes)
+            return cached_bytes
         f = io.BytesIO()
-        self.stream(f)
+        self._stream_fields(f)
         return bytes(f.getvalue())
 
     def __str__(self: Any) -> str:
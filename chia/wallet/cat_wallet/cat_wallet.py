@@ -458,7 +458,9 @@ class CATWallet:
         return cat_puzzle
 
     def puzzle_hash_for_pk(self, pubkey: G1Element) -> bytes32:
-        inner_puzzle_hash = self.standard_wallet.puzzle_hash_for_pk(pubkey)
+        return self.puzzle_hash_for_inner_puzzle_hash(self.standard_wallet.puzzle_hash_for_pk(pubkey))
+
+    def puzzle_hash_for_inner_puzzle_hash(self, inner_puzzle_hash: bytes32) -> bytes32:
         limitations_program_hash_hash = Program.to(self.cat_info.limitations_program_hash).get_tree_hash()
         return curry_and_treehash(QUOTED_MOD_HASH, CAT_MOD_HASH_HASH, limitations_program_hash_hash, inner_puzzle_hash)
 
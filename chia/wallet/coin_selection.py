@@ -1,8 +1,10 @@
 from __future__ import annotations
 
+import bisect
 import logging
 import random
-from typing import Dict, List, Optional, Set
+from dataclasses import dataclass
+from typing import Collection, Dict, Iterable, List, Optional, Set
 
 from chia.types.blockchain_format.coin import Coin
 from chia.types.blockchain_format.sized_bytes import bytes32
@@ -11,6 +13,82 @@ from chia.wallet.util.tx_config import CoinSelectionConfig
 from chia.wallet.wallet_coin_record import WalletCoinRecord
 
 
+@dataclass
+class UnspentCoinIndex:
+    """
+    The unspent coin records of a wallet, sorted by amount with the largest first, so that the coins in a range of
+    amounts can be found without going through all of them. add() and remove() keep it sorted.
+    """
+
+    records: List[WalletCoinRecord]
+    by_name: Dict[bytes32, WalletCoinRecord]
+    total: int
+    # the coin ids and the negated amounts of records, the latter in ascending order for bisect
+    _names: List[bytes32]
+    _negated_amounts: List[int]
+
+    @classmethod
+    def from_records(cls, records: Iterable[WalletCoinRecord]) -> UnspentCoinIndex:
+        sorted_records = sorted(records, key=lambda record: record.coin.amount, reverse=True)
+        names = [record.name() for record in sorted_records]
+        return cls(
+            sorted_records,
+            dict(zip(names, sorted_records)),
+            sum(record.coin.amount for record in sorted_records),
+            names,
+            [-record.coin.amount for record in sorted_records],
+        )
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def add(self, record: WalletCoinRecord) -> None:
+        name = record.name()
+        self.remove(name)
+        i = bisect.bisect_right(self._negated_amounts, -record.coin.amount)
+        self.records.insert(i, record)
+        self._names.insert(i, name)
+        self._negated_amounts.insert(i, -record.coin.amount)
+        self.by_name[name] = record
+        self.total += record.coin.amount
+
+    def remove(self, name: bytes32) -> None:
+        record = self.by_name.pop(name, None)
+        if record is None:
+            return
+        start = bisect.bisect_left(self._negated_amounts, -record.coin.amount)
+        end = bisect.bisect_right(self._negated_amounts, -record.coin.amount)
+        i = self._names.index(name, start, end)
+        del self.records[i]
+        del self._names[i]
+        del self._negated_amounts[i]
+        self.total -= record.coin.amount
+
+    def largest(
+        self,
+        count: int,
+        *,
+        excluded_coin_ids: Collection[bytes32] = (),
+        min_amount: int = 0,
+        max_amount: Optional[int] = None,
+        excluded_amounts: Collection[int] = (),
+    ) -> List[WalletCoinRecord]:
+        """
+        Returns up to count of the largest coins with amounts between min_amount and max_amount, largest first.
+        """
+        start = 0 if max_amount is None else bisect.bisect_left(self._negated_amounts, -max_amount)
+        end = bisect.bisect_right(self._negated_amounts, -min_amount)
+        selected: List[WalletCoinRecord] = []
+        for i in range(start, end):
+            if len(selected) >= count:
+                break
+            record = self.records[i]
+            if record.coin.amount in excluded_amounts or self._names[i] in excluded_coin_ids:
+                continue
+            selected.append(record)
+        return selected
+
+
 async def select_coins(
     spendable_amount: uint128,
     coin_selection_config: CoinSelectionConfig,
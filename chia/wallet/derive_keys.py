@@ -7,6 +7,7 @@ from chia_rs import AugSchemeMPL, G1Element, PrivateKey
 from chia.consensus.coinbase import create_puzzlehash_for_pk
 from chia.types.blockchain_format.sized_bytes import bytes32
 from chia.util.ints import uint32
+from chia.wallet.puzzles.p2_delegated_puzzle_or_hidden_puzzle import puzzle_hash_for_pk
 
 # EIP 2334 bls key derivation
 # https://eips.ethereum.org/EIPS/eip-2334
@@ -30,6 +31,27 @@ def _derive_path_unhardened(sk: PrivateKey, path: List[int]) -> PrivateKey:
     return sk
 
 
+def derive_wallet_keys(
+    intermediate_sk: bytes, intermediate_pk_unhardened: bytes, start: int, end: int
+) -> List[Tuple[bytes, bytes32, bytes, bytes32]]:
+    """
+    Derives the hardened and unhardened wallet public keys for the indices
+    start to end (exclusive), along with their standard puzzle hashes. The
+    keys are passed and returned as bytes, so this can run in another process.
+    """
+    sk = PrivateKey.from_bytes(intermediate_sk)
+    pk_unhardened = G1Element.from_bytes_unchecked(intermediate_pk_unhardened)
+    ret: List[Tuple[bytes, bytes32, bytes, bytes32]] = []
+    for index in range(start, end):
+        pubkey = AugSchemeMPL.derive_child_sk(sk, index).get_g1()
+        # unhardened keys can be derived from the public key, which is cheaper
+        pubkey_unhardened = AugSchemeMPL.derive_child_pk_unhardened(pk_unhardened, index)
+        ret.append(
+            (bytes(pubkey), puzzle_hash_for_pk(pubkey), bytes(pubkey_unhardened), puzzle_hash_for_pk(pubkey_unhardened))
+        )
+    return ret
+
+
 def master_sk_to_farmer_sk(master: PrivateKey) -> PrivateKey:
     return _derive_path(master, [12381, 8444, 0, 0])
 
@@ -15,6 +15,7 @@ from chia.wallet.conditions import ConditionValidTimes
 from chia.wallet.trade_record import TradeRecord, TradeRecordOld
 from chia.wallet.trading.offer import Offer
 from chia.wallet.trading.trade_status import TradeStatus
+from chia.wallet.util.wallet_generations import WalletGenerations
 
 
 async def migrate_coin_of_interest(log: logging.Logger, db: aiosqlite.Connection) -> None:
@@ -81,6 +82,7 @@ class TradeStore:
     cache_size: uint32
     db_wrapper: DBWrapper2
     log: logging.Logger
+    generations: WalletGenerations
 
     @classmethod
     async def create(
@@ -95,6 +97,7 @@ class TradeStore:
 
         self.cache_size = cache_size
         self.db_wrapper = db_wrapper
+        self.generations = WalletGenerations()
 
         async with self.db_wrapper.writer_maybe_transaction() as conn:
             await conn.execute(
@@ -220,6 +223,7 @@ class TradeStore:
             await conn.executemany(
                 "INSERT INTO coin_of_interest_to_trade_record (coin_id, trade_id) VALUES(?, ?)", inserts
             )
+        self.generations.bump()
 
     async def set_status(
         self, trade_id: bytes32, status: TradeStatus, offer_name: bytes32 = None, index: uint32 = uint32(0)
@@ -480,6 +484,7 @@ class TradeStore:
             # Delete from storage
             cursor = await conn.execute("DELETE FROM trade_records WHERE confirmed_at_index>?", (block_index,))
             await cursor.close()
+        self.generations.bump()
 
     async def _get_new_trade_records_from_old(self, old_records: List[TradeRecordOld]) -> List[TradeRecord]:
         trade_id_to_valid_times: Dict[bytes, ConditionValidTimes] = {}
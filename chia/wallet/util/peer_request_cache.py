@@ -24,7 +24,7 @@ class PeerRequestCache:
     _race_cache: Dict[uint32, Set[CoinState]]
 
     def __init__(self) -> None:
-        self._blocks = LRUCache(100)
+        self._blocks = LRUCache(1000)
         self._block_requests = LRUCache(300)
         self._states_validated = LRUCache(1000)
         self._timestamps = LRUCache(1000)
@@ -112,6 +112,17 @@ class PeerRequestCache:
             height: coin_states for height, coin_states in self._race_cache.items() if height >= min_height
         }
 
+    def get_metrics(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            "blocks": self._blocks.get_metrics(),
+            "block_requests": self._block_requests.get_metrics(),
+            "states_validated": self._states_validated.get_metrics(),
+            "timestamps": self._timestamps.get_metrics(),
+            "blocks_validated": self._blocks_validated.get_metrics(),
+            "block_signatures_validated": self._block_signatures_validated.get_metrics(),
+            "additions_in_block": self._additions_in_block.get_metrics(),
+        }
+
     def clear_after_height(self, height: int) -> None:
         # Remove any cached item which relates to an event that happened at a height above height.
         new_blocks = LRUCache[uint32, HeaderBlock](self._blocks.capacity)
@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+
+@dataclass
+class WalletGenerations:
+    """
+    Counts the writes to a wallet store, so callers can tell whether anything
+    they computed from its records may be out of date. A write that only
+    changes the records of one wallet is counted for that wallet, any other
+    write is counted for all of them.
+    """
+
+    total: int = 0
+    _all_wallets: int = 0
+    _by_wallet: Dict[int, int] = field(default_factory=dict)
+
+    def bump(self, wallet_id: Optional[int] = None) -> None:
+        self.total += 1
+        if wallet_id is None:
+            self._all_wallets += 1
+        else:
+            self._by_wallet[wallet_id] = self._by_wallet.get(wallet_id, 0) + 1
+
+    def of_wallet(self, wallet_id: int) -> int:
+        return self._all_wallets + self._by_wallet.get(wallet_id, 0)
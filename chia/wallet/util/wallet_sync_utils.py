@@ -209,21 +209,40 @@ async def request_and_validate_additions(
     puzzle_hash: bytes32,
     additions_root: bytes32,
 ) -> bool:
-    if peer_request_cache.in_additions_in_block(header_hash, puzzle_hash):
+    return await request_and_validate_additions_for_puzzle_hashes(
+        peer, peer_request_cache, height, header_hash, [puzzle_hash], additions_root
+    )
+
+
+async def request_and_validate_additions_for_puzzle_hashes(
+    peer: WSChiaConnection,
+    peer_request_cache: PeerRequestCache,
+    height: uint32,
+    header_hash: bytes32,
+    puzzle_hashes: List[bytes32],
+    additions_root: bytes32,
+) -> bool:
+    """
+    Requests the proofs of the additions to all of puzzle_hashes in a block with a single request, unless they're
+    already cached, and validates them. The puzzle hashes are only cached if they validate.
+    """
+    puzzle_hashes = [ph for ph in puzzle_hashes if not peer_request_cache.in_additions_in_block(header_hash, ph)]
+    if len(puzzle_hashes) == 0:
         return True
-    additions_request = RequestAdditions(height, header_hash, [puzzle_hash])
+    additions_request = RequestAdditions(height, header_hash, puzzle_hashes)
     additions_res: Optional[Union[RespondAdditions, RejectAdditionsRequest]] = await peer.call_api(
         FullNodeAPI.request_additions, additions_request
     )
     if additions_res is None or isinstance(additions_res, RejectAdditionsRequest):
         return False
-    result: bool = validate_additions(
-        additions_res.coins,
-        additions_res.proofs,
-        additions_root,
-    )
-    peer_request_cache.add_to_additions_in_block(header_hash, puzzle_hash, height)
-    return result
+    if not validate_additions(additions_res.coins, additions_res.proofs, additions_root):
+        return False
+    if additions_res.proofs is not None and {ph for ph, _ in additions_res.coins} != set(puzzle_hashes):
+        # every puzzle hash needs a proof of inclusion or exclusion
+        return False
+    for puzzle_hash in puzzle_hashes:
+        peer_request_cache.add_to_additions_in_block(header_hash, puzzle_hash, height)
+    return True
 
 
 def last_change_height_cs(cs: CoinState) -> uint32:
@@ -77,6 +77,10 @@ class Wallet:
         return int(self.wallet_state_manager.constants.MAX_BLOCK_COST_CLVM / 5 / self.cost_of_single_tx)
 
     async def get_max_spendable_coins(self, records: Optional[Set[WalletCoinRecord]] = None) -> Set[WalletCoinRecord]:
+        if records is None:
+            index = await self.wallet_state_manager.get_unspent_coin_index(self.id())
+            unconfirmed_removals = await self.wallet_state_manager.unconfirmed_removals_for_wallet(self.id())
+            return set(index.largest(self.max_send_quantity, excluded_coin_ids=unconfirmed_removals))
         spendable: List[WalletCoinRecord] = list(
             await self.wallet_state_manager.get_spendable_coins_for_wallet(self.id(), records)
         )
@@ -100,6 +104,13 @@ class Wallet:
         return await self.wallet_state_manager.get_unconfirmed_balance(self.id(), unspent_records)
 
     async def get_spendable_balance(self, unspent_records: Optional[Set[WalletCoinRecord]] = None) -> uint128:
+        if unspent_records is None:
+            index = await self.wallet_state_manager.get_unspent_coin_index(self.id())
+            unconfirmed_removals = await self.wallet_state_manager.unconfirmed_removals_for_wallet(self.id())
+            return uint128(
+                index.total
+                - sum(index.by_name[name].coin.amount for name in unconfirmed_removals if name in index.by_name)
+            )
         spendable = await self.wallet_state_manager.get_confirmed_spendable_balance_for_wallet(
             self.id(), unspent_records
         )
@@ -212,14 +223,23 @@ class Wallet:
         Returns a set of coins that can be used for generating a new transaction.
         Note: Must be called under wallet state manager lock
         """
-        spendable_amount: uint128 = await self.get_spendable_balance()
-        spendable_coins: List[WalletCoinRecord] = list(await self.get_max_spendable_coins())
-
+        index = await self.wallet_state_manager.get_unspent_coin_index(self.id())
         # Try to use coins from the store, if there isn't enough of "unused"
         # coins use change coins that are not confirmed yet
         unconfirmed_removals: Dict[bytes32, Coin] = await self.wallet_state_manager.unconfirmed_removals_for_wallet(
             self.id()
         )
+        spendable_amount = uint128(
+            index.total - sum(index.by_name[name].coin.amount for name in unconfirmed_removals if name in index.by_name)
+        )
+        # only the largest coins that can be used at all are candidates
+        spendable_coins = index.largest(
+            self.max_send_quantity,
+            excluded_coin_ids=unconfirmed_removals.keys() | set(coin_selection_config.excluded_coin_ids),
+            min_amount=coin_selection_config.min_coin_amount,
+            max_amount=coin_selection_config.max_coin_amount,
+            excluded_amounts=set(coin_selection_config.excluded_coin_amounts),
+        )
         coins = await select_coins(
             spendable_amount,
             coin_selection_config,
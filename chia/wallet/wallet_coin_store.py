@@ -1,19 +1,22 @@
 from __future__ import annotations
 
+import dataclasses
 import sqlite3
 from dataclasses import dataclass
 from enum import IntEnum
-from typing import Dict, List, Optional, Set
+from typing import Dict, List, Optional, Set, Tuple
 
 from chia.types.blockchain_format.coin import Coin
 from chia.types.blockchain_format.sized_bytes import bytes32
 from chia.util.db_wrapper import DBWrapper2, execute_fetchone
 from chia.util.hash import std_hash
 from chia.util.ints import uint8, uint32, uint64
-from chia.util.lru_cache import LRUCache
+from chia.util.lru_cache import MeteredLRUCache
 from chia.util.misc import UInt32Range, UInt64Range, VersionedBlob
 from chia.util.streamable import Streamable, streamable
+from chia.wallet.coin_selection import UnspentCoinIndex
 from chia.wallet.util.query_filter import AmountFilter, FilterMode, HashFilter
+from chia.wallet.util.wallet_generations import WalletGenerations
 from chia.wallet.util.wallet_types import CoinType, WalletType
 from chia.wallet.wallet_coin_record import WalletCoinRecord
 
@@ -58,14 +61,24 @@ class WalletCoinStore:
     """
 
     db_wrapper: DBWrapper2
-    total_count_cache: LRUCache[bytes32, uint32]
+    total_count_cache: MeteredLRUCache[bytes32, uint32]
+    generations: WalletGenerations
+    # the unspent coins of the wallets that coin selection asked for, by wallet
+    # id and coin type. Once loaded, the writes below keep them up to date. They
+    # are dropped when a write transaction is rolled back, since that only undoes
+    # the changes in the database
+    _unspent_coin_indexes: Dict[Tuple[int, CoinType], UnspentCoinIndex]
+    _rollbacks: int
 
     @classmethod
     async def create(cls, wrapper: DBWrapper2):
         self = cls()
 
         self.db_wrapper = wrapper
-        self.total_count_cache = LRUCache(100)
+        self.total_count_cache = MeteredLRUCache(100)
+        self.generations = WalletGenerations()
+        self._unspent_coin_indexes = {}
+        self._rollbacks = wrapper.rollbacks
 
         async with self.db_wrapper.writer_maybe_transaction() as conn:
             await conn.execute(
@@ -138,17 +151,29 @@ class WalletCoinStore:
                     None if record.metadata is None else bytes(record.metadata),
                 ),
             )
-        self.total_count_cache.cache.clear()
+        self.total_count_cache.clear()
+        self.generations.bump(record.wallet_id)
+        for index in self._current_unspent_coin_indexes().values():
+            index.remove(name)
+        index = self._unspent_coin_indexes.get((record.wallet_id, record.coin_type))
+        if index is not None and not record.spent:
+            index.add(record)
 
     # Sometimes we realize that a coin is actually not interesting to us so we need to delete it
     async def delete_coin_record(self, coin_name: bytes32) -> None:
         async with self.db_wrapper.writer_maybe_transaction() as conn:
             await (await conn.execute("DELETE FROM coin_record WHERE coin_name=?", (coin_name.hex(),))).close()
-        self.total_count_cache.cache.clear()
+        self.total_count_cache.clear()
+        self.generations.bump()
+        for index in self._current_unspent_coin_indexes().values():
+            index.remove(coin_name)
 
     # Update coin_record to be spent in DB
     async def set_spent(self, coin_name: bytes32, height: uint32) -> None:
         async with self.db_wrapper.writer_maybe_transaction() as conn:
+            row = await execute_fetchone(
+                conn, "SELECT wallet_id FROM coin_record WHERE coin_name=?", (coin_name.hex(),)
+            )
             await conn.execute_insert(
                 "UPDATE coin_record SET spent_height=?,spent=? WHERE coin_name=?",
                 (
@@ -157,7 +182,11 @@ class WalletCoinStore:
                     coin_name.hex(),
                 ),
             )
-        self.total_count_cache.cache.clear()
+        self.total_count_cache.clear()
+        if row is not None:
+            self.generations.bump(row[0])
+        for index in self._current_unspent_coin_indexes().values():
+            index.remove(coin_name)
 
     def coin_record_from_row(self, row: sqlite3.Row) -> WalletCoinRecord:
         coin = Coin(bytes32.fromhex(row[6]), bytes32.fromhex(row[5]), uint64.from_bytes(row[7]))
@@ -302,6 +331,33 @@ class WalletCoinStore:
             )
         return {self.coin_record_from_row(row) for row in rows}
 
+    async def get_unspent_coin_index(self, wallet_id: int, coin_type: CoinType = CoinType.NORMAL) -> UnspentCoinIndex:
+        """
+        Returns the unspent coins of a wallet, sorted by amount. The index is loaded once, and then kept up to date
+        by the writes to the store.
+        """
+        index = self._current_unspent_coin_indexes().get((wallet_id, coin_type))
+        if index is not None:
+            return index
+        generation = self.generations.of_wallet(wallet_id)
+        # coins read while a write transaction is in progress may be out of date as soon as it commits, and the
+        # coins written while they are read aren't in the index yet, so it isn't kept then
+        writer_active = self.db_wrapper.writer_active()
+        index = UnspentCoinIndex.from_records(await self.get_unspent_coins_for_wallet(wallet_id, coin_type))
+        if (
+            not writer_active
+            and not self.db_wrapper.writer_active()
+            and generation == self.generations.of_wallet(wallet_id)
+        ):
+            self._unspent_coin_indexes[(wallet_id, coin_type)] = index
+        return index
+
+    def _current_unspent_coin_indexes(self) -> Dict[Tuple[int, CoinType], UnspentCoinIndex]:
+        if self._rollbacks != self.db_wrapper.rollbacks:
+            self._rollbacks = self.db_wrapper.rollbacks
+            self._unspent_coin_indexes.clear()
+        return self._unspent_coin_indexes
+
     async def get_all_unspent_coins(self, coin_type: CoinType = CoinType.NORMAL) -> Set[WalletCoinRecord]:
         """Returns set of CoinRecords that have not been spent yet for a wallet."""
         async with self.db_wrapper.reader_no_transaction() as conn:
@@ -335,6 +391,15 @@ class WalletCoinStore:
         """
 
         async with self.db_wrapper.writer_maybe_transaction() as conn:
+            unspent_again: List[WalletCoinRecord] = []
+            if len(self._current_unspent_coin_indexes()) > 0:
+                rows = await conn.execute_fetchall(
+                    "SELECT * FROM coin_record WHERE spent_height>? AND confirmed_height<=?", (height, height)
+                )
+                unspent_again = [
+                    dataclasses.replace(self.coin_record_from_row(row), spent_block_height=uint32(0), spent=False)
+                    for row in rows
+                ]
             await (await conn.execute("DELETE FROM coin_record WHERE confirmed_height>?", (height,))).close()
             await (
                 await conn.execute(
@@ -342,10 +407,21 @@ class WalletCoinStore:
                     (height,),
                 )
             ).close()
-        self.total_count_cache.cache.clear()
+        self.total_count_cache.clear()
+        self.generations.bump()
+        for index in self._current_unspent_coin_indexes().values():
+            for record in [r for r in index.records if r.confirmed_block_height > height]:
+                index.remove(record.name())
+        for record in unspent_again:
+            index = self._unspent_coin_indexes.get((record.wallet_id, record.coin_type))
+            if index is not None:
+                index.add(record)
 
     async def delete_wallet(self, wallet_id: uint32) -> None:
         async with self.db_wrapper.writer_maybe_transaction() as conn:
             cursor = await conn.execute("DELETE FROM coin_record WHERE wallet_id=?", (wallet_id,))
             await cursor.close()
-        self.total_count_cache.cache.clear()
+        self.total_count_cache.clear()
+        self.generations.bump(wallet_id)
+        for key in [key for key in self._current_unspent_coin_indexes() if key[0] == wallet_id]:
+            del self._unspent_coin_indexes[key]
@@ -63,6 +63,7 @@ from chia.wallet.util.wallet_sync_utils import (
     PeerRequestException,
     fetch_header_blocks_in_range,
     request_and_validate_additions,
+    request_and_validate_additions_for_puzzle_hashes,
     request_and_validate_removals,
     request_header_blocks,
     sort_coin_states,
@@ -127,6 +128,8 @@ class WalletNode:
     logged_in: bool = False
     _keychain_proxy: Optional[KeychainProxy] = None
     _balance_cache: Dict[int, Balance] = dataclasses.field(default_factory=dict)
+    # the store generations each cached balance was computed at
+    _balance_cache_keys: Dict[int, Tuple[int, ...]] = dataclasses.field(default_factory=dict)
     # Peers that we have long synced to
     synced_peers: Set[bytes32] = dataclasses.field(default_factory=set)
     wallet_peers: Optional[WalletPeers] = None
@@ -461,6 +464,7 @@ class WalletNode:
             await asyncio.sleep(0.5)  # https://docs.aiohttp.org/en/stable/client_advanced.html#graceful-shutdown
         self.wallet_peers = None
         self._balance_cache = {}
+        self._balance_cache_keys = {}
 
     def _set_state_changed_callback(self, callback: StateChangedProtocol) -> None:
         self.state_changed_callback = callback
@@ -873,6 +877,8 @@ class WalletNode:
 
         all_tasks: List[asyncio.Task[None]] = []
         target_concurrent_tasks: int = 30
+        # In untrusted mode, the blocks and addition proofs needed to validate this many states are fetched up front
+        prefetch_size: int = 100
 
         # Ensure the list is sorted
         unique_items = set(items_input)
@@ -924,6 +930,8 @@ class WalletNode:
                 return False
 
         idx = 1
+        # the index into updated_coin_states of the first coin state that hasn't been prefetched yet
+        next_prefetch_idx = 0
         for batch in to_batches(updated_coin_states, chunk_size):
             if self._server is None:
                 self.log.error("No server")
@@ -944,6 +952,14 @@ class WalletNode:
                 if fork_height is not None:
                     cache.add_states_to_race_cache(batch.entries)
                 else:
+                    batch_end = idx - 1 + len(batch.entries)
+                    if batch_end > next_prefetch_idx:
+                        # the next range is prefetched once a batch reaches it, and always covers that batch
+                        prefetch_start = next_prefetch_idx
+                        next_prefetch_idx = max(prefetch_start + prefetch_size, batch_end)
+                        await self.prefetch_state_validation_data(
+                            updated_coin_states[prefetch_start:next_prefetch_idx], peer, cache, fork_height
+                        )
                     while len(all_tasks) >= target_concurrent_tasks:
                         all_tasks = [task for task in all_tasks if not task.done()]
                         await asyncio.sleep(0.1)
@@ -1316,6 +1332,68 @@ class WalletNode:
         coin_ids.update(await self.wallet_state_manager.interested_store.get_interested_coin_ids())
         return list(coin_ids)
 
+    async def prefetch_state_validation_data(
+        self,
+        coin_states: List[CoinState],
+        peer: WSChiaConnection,
+        peer_request_cache: PeerRequestCache,
+        fork_height: Optional[uint32],
+    ) -> None:
+        """
+        Fetches the header blocks and addition proofs validate_received_state_from_peer needs for coin_states into
+        peer_request_cache. Blocks are requested in ranges, and the additions of all puzzle hashes created in the same
+        block with one request, instead of once per coin state. Anything that fails here is fetched again, and
+        handled, when the states are validated.
+        """
+        if peer.closed:
+            return
+        heights: Set[uint32] = set()
+        puzzle_hashes: Dict[uint32, Set[bytes32]] = {}
+        for coin_state in coin_states:
+            if coin_state.created_height is None or can_use_peer_request_cache(
+                coin_state, peer_request_cache, fork_height
+            ):
+                continue
+            created_height = uint32(coin_state.created_height)
+            heights.add(created_height)
+            puzzle_hashes.setdefault(created_height, set()).add(coin_state.coin.puzzle_hash)
+            if coin_state.spent_height is not None:
+                heights.add(uint32(coin_state.spent_height))
+
+        # one request per 32 heights, for all the blocks missing in that range
+        ranges: Dict[int, Tuple[uint32, uint32]] = {}
+        for height in sorted(height for height in heights if peer_request_cache.get_block(height) is None):
+            start, _ = ranges.get(height // 32, (height, height))
+            ranges[height // 32] = (start, height)
+        for header_blocks in await asyncio.gather(
+            *(request_header_blocks(peer, start, end) for start, end in ranges.values()), return_exceptions=True
+        ):
+            if isinstance(header_blocks, BaseException):
+                self.log.debug(f"prefetch_state_validation_data failed to fetch blocks: {header_blocks}")
+                continue
+            for header_block in header_blocks or []:
+                if header_block.height in heights:
+                    peer_request_cache.add_to_blocks(header_block)
+
+        additions_requests = []
+        for height, height_puzzle_hashes in puzzle_hashes.items():
+            state_block = peer_request_cache.get_block(height)
+            if state_block is None or state_block.foliage_transaction_block is None:
+                continue
+            additions_requests.append(
+                request_and_validate_additions_for_puzzle_hashes(
+                    peer,
+                    peer_request_cache,
+                    height,
+                    state_block.header_hash,
+                    list(height_puzzle_hashes),
+                    state_block.foliage_transaction_block.additions_root,
+                )
+            )
+        for result in await asyncio.gather(*additions_requests, return_exceptions=True):
+            if isinstance(result, BaseException):
+                self.log.debug(f"prefetch_state_validation_data failed to fetch additions: {result}")
+
     async def validate_received_state_from_peer(
         self,
         coin_state: CoinState,
@@ -1658,8 +1736,54 @@ class WalletNode:
         for peer in full_nodes:
             await peer.send_message(msg)
 
+    def _balance_cache_key(self, wallet_id: uint32) -> Tuple[int, ...]:
+        # a balance only depends on the coin, transaction and derivation path
+        # records of its wallet, on the trade records, and on which wallets exist
+        wsm = self.wallet_state_manager
+        return (
+            wsm.coin_store.generations.of_wallet(wallet_id),
+            wsm.tx_store.generations.of_wallet(wallet_id),
+            wsm.puzzle_store.generations.of_wallet(wallet_id),
+            wsm.trade_manager.trade_store.generations.total,
+            *wsm.wallets,
+        )
+
     async def _update_balance_cache(self, wallet_id: uint32) -> None:
+        """
+        Recomputes the balance of a wallet, unless none of the records it depends
+        on have changed since it was last computed. Only the balances of standard
+        wallets are kept across updates.
+        """
         assert self.wallet_state_manager.lock.locked(), "WalletStateManager.lock required"
+        wallet = self.wallet_state_manager.wallets[wallet_id]
+        db_wrapper = self.wallet_state_manager.db_wrapper
+        key = self._balance_cache_key(wallet_id)
+        if self._balance_cache_keys.get(wallet_id) == key:
+            if self.config.get("testing", False):
+                balance = await self._compute_balance(wallet_id)
+                if balance != self._balance_cache[wallet_id]:
+                    raise RuntimeError(
+                        f"Cached balance of wallet {wallet_id} is out of date. "
+                        f"cached: {self._balance_cache[wallet_id]} actual: {balance}"
+                    )
+            return
+
+        # the balance is read through a read connection, which doesn't see the
+        # changes of a write transaction that hasn't committed yet. Such a balance
+        # is only good until that transaction commits, so it isn't kept
+        writer_active = db_wrapper.writer_active()
+        self._balance_cache[wallet_id] = await self._compute_balance(wallet_id)
+        if (
+            wallet.type() == WalletType.STANDARD_WALLET
+            and not writer_active
+            and not db_wrapper.writer_active()
+            and key == self._balance_cache_key(wallet_id)
+        ):
+            self._balance_cache_keys[wallet_id] = key
+        else:
+            self._balance_cache_keys.pop(wallet_id, None)
+
+    async def _compute_balance(self, wallet_id: uint32) -> Balance:
         wallet = self.wallet_state_manager.wallets[wallet_id]
         if wallet.type() == WalletType.CRCAT:
             coin_type = CoinType.CRCAT
@@ -1675,7 +1799,7 @@ class WalletNode:
         unconfirmed_removals: Dict[bytes32, Coin] = await wallet.wallet_state_manager.unconfirmed_removals_for_wallet(
             wallet_id
         )
-        self._balance_cache[wallet_id] = Balance(
+        return Balance(
             confirmed_wallet_balance=balance,
             unconfirmed_wallet_balance=pending_balance,
             spendable_balance=spendable_balance,
@@ -9,8 +9,9 @@ from chia_rs import G1Element
 from chia.types.blockchain_format.sized_bytes import bytes32
 from chia.util.db_wrapper import DBWrapper2, execute_fetchone
 from chia.util.ints import uint32
-from chia.util.lru_cache import LRUCache
+from chia.util.lru_cache import MeteredLRUCache
 from chia.wallet.derivation_record import DerivationRecord
+from chia.wallet.util.wallet_generations import WalletGenerations
 from chia.wallet.util.wallet_types import WalletIdentifier, WalletType
 
 log = logging.getLogger(__name__)
@@ -25,10 +26,12 @@ class WalletPuzzleStore:
 
     lock: asyncio.Lock
     db_wrapper: DBWrapper2
-    wallet_identifier_cache: LRUCache
+    wallet_identifier_cache: MeteredLRUCache
     # maps wallet_id -> last_derivation_index
     last_wallet_derivation_index: Dict[uint32, uint32]
     last_derivation_index: Optional[uint32]
+    # counts the derivation paths being added or removed
+    generations: WalletGenerations
 
     @classmethod
     async def create(cls, db_wrapper: DBWrapper2):
@@ -63,9 +66,10 @@ class WalletPuzzleStore:
 
         # the lock is locked by the users of this class
         self.lock = asyncio.Lock()
-        self.wallet_identifier_cache = LRUCache(100)
+        self.wallet_identifier_cache = MeteredLRUCache(100)
         self.last_derivation_index = None
         self.last_wallet_derivation_index = {}
+        self.generations = WalletGenerations()
         return self
 
     async def add_derivation_paths(self, records: List[DerivationRecord]) -> None:
@@ -109,6 +113,8 @@ class WalletPuzzleStore:
                     sql_records,
                 )
             ).close()
+        for wallet_id in {record.wallet_id for record in records}:
+            self.generations.bump(wallet_id)
 
     async def get_derivation_record(
         self, index: uint32, wallet_id: uint32, hardened: bool
@@ -351,6 +357,7 @@ class WalletPuzzleStore:
             )
             cursor = await conn.execute("DELETE FROM derivation_paths WHERE wallet_id=?;", (wallet_id,))
             await cursor.close()
+        self.generations.bump(wallet_id)
         # Clear caches
         puzzle_hashes = {bytes32.fromhex(row[0]) for row in rows}
         for puzzle_hash in puzzle_hashes:
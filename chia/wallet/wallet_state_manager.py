@@ -3,9 +3,11 @@ from __future__ import annotations
 import asyncio
 import dataclasses
 import logging
+import multiprocessing
 import multiprocessing.context
 import time
 import traceback
+from concurrent.futures.process import ProcessPoolExecutor
 from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import (
@@ -51,20 +53,23 @@ from chia.types.coin_spend import CoinSpend, compute_additions
 from chia.types.mempool_inclusion_status import MempoolInclusionStatus
 from chia.types.spend_bundle import SpendBundle
 from chia.util.bech32m import encode_puzzle_hash
+from chia.util.config import process_config_start_method
 from chia.util.db_synchronous import db_synchronous_on
 from chia.util.db_wrapper import DBWrapper2
 from chia.util.errors import Err
 from chia.util.hash import std_hash
 from chia.util.ints import uint16, uint32, uint64, uint128
 from chia.util.lru_cache import LRUCache
-from chia.util.misc import UInt32Range, UInt64Range, VersionedBlob
+from chia.util.misc import UInt32Range, UInt64Range, VersionedBlob, available_logical_cores
 from chia.util.path import path_from_root
+from chia.util.setproctitle import getproctitle, setproctitle
 from chia.util.streamable import Streamable
 from chia.wallet.cat_wallet.cat_constants import DEFAULT_CATS
 from chia.wallet.cat_wallet.cat_info import CATCoinData, CATInfo, CRCATInfo
 from chia.wallet.cat_wallet.cat_utils import CAT_MOD, CAT_MOD_HASH, construct_cat_puzzle, match_cat_puzzle
 from chia.wallet.cat_wallet.cat_wallet import CATWallet
 from chia.wallet.cat_wallet.dao_cat_wallet import DAOCATWallet
+from chia.wallet.coin_selection import UnspentCoinIndex
 from chia.wallet.conditions import (
     AssertCoinAnnouncement,
     Condition,
@@ -84,8 +89,7 @@ from chia.wallet.dao_wallet.dao_wallet import DAOWallet
 from chia.wallet.db_wallet.db_wallet_puzzles import MIRROR_PUZZLE_HASH
 from chia.wallet.derivation_record import DerivationRecord
 from chia.wallet.derive_keys import (
-    _derive_path,
-    _derive_path_unhardened,
+    derive_wallet_keys,
     master_sk_to_wallet_sk,
     master_sk_to_wallet_sk_intermediate,
     master_sk_to_wallet_sk_unhardened,
@@ -149,6 +153,15 @@ from chia.wallet.wallet_user_store import WalletUserStore
 
 TWalletType = TypeVar("TWalletType", bound=WalletProtocol[Any])
 
+# Wallet keys are derived by a pool of worker processes, in batches, when
+# deriving keys for at least this many indices
+DERIVATION_POOL_MIN_KEYS = 2000
+DERIVATION_POOL_BATCH_SIZE = 500
+DERIVATION_INLINE_BATCH_SIZE = 10
+# new derivation records are added to the puzzle store in batches of up to this
+# many, for each wallet
+DERIVATION_RECORDS_BATCH_SIZE = 2000
+
 if TYPE_CHECKING:
     from chia.wallet.wallet_node import WalletNode
 
@@ -220,6 +233,9 @@ class WalletStateManager:
         self.root_path = root_path
         self.log = logging.getLogger(__name__)
         self.lock = asyncio.Lock()
+        self.multiprocessing_context = multiprocessing.get_context(
+            method=process_config_start_method(config=config, log=self.log)
+        )
         self.log.debug(f"Starting in db path: {db_path}")
         fingerprint = private_key.get_g1().get_fingerprint()
         sql_log_path: Optional[Path] = None
@@ -406,93 +422,180 @@ class WalletStateManager:
         self.log.debug(f"Requested to generate puzzle hashes to at least index {unused}")
         start_t = time.time()
         to_generate = num_additional_phs if num_additional_phs is not None else self.initial_num_public_keys
+        last_index = unused + to_generate
         new_paths: bool = False
 
+        # the first index to derive keys for, for each wallet
+        start_indexes: Dict[uint32, int] = {}
         for wallet_id in targets:
             target_wallet = self.wallets[wallet_id]
             if not target_wallet.require_derivation_paths():
                 self.log.debug("Skipping wallet %s as no derivation paths required", wallet_id)
                 continue
+            if target_wallet.type() == WalletType.POOLING_WALLET:
+                continue
             last: Optional[uint32] = await self.puzzle_store.get_last_derivation_path_for_wallet(wallet_id)
             self.log.debug(
                 "Fetched last record for wallet %r:  %s (from_zero=%r, unused=%r)", wallet_id, last, from_zero, unused
             )
-            start_index = 0
-            derivation_paths: List[DerivationRecord] = []
-
-            if last is not None:
-                start_index = last + 1
-
             # If the key was replaced (from_zero=True), we should generate the puzzle hashes for the new key
-            if from_zero:
-                start_index = 0
-            last_index = unused + to_generate
+            start_index = 0 if last is None or from_zero else last + 1
             if start_index >= last_index:
                 self.log.debug(f"Nothing to create for for wallet_id: {wallet_id}, index: {start_index}")
-            else:
-                creating_msg = (
-                    f"Creating puzzle hashes from {start_index} to {last_index - 1} for wallet_id: {wallet_id}"
-                )
-                self.log.info(f"Start: {creating_msg}")
-                intermediate_sk = master_sk_to_wallet_sk_intermediate(self.private_key)
-                intermediate_sk_un = master_sk_to_wallet_sk_unhardened_intermediate(self.private_key)
-                for index in range(start_index, last_index):
-                    if target_wallet.type() == WalletType.POOLING_WALLET:
-                        continue
+                continue
+            self.log.info(f"Creating puzzle hashes from {start_index} to {last_index - 1} for wallet_id: {wallet_id}")
+            start_indexes[wallet_id] = start_index
 
-                    # Hardened
-                    pubkey: G1Element = _derive_path(intermediate_sk, [index]).get_g1()
-                    puzzlehash: Optional[bytes32] = target_wallet.puzzle_hash_for_pk(pubkey)
-                    if puzzlehash is None:
-                        self.log.error(f"Unable to create puzzles with wallet {target_wallet}")
-                        break
-                    self.log.debug(f"Puzzle at index {index} wallet ID {wallet_id} puzzle hash {puzzlehash.hex()}")
-                    new_paths = True
-                    derivation_paths.append(
-                        DerivationRecord(
-                            uint32(index),
-                            puzzlehash,
-                            pubkey,
-                            target_wallet.type(),
-                            uint32(target_wallet.id()),
-                            True,
+        if len(start_indexes) == 0:
+            return
+
+        # The keys are the same for all wallets, so they're derived once, in
+        # batches. The derivation records are added to the store as the
+        # batches come in
+        derivation_paths: Dict[uint32, List[DerivationRecord]] = {wallet_id: [] for wallet_id in start_indexes}
+        first_index = min(start_indexes.values())
+        async with self._key_derivation_pool(last_index - first_index) as pool:
+            async for batch_start, keys in self._derive_wallet_keys(first_index, last_index, pool):
+                for wallet_id, start_index in list(start_indexes.items()):
+                    target_wallet = self.wallets[wallet_id]
+                    for index in range(max(start_index, batch_start), batch_start + len(keys)):
+                        pubkey, standard_puzzle_hash, pubkey_unhardened, standard_puzzle_hash_unhardened = keys[
+                            index - batch_start
+                        ]
+                        puzzlehash = self._puzzle_hash_for_derived_key(target_wallet, pubkey, standard_puzzle_hash)
+                        puzzlehash_unhardened = self._puzzle_hash_for_derived_key(
+                            target_wallet, pubkey_unhardened, standard_puzzle_hash_unhardened
                         )
-                    )
-                    # Unhardened
-                    pubkey_unhardened: G1Element = _derive_path_unhardened(intermediate_sk_un, [index]).get_g1()
-                    puzzlehash_unhardened: Optional[bytes32] = target_wallet.puzzle_hash_for_pk(pubkey_unhardened)
-                    if puzzlehash_unhardened is None:
-                        self.log.error(f"Unable to create puzzles with wallet {target_wallet}")
-                        break
-                    self.log.debug(
-                        f"Puzzle at index {index} wallet ID {wallet_id} puzzle hash {puzzlehash_unhardened.hex()}"
-                    )
-                    # We await sleep here to allow an asyncio context switch (since the other parts of this loop do
-                    # not have await and therefore block). This can prevent networking layer from responding to ping.
-                    await asyncio.sleep(0)
-                    derivation_paths.append(
-                        DerivationRecord(
-                            uint32(index),
-                            puzzlehash_unhardened,
-                            pubkey_unhardened,
-                            target_wallet.type(),
-                            uint32(target_wallet.id()),
-                            False,
+                        if puzzlehash is None or puzzlehash_unhardened is None:
+                            self.log.error(f"Unable to create puzzles with wallet {target_wallet}")
+                            del start_indexes[wallet_id]
+                            break
+                        new_paths = True
+                        derivation_paths[wallet_id].append(
+                            DerivationRecord(
+                                uint32(index),
+                                puzzlehash,
+                                pubkey,
+                                target_wallet.type(),
+                                uint32(target_wallet.id()),
+                                True,
+                            )
                         )
-                    )
-                self.log.info(f"Done: {creating_msg} Time: {time.time() - start_t} seconds")
-            await self.puzzle_store.add_derivation_paths(derivation_paths)
-            if len(derivation_paths) > 0:
-                if wallet_id == self.main_wallet.id():
-                    await self.wallet_node.new_peak_queue.subscribe_to_puzzle_hashes(
-                        [record.puzzle_hash for record in derivation_paths]
-                    )
-                self.state_changed("new_derivation_index", data_object={"index": derivation_paths[-1].index})
+                        derivation_paths[wallet_id].append(
+                            DerivationRecord(
+                                uint32(index),
+                                puzzlehash_unhardened,
+                                pubkey_unhardened,
+                                target_wallet.type(),
+                                uint32(target_wallet.id()),
+                                False,
+                            )
+                        )
+                    if len(derivation_paths[wallet_id]) >= DERIVATION_RECORDS_BATCH_SIZE:
+                        await self._add_derivation_paths(wallet_id, derivation_paths[wallet_id])
+                        derivation_paths[wallet_id] = []
+        for wallet_id, records in derivation_paths.items():
+            await self._add_derivation_paths(wallet_id, records)
+        self.log.info(f"Done creating puzzle hashes up to {last_index - 1}. Time: {time.time() - start_t} seconds")
+
         # By default, we'll mark previously generated unused puzzle hashes as used if we have new paths
         if mark_existing_as_used and unused > 0 and new_paths:
             self.log.info(f"Updating last used derivation index: {unused - 1}")
             await self.puzzle_store.set_used_up_to(uint32(unused - 1))
 
+    @asynccontextmanager
+    async def _key_derivation_pool(self, num_keys: int) -> AsyncIterator[Optional[ProcessPoolExecutor]]:
+        """
+        A pool of worker processes to derive num_keys keys, or None if there
+        are too few of them to be worth starting one.
+        """
+        if num_keys < DERIVATION_POOL_MIN_KEYS:
+            yield None
+            return
+        pool = ProcessPoolExecutor(
+            max_workers=max(available_logical_cores() - 1, 1),
+            mp_context=self.multiprocessing_context,
+            initializer=setproctitle,
+            initargs=(f"{getproctitle()}_key_derivation_worker",),
+        )
+        try:
+            yield pool
+        finally:
+            # waiting for the workers to exit would block the event loop
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    async def _derive_wallet_keys(
+        self, start: int, end: int, pool: Optional[ProcessPoolExecutor]
+    ) -> AsyncIterator[Tuple[int, List[Tuple[G1Element, bytes32, G1Element, bytes32]]]]:
+        """
+        Yields the hardened and unhardened wallet public keys, and their
+        standard puzzle hashes, for the indices start to end (exclusive), in
+        batches. Each batch comes with the index it starts at. The keys are
+        derived in the pool if there is one, and inline otherwise.
+        """
+        intermediate_sk = bytes(master_sk_to_wallet_sk_intermediate(self.private_key))
+        intermediate_pk_unhardened = bytes(master_sk_to_wallet_sk_unhardened_intermediate(self.private_key).get_g1())
+
+        def to_keys(
+            batch: List[Tuple[bytes, bytes32, bytes, bytes32]]
+        ) -> List[Tuple[G1Element, bytes32, G1Element, bytes32]]:
+            return [
+                (G1Element.from_bytes_unchecked(pk), ph, G1Element.from_bytes_unchecked(pk_unhardened), ph_unhardened)
+                for pk, ph, pk_unhardened, ph_unhardened in batch
+            ]
+
+        if pool is None:
+            for batch_start in range(start, end, DERIVATION_INLINE_BATCH_SIZE):
+                batch_end = min(batch_start + DERIVATION_INLINE_BATCH_SIZE, end)
+                yield batch_start, to_keys(
+                    derive_wallet_keys(intermediate_sk, intermediate_pk_unhardened, batch_start, batch_end)
+                )
+                # This can prevent networking layer from responding to ping.
+                await asyncio.sleep(0)
+            return
+
+        loop = asyncio.get_running_loop()
+        batches = [
+            (
+                batch_start,
+                loop.run_in_executor(
+                    pool,
+                    derive_wallet_keys,
+                    intermediate_sk,
+                    intermediate_pk_unhardened,
+                    batch_start,
+                    min(batch_start + DERIVATION_POOL_BATCH_SIZE, end),
+                ),
+            )
+            for batch_start in range(start, end, DERIVATION_POOL_BATCH_SIZE)
+        ]
+        try:
+            for batch_start, future in batches:
+                yield batch_start, to_keys(await future)
+        finally:
+            for _, future in batches:
+                future.cancel()
+
+    def _puzzle_hash_for_derived_key(
+        self, wallet: WalletProtocol[Any], pubkey: G1Element, standard_puzzle_hash: bytes32
+    ) -> Optional[bytes32]:
+        wallet_type = wallet.type()
+        if wallet_type == WalletType.STANDARD_WALLET:
+            return standard_puzzle_hash
+        if wallet_type == WalletType.CAT and isinstance(wallet, CATWallet):
+            return wallet.puzzle_hash_for_inner_puzzle_hash(standard_puzzle_hash)
+        puzzle_hash: Optional[bytes32] = wallet.puzzle_hash_for_pk(pubkey)
+        return puzzle_hash
+
+    async def _add_derivation_paths(self, wallet_id: uint32, derivation_paths: List[DerivationRecord]) -> None:
+        await self.puzzle_store.add_derivation_paths(derivation_paths)
+        if len(derivation_paths) > 0:
+            if wallet_id == self.main_wallet.id():
+                await self.wallet_node.new_peak_queue.subscribe_to_puzzle_hashes(
+                    [record.puzzle_hash for record in derivation_paths]
+                )
+            self.state_changed("new_derivation_index", data_object={"index": derivation_paths[-1].index})
+
     async def update_wallet_puzzle_hashes(self, wallet_id: uint32) -> None:
         derivation_paths: List[DerivationRecord] = []
         target_wallet = self.wallets[wallet_id]
@@ -714,20 +817,31 @@ class WalletStateManager:
         all_unspent_coins: Set[Coin] = {cr.coin for cr in unspent_coin_records}
 
         for record in unconfirmed_tx:
+            hint_dict = record.hint_dict()
             for addition in record.additions:
                 # This change or a self transaction
-                if await self.does_coin_belong_to_wallet(addition, wallet_id, record.hint_dict()):
+                if await self.does_coin_belong_to_wallet(addition, wallet_id, hint_dict):
                     all_unspent_coins.add(addition)
 
             for removal in record.removals:
-                if (
-                    await self.does_coin_belong_to_wallet(removal, wallet_id, record.hint_dict())
-                    and removal in all_unspent_coins
+                if removal in all_unspent_coins and await self.does_coin_belong_to_wallet(
+                    removal, wallet_id, hint_dict
                 ):
                     all_unspent_coins.remove(removal)
 
         return uint128(sum(coin.amount for coin in all_unspent_coins))
 
+    async def get_unspent_coin_index(self, wallet_id: int) -> UnspentCoinIndex:
+        """
+        Returns the unspent coins of a wallet, sorted by amount. CR-CAT wallets only count their CRCAT coins, like
+        get_spendable_coins_for_wallet().
+        """
+        if self.wallets[uint32(wallet_id)].type() == WalletType.CRCAT:
+            coin_type = CoinType.CRCAT
+        else:
+            coin_type = CoinType.NORMAL
+        return await self.coin_store.get_unspent_coin_index(wallet_id, coin_type)
+
     async def unconfirmed_removals_for_wallet(self, wallet_id: int) -> Dict[bytes32, Coin]:
         """
         Returns new removals transactions that have not been confirmed yet.
@@ -2446,9 +2560,10 @@ class WalletStateManager:
         unconfirmed_tx: List[TransactionRecord] = await self.tx_store.get_unconfirmed_for_wallet(wallet_id)
         removal_dict: Dict[bytes32, Coin] = {}
         for tx in unconfirmed_tx:
+            hint_dict = tx.hint_dict()
             for coin in tx.removals:
                 # TODO, "if" might not be necessary once unconfirmed tx doesn't contain coins for other wallets
-                if await self.does_coin_belong_to_wallet(coin, wallet_id, tx.hint_dict()):
+                if await self.does_coin_belong_to_wallet(coin, wallet_id, hint_dict):
                     removal_dict[coin.name()] = coin
 
         # Coins that are part of the trade
@@ -17,6 +17,7 @@ from chia.wallet.transaction_record import TransactionRecord, TransactionRecordO
 from chia.wallet.transaction_sorting import SortKey
 from chia.wallet.util.query_filter import FilterMode, TransactionTypeFilter
 from chia.wallet.util.transaction_type import TransactionType
+from chia.wallet.util.wallet_generations import WalletGenerations
 
 log = logging.getLogger(__name__)
 
@@ -38,6 +39,7 @@ class WalletTransactionStore:
     db_wrapper: DBWrapper2
     tx_submitted: Dict[bytes32, Tuple[int, int]]  # tx_id: [time submitted: count]
     last_wallet_tx_resend_time: int  # Epoch time in seconds
+    generations: WalletGenerations
 
     @classmethod
     async def create(cls, db_wrapper: DBWrapper2):
@@ -93,12 +95,17 @@ class WalletTransactionStore:
 
         self.tx_submitted = {}
         self.last_wallet_tx_resend_time = int(time.time())
+        self.generations = WalletGenerations()
         return self
 
     async def add_transaction_record(self, record: TransactionRecord) -> None:
         """
         Store TransactionRecord in DB and Cache.
         """
+        await self._write_transaction_record(record)
+        self.generations.bump(record.wallet_id)
+
+    async def _write_transaction_record(self, record: TransactionRecord) -> None:
         async with self.db_wrapper.writer_maybe_transaction() as conn:
             transaction_record_old = TransactionRecordOld(
                 confirmed_at_height=record.confirmed_at_height,
@@ -142,6 +149,7 @@ class WalletTransactionStore:
     async def delete_transaction_record(self, tx_id: bytes32) -> None:
         async with self.db_wrapper.writer_maybe_transaction() as conn:
             await (await conn.execute("DELETE FROM transaction_record WHERE bundle_id=?", (tx_id,))).close()
+        self.generations.bump()
 
     async def set_confirmed(self, tx_id: bytes32, height: uint32):
         """
@@ -191,7 +199,11 @@ class WalletTransactionStore:
             # if the tx is not valid due to repeated failures, we will confirm that we can't spend it
             log.info(f"Marking tx={tx.name} as confirmed but failed, since it is not spendable due to errors")
             tx = dataclasses.replace(tx, confirmed=True, confirmed_at_height=uint32(0))
-        await self.add_transaction_record(tx)
+        # resending only changes which peers the transaction was sent to, nothing computed from the pending
+        # transactions of the wallet
+        await self._write_transaction_record(tx)
+        if tx.confirmed != current.confirmed:
+            self.generations.bump(tx.wallet_id)
         return True
 
     async def tx_reorged(self, record: TransactionRecord):
@@ -414,6 +426,7 @@ class WalletTransactionStore:
         self.tx_submitted = {}
         async with self.db_wrapper.writer_maybe_transaction() as conn:
             await (await conn.execute("DELETE FROM transaction_record WHERE confirmed_at_height>?", (height,))).close()
+        self.generations.bump()
 
     async def delete_unconfirmed_transactions(self, wallet_id: int):
         async with self.db_wrapper.writer_maybe_transaction() as conn:
@@ -427,6 +440,7 @@ class WalletTransactionStore:
                     ),
                 )
             ).close()
+        self.generations.bump(wallet_id)
 
     async def _get_new_tx_records_from_old(self, old_records: List[TransactionRecordOld]) -> List[TransactionRecord]:
         tx_id_to_valid_times: Dict[bytes, ConditionValidTimes] = {}
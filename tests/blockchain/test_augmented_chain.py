@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+from typing import List
+
+import pytest
+
+from chia.consensus.augmented_chain import AugmentedBlockchain
+from chia.consensus.blockchain import AddBlockResult, Blockchain
+from chia.consensus.full_block_to_block_record import block_to_block_record
+from chia.consensus.multiprocess_validation import PreValidationResult, pre_validate_blocks_multiprocessing
+from chia.types.full_block import FullBlock
+from tests.blockchain.blockchain_test_utils import _validate_and_add_block
+
+
+async def pre_validate(
+    chain: AugmentedBlockchain, blockchain: Blockchain, blocks: List[FullBlock]
+) -> List[PreValidationResult]:
+    results = await pre_validate_blocks_multiprocessing(
+        blockchain.constants,
+        chain,
+        blocks,
+        blockchain.pool,
+        True,
+        {},
+        chain.get_block_generator,
+        4,
+        validate_signatures=False,
+    )
+    chain.clear_temp_records()
+    return results
+
+
+@pytest.mark.anyio
+async def test_pre_validate_ahead(empty_blockchain: Blockchain, default_1000_blocks: List[FullBlock]) -> None:
+    blockchain = empty_blockchain
+    blocks = default_1000_blocks[:300]
+    for block in blocks[:100]:
+        await _validate_and_add_block(blockchain, block)
+
+    chain = AugmentedBlockchain(blockchain)
+    results = await pre_validate(chain, blockchain, blocks[100:200])
+    for block, result in zip(blocks[100:200], results):
+        assert result.error is None
+        assert result.required_iters is not None
+        chain.add_extra_block(
+            block, block_to_block_record(blockchain.constants, chain, result.required_iters, block, None)
+        )
+
+    # the parents of these blocks are only known to the augmented chain
+    assert not blockchain.contains_block(blocks[199].header_hash)
+    assert chain.contains_block(blocks[199].header_hash)
+    assert chain.height_to_hash(blocks[199].height) == blocks[199].header_hash
+    ahead = await pre_validate(chain, blockchain, blocks[200:300])
+    assert all(result.error is None for result in ahead)
+    # pre-validation didn't leave any records behind in the blockchain's cache
+    assert not any(blockchain.contains_block(block.header_hash) for block in blocks[100:300])
+
+    for block, result in zip(blocks[100:200], results):
+        add_result, err, _ = await blockchain.add_block(block, result, None)
+        assert err is None
+        assert add_result == AddBlockResult.NEW_PEAK
+        chain.remove_extra_block(block.header_hash)
+
+    # once the blocks are in the blockchain, pre-validation gives the same results
+    expected = await blockchain.pre_validate_blocks_multiprocessing(blocks[200:300], {}, validate_signatures=False)
+    assert [r.required_iters for r in ahead] == [r.required_iters for r in expected]
+    for block, result in zip(blocks[200:300], ahead):
+        add_result, err, _ = await blockchain.add_block(block, result, None)
+        assert err is None
+        assert add_result == AddBlockResult.NEW_PEAK
@@ -25,3 +25,4 @@ async def create_ram_blockchain(
             yield db_wrapper, blockchain
         finally:
             blockchain.shut_down()
+            blockchain.close()
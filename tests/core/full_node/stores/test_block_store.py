@@ -8,6 +8,7 @@ from pathlib import Path
 from typing import List, cast
 
 import pytest
+import zstd
 
 # TODO: update after resolution in https://github.com/pytest-dev/pytest/issues/7469
 from _pytest.fixtures import SubRequest
@@ -332,6 +333,86 @@ async def test_get_generator(bt: BlockTools, db_version: int, use_cache: bool) -
         assert await store.get_generator(blocks[6].header_hash) == new_blocks[6].transactions_generator
         assert await store.get_generator(blocks[7].header_hash) == new_blocks[7].transactions_generator
 
+        # the generators looked up by height are cached
+        if use_cache:
+            assert len(store.generator_cache) == 9
+            hits = store.generator_cache.hits
+            generators = await store.get_generators_at([uint32(3), uint32(9)])
+            assert generators == [new_blocks[3].transactions_generator, new_blocks[9].transactions_generator]
+            assert store.generator_cache.hits == hits + 2
+        else:
+            assert len(store.generator_cache) == 0
+
+
+@pytest.mark.limit_consensus_modes(reason="save time")
+@pytest.mark.anyio
+async def test_prefetch_generators(bt: BlockTools) -> None:
+    blocks = bt.get_consecutive_blocks(10)
+
+    async with DBConnection(2) as db_wrapper:
+        store = await BlockStore.create(db_wrapper)
+
+        new_blocks = []
+        for i, block in enumerate(blocks):
+            if i % 2 == 1:
+                block = block.replace(transactions_generator=SerializedProgram.from_bytes(int_to_bytes(i + 1)))
+            block_record = header_block_to_sub_block_record(
+                DEFAULT_CONSTANTS, uint64(0), block, uint64(0), False, uint8(0), uint32(max(0, block.height - 1)), None
+            )
+            await store.add_full_block(block.header_hash, block, block_record)
+            await store.set_in_chain([(block_record.header_hash,)])
+            await store.set_peak(block_record.header_hash)
+            new_blocks.append(block)
+
+        # blocks without a generator, and missing blocks, are skipped
+        assert await store.prefetch_generators([uint32(h) for h in [1, 2, 3, 3, 5, 100]]) == 3
+        assert len(store.generator_cache) == 3
+        # the cached ones aren't read again
+        assert await store.prefetch_generators([uint32(h) for h in [1, 3, 5, 7]]) == 1
+
+        misses = store.generator_cache.misses
+        generators = await store.get_generators_at([uint32(h) for h in [7, 1, 5, 3]])
+        assert generators == [new_blocks[h].transactions_generator for h in [7, 1, 5, 3]]
+        assert store.generator_cache.misses == misses
+
+        # after a reorg, the generators above the fork are read again
+        store.generator_cache.rollback(4)
+        assert await store.prefetch_generators([uint32(h) for h in [1, 3, 5, 7]]) == 2
+
+
+@pytest.mark.limit_consensus_modes(reason="save time")
+@pytest.mark.anyio
+async def test_rollback_generators(bt: BlockTools) -> None:
+    blocks = bt.get_consecutive_blocks(10)
+    reorg_blocks = bt.get_consecutive_blocks(5, blocks[:5], seed=b"2")
+
+    async def add_blocks(blocks: List[FullBlock], offset: int) -> List[FullBlock]:
+        new_blocks = []
+        for i, block in enumerate(blocks):
+            block = block.replace(transactions_generator=SerializedProgram.from_bytes(int_to_bytes(i + offset)))
+            block_record = header_block_to_sub_block_record(
+                DEFAULT_CONSTANTS, uint64(0), block, uint64(0), False, uint8(0), uint32(max(0, block.height - 1)), None
+            )
+            await store.add_full_block(block.header_hash, block, block_record)
+            await store.set_in_chain([(block_record.header_hash,)])
+            await store.set_peak(block_record.header_hash)
+            new_blocks.append(block)
+        return new_blocks
+
+    async with DBConnection(2) as db_wrapper:
+        store = await BlockStore.create(db_wrapper)
+        heights = [uint32(h) for h in range(1, 10)]
+
+        old_blocks = await add_blocks(blocks, 1)
+        assert await store.get_generators_at(heights) == [b.transactions_generator for b in old_blocks[1:]]
+        assert len(store.generator_cache) == 9
+
+        # revert the chain to height 4, and add different blocks at the same heights
+        await store.rollback(4)
+        assert len(store.generator_cache) == 4
+        new_blocks = old_blocks[:5] + await add_blocks(reorg_blocks[5:], 100)
+        assert await store.get_generators_at(heights) == [b.transactions_generator for b in new_blocks[1:]]
+
 
 @pytest.mark.limit_consensus_modes(reason="save time")
 @pytest.mark.anyio
@@ -401,6 +482,34 @@ async def test_get_block_bytes_in_range(tmp_dir: Path, bt: BlockTools, db_versio
                 await store_2.get_block_bytes_in_range(0, 10)
 
 
+@pytest.mark.limit_consensus_modes(reason="save time")
+@pytest.mark.anyio
+async def test_stream_block_bytes_in_range(tmp_dir: Path, bt: BlockTools) -> None:
+    blocks = bt.get_consecutive_blocks(10)
+
+    async with DBConnection(2) as db_wrapper:
+        coin_store = await CoinStore.create(db_wrapper)
+        block_store = await BlockStore.create(db_wrapper)
+        bc = await Blockchain.create(coin_store, block_store, bt.constants, tmp_dir, 2)
+        for block in blocks:
+            await _validate_and_add_block(bc, block)
+
+        for chunk_size in [1, 3, 10, 100]:
+            stream = block_store.stream_block_bytes_in_range(2, 8, chunk_size=chunk_size)
+            assert [b async for b in stream] == [bytes(b) for b in blocks[2:9]]
+
+        stream = block_store.stream_block_bytes_in_range(0, 9, chunk_size=4, compressed=True)
+        assert [zstd.decompress(b) for b in [b async for b in stream]] == [bytes(b) for b in blocks]
+
+        # the blocks before the missing one are streamed, then it fails
+        streamed = []
+        with pytest.raises(ValueError, match="Some blocks in range 8-11 were not found"):
+            async for block_bytes in block_store.stream_block_bytes_in_range(0, 11, chunk_size=4):
+                streamed.append(block_bytes)
+        assert streamed == [bytes(b) for b in blocks[:8]]
+        bc.shut_down()
+
+
 @pytest.mark.anyio
 async def test_unsupported_version(tmp_dir: Path, use_cache: bool) -> None:
     with pytest.raises(RuntimeError, match="BlockStore does not support database schema v1"):
@@ -474,3 +583,47 @@ async def test_get_prev_hash(tmp_dir: Path, bt: BlockTools, db_version: int, use
 
         with pytest.raises(KeyError, match="missing block in chain"):
             await store.get_prev_hash(bytes32.from_bytes(b"yolo" * 8))
+
+
+@pytest.mark.limit_consensus_modes(reason="save time")
+@pytest.mark.anyio
+async def test_block_record_snapshot(bt: BlockTools, tmp_dir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    blocks = bt.get_consecutive_blocks(11)
+
+    async with DBConnection(2) as db_wrapper:
+        coin_store = await CoinStore.create(db_wrapper)
+        block_store = await BlockStore.create(db_wrapper)
+        bc = await Blockchain.create(coin_store, block_store, bt.constants, tmp_dir, 2, single_threaded=True)
+        for block in blocks[:10]:
+            await _validate_and_add_block(bc, block)
+        assert await block_store.count_blocks_from_height(5) == 5
+        await bc.write_snapshot()
+        bc.shut_down()
+        snapshot_path = tmp_dir / "block-records"
+        assert snapshot_path.exists()
+
+        # the next startup loads the block records from the snapshot, and not
+        # from the database
+        with monkeypatch.context() as m:
+            m.setattr(block_store, "get_block_records_close_to_peak", None)
+            bc = await Blockchain.create(coin_store, block_store, bt.constants, tmp_dir, 2, single_threaded=True)
+        assert not snapshot_path.exists()
+        peak = bc.get_peak()
+        assert peak is not None
+        assert peak.header_hash == blocks[9].header_hash
+        for block in blocks[:10]:
+            block_record = await block_store.get_block_record(block.header_hash)
+            assert block_record is not None
+            assert bc.block_record(block.header_hash) == block_record
+
+        # if the peak has moved since the snapshot was written, it's ignored
+        await bc.write_snapshot()
+        await _validate_and_add_block(bc, blocks[10])
+        bc.shut_down()
+        bc = await Blockchain.create(coin_store, block_store, bt.constants, tmp_dir, 2, single_threaded=True)
+        assert not snapshot_path.exists()
+        peak = bc.get_peak()
+        assert peak is not None
+        assert peak.header_hash == blocks[10].header_hash
+        assert bc.contains_block(blocks[10].header_hash)
+        bc.shut_down()
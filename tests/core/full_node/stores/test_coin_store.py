@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import logging
 from dataclasses import dataclass
 from pathlib import Path
@@ -28,7 +29,7 @@ from chia.util.generator_tools import tx_removals_and_additions
 from chia.util.hash import std_hash
 from chia.util.ints import uint32, uint64
 from tests.blockchain.blockchain_test_utils import _validate_and_add_block
-from tests.util.db_connection import DBConnection
+from tests.util.db_connection import DBConnection, PathDBConnection
 from tests.util.misc import Marks, datacases
 
 constants = test_constants
@@ -333,6 +334,103 @@ async def test_rollback(db_version: int, bt: BlockTools) -> None:
                         assert record is None
 
 
+@pytest.mark.limit_consensus_modes(reason="save time")
+@pytest.mark.anyio
+async def test_unspent_cache(db_version: int, bt: BlockTools) -> None:
+    blocks = bt.get_consecutive_blocks(10)
+    tx_blocks = [b for b in blocks if b.is_transaction_block() and b.height > 0]
+    last_coins = list(tx_blocks[-1].get_included_reward_coins())
+    first_coins = list(tx_blocks[0].get_included_reward_coins())
+
+    async with DBConnection(db_version) as db_wrapper:
+        coin_store = await CoinStore.create(db_wrapper, unspent_cache_size=len(last_coins))
+
+        for block in tx_blocks:
+            assert block.foliage_transaction_block is not None
+            await coin_store.new_block(
+                block.height,
+                block.foliage_transaction_block.timestamp,
+                block.get_included_reward_coins(),
+                [],
+                [],
+            )
+        # the coins are only cached once they're published, after their
+        # transaction is committed
+        assert len(coin_store.unspent_cache) == 0
+        coin_store.publish_unspent_cache()
+
+        # only the most recently created coins are kept
+        assert len(coin_store.unspent_cache.cache) == len(last_coins)
+        for coin in last_coins:
+            assert coin.name() in coin_store.unspent_cache.cache
+
+        records = await coin_store.get_coin_records([c.name() for c in last_coins + first_coins])
+        assert {r.coin for r in records} == set(last_coins + first_coins)
+        assert coin_store.unspent_cache_hits == len(last_coins)
+        assert coin_store.unspent_cache_misses == len(first_coins)
+
+        # spending a coin evicts it
+        spent = last_coins[0].name()
+        await coin_store._set_spent([spent], tx_blocks[-1].height)
+        assert spent not in coin_store.unspent_cache.cache
+        record = await coin_store.get_coin_record(spent)
+        assert record is not None
+        assert record.spent
+
+        # rolling back the block that created the coins evicts them too
+        await coin_store.rollback_to_block(tx_blocks[-1].height - 1)
+        for coin in last_coins:
+            assert coin.name() not in coin_store.unspent_cache.cache
+            assert await coin_store.get_coin_record(coin.name()) is None
+
+
+@pytest.mark.limit_consensus_modes(reason="save time")
+@pytest.mark.anyio
+async def test_unspent_cache_uncommitted(db_version: int, bt: BlockTools) -> None:
+    tx_blocks = [b for b in bt.get_consecutive_blocks(10) if b.is_transaction_block() and b.height > 0]
+    block = tx_blocks[0]
+    assert block.foliage_transaction_block is not None
+    coins = list(block.get_included_reward_coins())
+
+    async def read() -> Tuple[Optional[CoinRecord], List[CoinRecord]]:
+        return await coin_store.get_coin_record(coins[0].name()), await coin_store.get_coin_records([coins[1].name()])
+
+    async def read_concurrently() -> Tuple[Optional[CoinRecord], List[CoinRecord]]:
+        # another task, like an RPC or wallet request, doesn't use the
+        # transaction of the writer
+        return await asyncio.wait_for(asyncio.create_task(read()), timeout=10)
+
+    async with PathDBConnection(db_version) as db_wrapper:
+        coin_store = await CoinStore.create(db_wrapper)
+
+        async with db_wrapper.writer():
+            await coin_store.new_block(
+                block.height, block.foliage_transaction_block.timestamp, block.get_included_reward_coins(), [], []
+            )
+            # the coins of the block are neither in the database nor in the
+            # cache, as far as readers outside the transaction can tell
+            assert await read_concurrently() == (None, [])
+        coin_store.publish_unspent_cache()
+        record, records = await read_concurrently()
+        assert record is not None and record.coin == coins[0]
+        assert [r.coin for r in records] == [coins[1]]
+        assert coin_store.unspent_cache_hits == 2
+
+        # the coins of a transaction that is rolled back are never published
+        block = tx_blocks[1]
+        assert block.foliage_transaction_block is not None
+        coins = list(block.get_included_reward_coins())
+        with pytest.raises(ValueError, match="rolled back"):
+            async with db_wrapper.writer():
+                await coin_store.new_block(
+                    block.height, block.foliage_transaction_block.timestamp, block.get_included_reward_coins(), [], []
+                )
+                raise ValueError("rolled back")
+        coin_store.clear_unspent_cache()
+        coin_store.publish_unspent_cache()
+        assert await read_concurrently() == (None, [])
+
+
 @pytest.mark.anyio
 async def test_basic_reorg(tmp_dir: Path, db_version: int, bt: BlockTools) -> None:
     async with DBConnection(db_version) as db_wrapper:
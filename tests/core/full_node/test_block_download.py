@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple, cast
+
+import pytest
+
+from chia.full_node.block_download import MAX_CONSECUTIVE_FAILURES, BlockBatchDownloader
+from chia.server.ws_connection import WSChiaConnection
+from chia.types.blockchain_format.sized_bytes import bytes32
+from chia.types.full_block import FullBlock
+from chia.util.ints import uint32
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class FakePeer:
+    peer_node_id: bytes32
+    # how long it takes this peer to respond, or None if it never does
+    delay: Optional[float]
+    closed: bool = False
+    peer_info: str = "fake peer"
+    requests: List[Tuple[int, int]] = field(default_factory=list)
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+def fake_blocks(start: int, end: int) -> List[FullBlock]:
+    # the downloader never looks inside the blocks
+    return cast(List[FullBlock], list(range(start, end + 1)))
+
+
+async def request_blocks(connection: WSChiaConnection, start: uint32, end: uint32) -> Optional[List[FullBlock]]:
+    peer = cast(FakePeer, connection)
+    peer.requests.append((start, end))
+    if peer.delay is None:
+        return None
+    # make the later batches arrive first
+    await asyncio.sleep(peer.delay * (100 - start) / 100)
+    return fake_blocks(start, end)
+
+
+async def download(peers: List[FakePeer], start: int, end: int, batch_size: int) -> Tuple[bool, List[FullBlock]]:
+    received: List[FullBlock] = []
+
+    async def deliver(peer: WSChiaConnection, blocks: List[FullBlock]) -> None:
+        received.extend(blocks)
+
+    downloader = BlockBatchDownloader(request_blocks, lambda: cast(List[WSChiaConnection], peers), log, max_in_flight=4)
+    success = await downloader.run(start, end, batch_size, deliver)
+    return success, received
+
+
+@pytest.mark.anyio
+async def test_in_order_delivery() -> None:
+    peers = [FakePeer(bytes32([i] * 32), 0.01 * (i + 1)) for i in range(3)]
+    success, blocks = await download(peers, 3, 99, 8)
+    assert success
+    assert blocks == fake_blocks(3, 99)
+    # the work was spread across all peers
+    assert all(len(peer.requests) > 0 for peer in peers)
+
+
+@pytest.mark.anyio
+async def test_failing_peer() -> None:
+    good = FakePeer(bytes32([1] * 32), 0.01)
+    bad = FakePeer(bytes32([2] * 32), None)
+    success, blocks = await download([bad, good], 0, 31, 4)
+    assert success
+    assert blocks == fake_blocks(0, 31)
+    # we back off the peer that fails, so it doesn't get to fail that often
+    assert 0 < len(bad.requests) < MAX_CONSECUTIVE_FAILURES
+    assert not bad.closed
+
+
+@pytest.mark.anyio
+async def test_all_peers_failing() -> None:
+    peers = [FakePeer(bytes32([i] * 32), None) for i in range(2)]
+    success, blocks = await download(peers, 0, 31, 4)
+    assert not success
+    assert blocks == []
+
+
+@pytest.mark.anyio
+async def test_no_blocks() -> None:
+    success, blocks = await download([], 10, 9, 4)
+    assert success
+    assert blocks == []
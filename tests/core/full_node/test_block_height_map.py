@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import os
 import struct
+import sys
 from pathlib import Path
 from typing import Optional
 
@@ -488,6 +489,98 @@ class TestBlockHeightMap:
                 for idx in range(0, len(heights), 32):
                     assert new_heights[idx : idx + 32] == heights[idx : idx + 32]
 
+    @pytest.mark.anyio
+    async def test_cache_file_rollback_and_extend(self, tmp_dir: Path, db_version: int) -> None:
+        # The hashes in the cache file are updated in place (through the memory
+        # map), new hashes are appended to the file when flushing
+        async with DBConnection(db_version) as db_wrapper:
+            await setup_db(db_wrapper)
+            await setup_chain(db_wrapper, 2000, ses_every=20)
+            await BlockHeightMap.create(tmp_dir, db_wrapper)
+            height_map = await BlockHeightMap.create(tmp_dir, db_wrapper)
+            assert os.path.getsize(tmp_dir / "height-to-hash") == 2001 * 32
+
+            height_map.rollback(1000)
+            assert not height_map.contains_height(uint32(1001))
+            for height in range(1001, 2500):
+                height_map.update_height(uint32(height), gen_block_hash(height + 65536), None)
+            for height in range(0, 2500):
+                expected = gen_block_hash(height + (65536 if height > 1000 else 0))
+                assert height_map.get_hash(uint32(height)) == expected
+
+            await height_map.flush()
+            assert os.path.getsize(tmp_dir / "height-to-hash") == 2500 * 32
+            with open(tmp_dir / "height-to-hash", "rb") as f:
+                new_heights = f.read()
+            for height in range(0, 2500):
+                expected = gen_block_hash(height + (65536 if height > 1000 else 0))
+                assert height_map.get_hash(uint32(height)) == expected
+                assert new_heights[height * 32 : height * 32 + 32] == expected
+
+    @pytest.mark.anyio
+    async def test_cache_file_count(self, tmp_dir: Path, db_version: int) -> None:
+        # the file isn't truncated by a rollback, the number of valid hashes in
+        # it is written next to it
+        async with DBConnection(db_version) as db_wrapper:
+            await setup_db(db_wrapper)
+            await setup_chain(db_wrapper, 2000, ses_every=20)
+            height_map = await BlockHeightMap.create(tmp_dir, db_wrapper)
+            await height_map.flush()
+            with open(tmp_dir / "height-to-hash-count", "rb") as f:
+                assert uint32.from_bytes(f.read()) == 2001
+
+            height_map.rollback(1000)
+            await height_map.flush()
+            assert os.path.getsize(tmp_dir / "height-to-hash") == 2001 * 32
+            with open(tmp_dir / "height-to-hash-count", "rb") as f:
+                assert uint32.from_bytes(f.read()) == 1001
+
+    @pytest.mark.anyio
+    async def test_cache_file_shared_dir(self, tmp_dir: Path, db_version: int) -> None:
+        # two height maps that start without a cache file, in the same
+        # directory, must not end up sharing the file they have mapped
+        async with DBConnection(db_version) as db_wrapper:
+            await setup_db(db_wrapper)
+            height_map1 = await BlockHeightMap.create(tmp_dir, db_wrapper)
+            height_map2 = await BlockHeightMap.create(tmp_dir, db_wrapper)
+
+            for height in range(0, 100):
+                height_map1.update_height(uint32(height), gen_block_hash(height), None)
+                height_map2.update_height(uint32(height), gen_block_hash(height + 65536), None)
+            await height_map1.flush()
+            await height_map2.flush()
+            for height in range(100, 200):
+                height_map1.update_height(uint32(height), gen_block_hash(height), None)
+                height_map2.update_height(uint32(height), gen_block_hash(height + 65536), None)
+            await height_map1.flush()
+            height_map1.update_height(uint32(50), gen_block_hash(50 + 131072), None)
+
+            for height in range(0, 200):
+                if height != 50:
+                    assert height_map1.get_hash(uint32(height)) == gen_block_hash(height)
+                assert height_map2.get_hash(uint32(height)) == gen_block_hash(height + 65536)
+            assert height_map1.get_hash(uint32(50)) == gen_block_hash(50 + 131072)
+
+    @pytest.mark.anyio
+    async def test_close(self, tmp_dir: Path, db_version: int) -> None:
+        async with DBConnection(db_version) as db_wrapper:
+            await setup_db(db_wrapper)
+            await setup_chain(db_wrapper, 100)
+            height_map = await BlockHeightMap.create(tmp_dir, db_wrapper)
+            await height_map.flush()
+            assert height_map.get_hash(uint32(99)) == gen_block_hash(99)
+            open_files = len(os.listdir(f"/proc/{os.getpid()}/fd")) if sys.platform == "linux" else None
+
+            height_map.close()
+            assert not height_map.contains_height(uint32(0))
+            if open_files is not None:
+                # the file, and the mapping's own duplicate of its descriptor
+                assert len(os.listdir(f"/proc/{os.getpid()}/fd")) == open_files - 2
+            # the file is no longer mapped, so it can be replaced (which fails
+            # on Windows while it's mapped)
+            await write_file_async(tmp_dir / "height-to-hash", b"")
+            height_map.close()
+
     @pytest.mark.anyio
     async def test_cache_file_truncate(self, tmp_dir: Path, db_version: int) -> None:
         # Test the case where the cache has more blocks than the DB, the cache
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from chia.full_node.generator_cache import GeneratorCache
+from chia.types.blockchain_format.serialized_program import SerializedProgram
+from chia.util.ints import uint32
+
+
+def generator(size: int) -> SerializedProgram:
+    # an atom of size - 1 bytes serializes to size bytes
+    assert 2 <= size <= 0x40
+    return SerializedProgram.from_bytes(bytes([0x80 | (size - 1)]) + b"a" * (size - 1))
+
+
+def test_get_put() -> None:
+    cache = GeneratorCache(1000)
+    assert cache.get(uint32(1)) is None
+    assert cache.misses == 1
+
+    gen = generator(10)
+    cache.put(uint32(1), gen, len(bytes(gen)))
+    assert cache.get(uint32(1)) == gen
+    assert cache.hits == 1
+    assert cache.weight == 10
+
+    # replacing an entry updates the size
+    cache.put(uint32(1), generator(20), 20)
+    assert len(cache) == 1
+    assert cache.weight == 20
+
+
+def test_evict_by_size() -> None:
+    cache = GeneratorCache(50)
+    for height in range(5):
+        cache.put(uint32(height), generator(10), 10)
+    assert cache.weight == 50
+    assert len(cache) == 5
+
+    # height 0 was used most recently, so height 1 is evicted
+    cache.get(uint32(0))
+    cache.put(uint32(5), generator(10), 10)
+    assert cache.weight == 50
+    assert uint32(0) in cache.cache
+    assert uint32(1) not in cache.cache
+
+    cache.put(uint32(6), generator(30), 30)
+    assert cache.weight == 50
+    assert sorted(cache.cache.keys()) == [0, 5, 6]
+
+    # a generator larger than the whole cache isn't added
+    cache.put(uint32(7), generator(60), 60)
+    assert uint32(7) not in cache.cache
+    assert cache.weight == 50
+
+
+def test_rollback() -> None:
+    cache = GeneratorCache(1000)
+    for height in range(10):
+        cache.put(uint32(height), generator(10), 10)
+    generation = cache.generation
+
+    cache.rollback(6)
+    assert cache.generation == generation + 1
+    assert sorted(cache.cache.keys()) == list(range(7))
+    assert cache.weight == 70
@@ -1,7 +1,10 @@
 from __future__ import annotations
 
 from chia.full_node.subscriptions import PeerSubscriptions
+from chia.types.blockchain_format.coin import Coin
 from chia.types.blockchain_format.sized_bytes import bytes32
+from chia.types.coin_record import CoinRecord
+from chia.util.ints import uint32, uint64
 
 peer1 = bytes32(b"1" * 32)
 peer2 = bytes32(b"2" * 32)
@@ -401,3 +404,37 @@ def test_subscription_list() -> None:
 
     assert sub.coin_subscriptions(peer1) == {coin1, coin2}
     assert sub.puzzle_subscriptions(peer1) == {ph1, ph2}
+
+
+def test_coin_states_for_peers() -> None:
+    sub = PeerSubscriptions()
+
+    record1 = CoinRecord(Coin(coin1, ph1, uint64(1)), uint32(1), uint32(0), False, uint64(0))
+    record2 = CoinRecord(Coin(coin2, ph2, uint64(2)), uint32(1), uint32(2), False, uint64(0))
+    record3 = CoinRecord(Coin(coin3, ph3, uint64(3)), uint32(2), uint32(0), False, uint64(0))
+    records = [record1, record2, record3]
+
+    assert sub.coin_states_for_peers(records, {}) == {}
+
+    # peer1 is subscribed to record1 both by coin id and puzzle hash, it's
+    # only included once
+    sub.add_coin_subscriptions(peer1, [record1.name], 100)
+    sub.add_puzzle_subscriptions(peer1, [ph1, ph2], 100)
+    # peer2 is subscribed to record1 by coin id, and to record3 by hint
+    sub.add_coin_subscriptions(peer2, [record1.name], 100)
+    sub.add_puzzle_subscriptions(peer2, [ph4], 100)
+
+    hints = {record3.name: ph4}
+    changes = sub.coin_states_for_peers(records + [record1], hints)
+    assert changes == {
+        peer1: [record1.coin_state, record2.coin_state],
+        peer2: [record1.coin_state, record3.coin_state],
+    }
+
+    # the lookup must not change the subscriptions
+    assert sub.peers_for_coin_id(record1.name) == {peer1, peer2}
+    assert sub.peers_for_puzzle_hash(ph1) == {peer1}
+    assert sub.peers_for_puzzle_hash(ph4) == {peer2}
+
+    sub.remove_peer(peer1)
+    assert sub.coin_states_for_peers(records, hints) == {peer2: [record1.coin_state, record3.coin_state]}
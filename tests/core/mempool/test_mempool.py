@@ -3,7 +3,7 @@ from __future__ import annotations
 import dataclasses
 import logging
 import random
-from typing import Callable, Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple, Type
 
 import pytest
 from chia_rs import G2Element
@@ -15,7 +15,7 @@ from chia.consensus.cost_calculator import NPCResult
 from chia.full_node.bitcoin_fee_estimator import create_bitcoin_fee_estimator
 from chia.full_node.fee_estimation import EmptyMempoolInfo, MempoolInfo
 from chia.full_node.full_node_api import FullNodeAPI
-from chia.full_node.mempool import Mempool
+from chia.full_node.mempool import MEMPOOL_ENGINES, Mempool, MempoolBase, SortedMempool
 from chia.full_node.mempool_check_conditions import get_name_puzzle_conditions, get_puzzle_and_solution_for_coin
 from chia.full_node.mempool_manager import MEMPOOL_MIN_FEE_INCREASE
 from chia.full_node.pending_tx_cache import ConflictTxCache, PendingTxCache
@@ -2714,7 +2714,8 @@ coins = make_test_coins()
         ),
     ],
 )
-def test_items_by_feerate(items: List[MempoolItem], expected: List[Coin]) -> None:
+@pytest.mark.parametrize("mempool_class", [Mempool, SortedMempool])
+def test_items_by_feerate(mempool_class: Type[MempoolBase], items: List[MempoolItem], expected: List[Coin]) -> None:
     fee_estimator = create_bitcoin_fee_estimator(uint64(11000000000))
 
     mempool_info = MempoolInfo(
@@ -2722,7 +2723,7 @@ def test_items_by_feerate(items: List[MempoolItem], expected: List[Coin]) -> Non
         FeeRate(uint64(1000000)),
         CLVMCost(uint64(11000000000)),
     )
-    mempool = Mempool(mempool_info, fee_estimator)
+    mempool = mempool_class(mempool_info, fee_estimator)
     for i in items:
         mempool.add_to_pool(i)
 
@@ -2738,6 +2739,25 @@ def test_items_by_feerate(items: List[MempoolItem], expected: List[Coin]) -> Non
         last_fpc = mi.fee_per_cost
 
 
+def test_mempool_engines_implement_interface() -> None:
+    fee_estimator = create_bitcoin_fee_estimator(uint64(11000000000))
+    mempool_info = MempoolInfo(
+        CLVMCost(uint64(11000000000 * 3)),
+        FeeRate(uint64(1000000)),
+        CLVMCost(uint64(11000000000)),
+    )
+    for mempool_class in MEMPOOL_ENGINES.values():
+        assert isinstance(mempool_class(mempool_info, fee_estimator), MempoolBase)
+
+    class IncompleteMempool(MempoolBase):
+        def size(self) -> int:
+            return 0
+
+    # an engine that's missing any of the methods can't be created
+    with pytest.raises(TypeError, match="abstract"):
+        IncompleteMempool(mempool_info, fee_estimator)  # type: ignore[abstract]
+
+
 def rand_hash() -> bytes32:
     rng = random.Random()
     ret = bytearray(32)
@@ -2767,7 +2787,8 @@ def item_cost(cost: int, fee_rate: float) -> MempoolItem:
         ([75, 15, 9], 10, [10, 75, 15]),
     ],
 )
-def test_full_mempool(items: List[int], add: int, expected: List[int]) -> None:
+@pytest.mark.parametrize("mempool_class", [Mempool, SortedMempool])
+def test_full_mempool(mempool_class: Type[MempoolBase], items: List[int], add: int, expected: List[int]) -> None:
     fee_estimator = create_bitcoin_fee_estimator(uint64(11000000000))
 
     mempool_info = MempoolInfo(
@@ -2775,7 +2796,7 @@ def test_full_mempool(items: List[int], add: int, expected: List[int]) -> None:
         FeeRate(uint64(1000000)),
         CLVMCost(uint64(100)),
     )
-    mempool = Mempool(mempool_info, fee_estimator)
+    mempool = mempool_class(mempool_info, fee_estimator)
     invariant_check_mempool(mempool)
     fee_rate: float = 3.0
     for i in items:
@@ -2814,7 +2835,10 @@ def test_full_mempool(items: List[int], add: int, expected: List[int]) -> None:
         ([10, 11, 12, 13, 50], [10, 11, 12, 13], False),
     ],
 )
-def test_limit_expiring_transactions(height: bool, items: List[int], expected: List[int], increase_fee: bool) -> None:
+@pytest.mark.parametrize("mempool_class", [Mempool, SortedMempool])
+def test_limit_expiring_transactions(
+    mempool_class: Type[MempoolBase], height: bool, items: List[int], expected: List[int], increase_fee: bool
+) -> None:
     fee_estimator = create_bitcoin_fee_estimator(uint64(11000000000))
 
     mempool_info = MempoolInfo(
@@ -2822,7 +2846,7 @@ def test_limit_expiring_transactions(height: bool, items: List[int], expected: L
         FeeRate(uint64(1000000)),
         CLVMCost(uint64(50)),
     )
-    mempool = Mempool(mempool_info, fee_estimator)
+    mempool = mempool_class(mempool_info, fee_estimator)
     mempool.new_tx_block(uint32(10), uint64(100000))
     invariant_check_mempool(mempool)
 
@@ -2893,14 +2917,17 @@ def test_limit_expiring_transactions(height: bool, items: List[int], expected: L
         ),
     ],
 )
-def test_get_items_by_coin_ids(items: List[MempoolItem], coin_ids: List[bytes32], expected: List[MempoolItem]) -> None:
+@pytest.mark.parametrize("mempool_class", [Mempool, SortedMempool])
+def test_get_items_by_coin_ids(
+    mempool_class: Type[MempoolBase], items: List[MempoolItem], coin_ids: List[bytes32], expected: List[MempoolItem]
+) -> None:
     fee_estimator = create_bitcoin_fee_estimator(uint64(11000000000))
     mempool_info = MempoolInfo(
         CLVMCost(uint64(11000000000 * 3)),
         FeeRate(uint64(1000000)),
         CLVMCost(uint64(11000000000)),
     )
-    mempool = Mempool(mempool_info, fee_estimator)
+    mempool = mempool_class(mempool_info, fee_estimator)
     for i in items:
         mempool.add_to_pool(i)
         invariant_check_mempool(mempool)
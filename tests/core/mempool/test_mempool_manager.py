@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import dataclasses
 import logging
 from typing import Any, Awaitable, Callable, Collection, Dict, List, Optional, Set, Tuple
@@ -11,8 +12,9 @@ from chiabip158 import PyBIP158
 from chia.consensus.constants import ConsensusConstants
 from chia.consensus.cost_calculator import NPCResult
 from chia.consensus.default_constants import DEFAULT_CONSTANTS
+from chia.full_node import mempool_manager as mempool_manager_module
 from chia.full_node.bundle_tools import simple_solution_generator
-from chia.full_node.mempool import MAX_SKIPPED_ITEMS, PRIORITY_TX_THRESHOLD
+from chia.full_node.mempool import MAX_SKIPPED_ITEMS, MEMPOOL_ENGINES, PRIORITY_TX_THRESHOLD, MempoolRemoveReason
 from chia.full_node.mempool_check_conditions import get_name_puzzle_conditions, mempool_check_time_locks
 from chia.full_node.mempool_manager import (
     MEMPOOL_MIN_FEE_INCREASE,
@@ -134,8 +136,11 @@ async def instantiate_mempool_manager(
     block_timestamp: uint64 = TEST_TIMESTAMP,
     constants: ConsensusConstants = DEFAULT_CONSTANTS,
     max_tx_clvm_cost: Optional[uint64] = None,
+    mempool_engine: str = "sqlite",
 ) -> MempoolManager:
-    mempool_manager = MempoolManager(get_coin_records, constants, max_tx_clvm_cost=max_tx_clvm_cost)
+    mempool_manager = MempoolManager(
+        get_coin_records, constants, max_tx_clvm_cost=max_tx_clvm_cost, mempool_engine=mempool_engine
+    )
     test_block_record = create_test_block_record(height=block_height, timestamp=block_timestamp)
     await mempool_manager.new_peak(test_block_record, None)
     invariant_check_mempool(mempool_manager.mempool)
@@ -148,6 +153,7 @@ async def setup_mempool_with_coins(
     max_block_clvm_cost: Optional[int] = None,
     max_tx_clvm_cost: Optional[uint64] = None,
     mempool_block_buffer: Optional[int] = None,
+    mempool_engine: str = "sqlite",
 ) -> Tuple[MempoolManager, List[Coin]]:
     coins = []
     test_coin_records = {}
@@ -170,7 +176,7 @@ async def setup_mempool_with_coins(
     if mempool_block_buffer is not None:
         constants = dataclasses.replace(constants, MEMPOOL_BLOCK_BUFFER=mempool_block_buffer)
     mempool_manager = await instantiate_mempool_manager(
-        get_coin_records, constants=constants, max_tx_clvm_cost=max_tx_clvm_cost
+        get_coin_records, constants=constants, max_tx_clvm_cost=max_tx_clvm_cost, mempool_engine=mempool_engine
     )
     return (mempool_manager, coins)
 
@@ -522,6 +528,48 @@ async def test_double_spend_prevalidation() -> None:
         await mempool_manager.pre_validate_spendbundle(sb_twice, None, sb_twice.name())
 
 
+@pytest.mark.anyio
+@pytest.mark.parametrize("batch_size", [2, 3, 10])
+async def test_batched_prevalidation(batch_size: int, monkeypatch: pytest.MonkeyPatch) -> None:
+    batches: List[int] = []
+
+    def validate_batch(spend_bundles_bytes: List[bytes], *args: Any) -> List[mempool_manager_module.ValidationResult]:
+        batches.append(len(spend_bundles_bytes))
+        return [mempool_manager_module.validate_clvm_and_signature(b, *args) for b in spend_bundles_bytes]
+
+    monkeypatch.setattr(mempool_manager_module, "validate_clvm_and_signature_batch", validate_batch)
+    mempool_manager = MempoolManager(
+        zero_calls_get_coin_records,
+        DEFAULT_CONSTANTS,
+        single_threaded=True,
+        validation_batch_size=batch_size,
+        validation_batch_latency=0.01,
+    )
+    await mempool_manager.new_peak(create_test_block_record(height=TEST_HEIGHT, timestamp=TEST_TIMESTAMP), None)
+
+    valid = [
+        spend_bundle_from_conditions([[ConditionOpcode.CREATE_COIN, IDENTITY_PUZZLE_HASH, i]]) for i in range(1, 6)
+    ]
+    invalid = spend_bundle_from_conditions([[ConditionOpcode.CREATE_COIN, IDENTITY_PUZZLE_HASH, -1]])
+    bundles = valid[:2] + [invalid] + valid[2:]
+    unbatched_mempool_manager = MempoolManager(zero_calls_get_coin_records, DEFAULT_CONSTANTS, single_threaded=True)
+    await unbatched_mempool_manager.new_peak(
+        create_test_block_record(height=TEST_HEIGHT, timestamp=TEST_TIMESTAMP), None
+    )
+    results = await asyncio.gather(
+        *(mempool_manager.pre_validate_spendbundle(sb, None, sb.name()) for sb in bundles), return_exceptions=True
+    )
+    assert sum(batches) == len(bundles)
+    assert len(batches) == (len(bundles) + batch_size - 1) // batch_size
+    for sb, result in zip(bundles, results):
+        if sb is invalid:
+            assert isinstance(result, ValidationError)
+            assert result.code == Err.COIN_AMOUNT_NEGATIVE
+        else:
+            assert isinstance(result, NPCResult)
+            assert result == await unbatched_mempool_manager.pre_validate_spendbundle(sb, None, sb.name())
+
+
 @pytest.mark.anyio
 async def test_minting_coin() -> None:
     mempool_manager = await instantiate_mempool_manager(zero_calls_get_coin_records)
@@ -936,6 +984,59 @@ async def test_get_items_not_in_filter() -> None:
     assert result == [sb1]
 
 
+@pytest.mark.parametrize("mempool_engine", MEMPOOL_ENGINES.keys())
+@pytest.mark.anyio
+async def test_mempool_filter_cache(mempool_engine: str) -> None:
+    mempool_manager, coins = await setup_mempool_with_coins(
+        coin_amounts=[1000, 2000, 3000], mempool_engine=mempool_engine
+    )
+
+    def make_bundle(coin: Coin, fee: int) -> SpendBundle:
+        conditions = Program.to([[ConditionOpcode.CREATE_COIN, IDENTITY_PUZZLE_HASH, coin.amount - fee]])
+        return SpendBundle([make_spend(coin, IDENTITY_PUZZLE, conditions)], G2Element())
+
+    empty_filter = PyBIP158([])
+    sb1 = make_bundle(coins[0], 10)
+    assert (await add_spendbundle(mempool_manager, sb1, sb1.name()))[1] == MempoolInclusionStatus.SUCCESS
+    filter1 = mempool_manager.get_filter()
+    # nothing changed, so we get the same filter back without building it again
+    assert mempool_manager.get_filter() is filter1
+    assert PyBIP158(bytearray(filter1)).Match(bytearray(sb1.name()))
+    assert mempool_manager.get_items_not_in_filter(empty_filter) == [sb1]
+
+    # adding an item invalidates the filter, and it's part of the fee rate order
+    sb2 = make_bundle(coins[1], 1000)
+    assert (await add_spendbundle(mempool_manager, sb2, sb2.name()))[1] == MempoolInclusionStatus.SUCCESS
+    filter2 = mempool_manager.get_filter()
+    assert filter2 != filter1
+    assert PyBIP158(bytearray(filter2)).Match(bytearray(sb2.name()))
+    assert mempool_manager.get_items_not_in_filter(empty_filter) == [sb2, sb1]
+    assert mempool_manager.get_items_not_in_filter(empty_filter, limit=1) == [sb2]
+    assert mempool_manager.get_items_not_in_filter(PyBIP158(bytearray(filter2))) == []
+
+    # the fee rate order is read in pages, which make up the same order
+    sb3 = make_bundle(coins[2], 100)
+    assert (await add_spendbundle(mempool_manager, sb3, sb3.name()))[1] == MempoolInclusionStatus.SUCCESS
+    expected = [(sb.name(), sb) for sb in (sb2, sb3, sb1)]
+    for page_size in (1, 2, 3, 100):
+        assert list(mempool_manager.mempool.spend_bundles_by_feerate(page_size)) == expected
+    mempool_manager.mempool.remove_from_pool([sb3.name()], MempoolRemoveReason.CONFLICT)
+
+    # and so does removing one
+    mempool_manager.mempool.remove_from_pool([sb2.name()], MempoolRemoveReason.CONFLICT)
+    assert mempool_manager.get_filter() == filter1
+    assert mempool_manager.get_items_not_in_filter(empty_filter) == [sb1]
+
+
+@pytest.mark.anyio
+async def test_unknown_mempool_engine() -> None:
+    async def get_coin_records(_: Collection[bytes32]) -> List[CoinRecord]:
+        assert False  # pragma: no cover
+
+    with pytest.raises(ValueError, match="unknown mempool engine"):
+        await instantiate_mempool_manager(get_coin_records, mempool_engine="foobar")
+
+
 @pytest.mark.anyio
 async def test_total_mempool_fees() -> None:
     coin_records: Dict[bytes32, CoinRecord] = {}
@@ -973,9 +1074,10 @@ async def test_total_mempool_fees() -> None:
     assert result[2] == Err.INVALID_BLOCK_FEE_AMOUNT
 
 
+@pytest.mark.parametrize("mempool_engine", MEMPOOL_ENGINES.keys())
 @pytest.mark.parametrize("reverse_tx_order", [True, False])
 @pytest.mark.anyio
-async def test_create_bundle_from_mempool(reverse_tx_order: bool) -> None:
+async def test_create_bundle_from_mempool(reverse_tx_order: bool, mempool_engine: str) -> None:
     async def get_unspent_lineage_info_for_puzzle_hash(_: bytes32) -> Optional[UnspentLineageInfo]:
         assert False  # pragma: no cover
 
@@ -999,7 +1101,10 @@ async def test_create_bundle_from_mempool(reverse_tx_order: bool) -> None:
             result = await add_spendbundle(mempool_manager, sb, sb.name())
             assert result[1] == MempoolInclusionStatus.SUCCESS
 
-    mempool_manager, coins = await setup_mempool_with_coins(coin_amounts=list(range(2000000000, 2000002200)))
+    mempool_manager, coins = await setup_mempool_with_coins(
+        coin_amounts=list(range(2000000000, 2000002200)), mempool_engine=mempool_engine
+    )
+    assert isinstance(mempool_manager.mempool, MEMPOOL_ENGINES[mempool_engine])
     high_rate_spends = await make_coin_spends(coins[0:2200])
     low_rate_spends = await make_coin_spends(coins[2200:2400], high_fees=False)
     spends = low_rate_spends + high_rate_spends if reverse_tx_order else high_rate_spends + low_rate_spends
@@ -1014,6 +1119,81 @@ async def test_create_bundle_from_mempool(reverse_tx_order: bool) -> None:
     assert len([s for s in low_rate_spends if s in result[0].coin_spends]) == 0
 
 
+@pytest.mark.parametrize("mempool_engine", MEMPOOL_ENGINES.keys())
+@pytest.mark.anyio
+async def test_create_bundle_from_block_template(mempool_engine: str) -> None:
+    async def get_unspent_lineage_info_for_puzzle_hash(_: bytes32) -> Optional[UnspentLineageInfo]:
+        assert False  # pragma: no cover
+
+    def always(_: bytes32) -> bool:
+        return True
+
+    mempool_manager, coins = await setup_mempool_with_coins(
+        coin_amounts=list(range(1000000000, 1000000010)), mempool_engine=mempool_engine
+    )
+    assert mempool_manager.peak is not None
+    peak_hash = mempool_manager.peak.header_hash
+    mempool = mempool_manager.mempool
+
+    async def send(coin: Coin) -> bytes32:
+        # the fee is 1 less than the amount, so higher value coins pay higher fee rates
+        _, sb_name, result = await generate_and_add_spendbundle(
+            mempool_manager, [[ConditionOpcode.CREATE_COIN, IDENTITY_PUZZLE_HASH, 1]], coin
+        )
+        assert result[1] == MempoolInclusionStatus.SUCCESS
+        return sb_name
+
+    async def check_matches_full_rebuild() -> Tuple[SpendBundle, List[Coin]]:
+        result = await mempool_manager.create_bundle_from_mempool(peak_hash, get_unspent_lineage_info_for_puzzle_hash)
+        expected = await mempool.create_bundle_from_mempool_items(
+            always, get_unspent_lineage_info_for_puzzle_hash, mempool_manager.constants, TEST_HEIGHT
+        )
+        assert result is not None
+        assert expected is not None
+        assert result[0] == expected[0]
+        assert result[1] == expected[1]
+        return result
+
+    assert await mempool_manager.create_bundle_from_mempool(peak_hash, get_unspent_lineage_info_for_puzzle_hash) is None
+    names = [await send(coin) for coin in coins[5:8]]
+    result = await check_matches_full_rebuild()
+    template = mempool._block_template
+    assert template is not None
+    assert template.considered == set(names)
+
+    # asking again, without any changes to the mempool, reuses the bundle
+    result2 = await mempool_manager.create_bundle_from_mempool(peak_hash, get_unspent_lineage_info_for_puzzle_hash)
+    assert result2 is not None
+    assert result2[0] is result[0]
+
+    # an item with a lower fee rate than everything else is appended
+    low_name = await send(coins[0])
+    assert mempool._block_template is template
+    assert template.pending == [(low_name, coins[0].amount - 1)]
+    result = await check_matches_full_rebuild()
+    assert len(result[0].coin_spends) == 4
+    assert mempool._block_template is template
+    assert template.pending == []
+
+    # an item with a higher fee rate than the lowest one we looked at requires a
+    # new scan of the mempool
+    await send(coins[9])
+    assert mempool._block_template is None
+    await check_matches_full_rebuild()
+    template = mempool._block_template
+    assert template is not None
+
+    # so does removing an item we looked at
+    mempool.remove_from_pool([low_name], MempoolRemoveReason.CONFLICT)
+    assert mempool._block_template is None
+    await check_matches_full_rebuild()
+    assert mempool._block_template is not None
+
+    # and a new block
+    mempool.new_tx_block(uint32(TEST_HEIGHT + 1), uint64(TEST_TIMESTAMP + 20))
+    assert mempool._block_template is None
+
+
 @pytest.mark.parametrize("num_skipped_items", [PRIORITY_TX_THRESHOLD, MAX_SKIPPED_ITEMS])
 @pytest.mark.anyio
 async def test_create_bundle_from_mempool_on_max_cost(num_skipped_items: int, caplog: pytest.LogCaptureFixture) -> None:
@@ -1521,6 +1701,59 @@ async def test_coin_spending_different_ways_then_finding_it_spent_in_new_peak(ne
     assert len(list(mempool_manager.mempool.items_by_feerate())) == 0
 
 
+@pytest.mark.anyio
+async def test_reorg_only_revalidates_affected_items() -> None:
+    coins = [Coin(IDENTITY_PUZZLE_HASH, IDENTITY_PUZZLE_HASH, uint64(amount)) for amount in range(100, 104)]
+    test_coin_records = {c.name(): CoinRecord(c, uint32(1), uint32(0), False, uint64(10000)) for c in coins}
+
+    async def get_coin_records(coin_ids: Collection[bytes32]) -> List[CoinRecord]:
+        return [test_coin_records[name] for name in coin_ids if name in test_coin_records]
+
+    mempool_manager = await instantiate_mempool_manager(get_coin_records)
+    names = []
+    for i, coin in enumerate(coins):
+        conditions = [[ConditionOpcode.CREATE_COIN, IDENTITY_PUZZLE_HASH, 1]]
+        if i == 3:
+            conditions.append([ConditionOpcode.ASSERT_HEIGHT_RELATIVE, 2])
+        _, name, result = await generate_and_add_spendbundle(mempool_manager, conditions, coin)
+        assert result[1] == MempoolInclusionStatus.SUCCESS
+        names.append(name)
+
+    # on the new fork, coins[1] has been spent, coins[2] doesn't exist and
+    # coins[3] was created later, so its relative height assertion isn't
+    # satisfied anymore
+    test_coin_records[coins[1].name()] = CoinRecord(coins[1], uint32(1), uint32(3), False, uint64(10000))
+    del test_coin_records[coins[2].name()]
+    test_coin_records[coins[3].name()] = CoinRecord(coins[3], uint32(3), uint32(0), False, uint64(10000))
+
+    revalidated: List[bytes32] = []
+    validate_spend_bundle = mempool_manager.validate_spend_bundle
+
+    async def counting_validate_spend_bundle(
+        new_spend: SpendBundle,
+        npc_result: NPCResult,
+        spend_name: bytes32,
+        first_added_height: uint32,
+        get_coin_records: Callable[[Collection[bytes32]], Awaitable[List[CoinRecord]]],
+    ) -> Tuple[Optional[Err], Optional[MempoolItem], List[bytes32]]:
+        revalidated.append(spend_name)
+        return await validate_spend_bundle(new_spend, npc_result, spend_name, first_added_height, get_coin_records)
+
+    mempool_manager.validate_spend_bundle = counting_validate_spend_bundle  # type: ignore[method-assign]
+    # this is not a child of the current peak, so it's handled as a reorg
+    await mempool_manager.new_peak(create_test_block_record(height=uint32(TEST_HEIGHT - 1)), None)
+    invariant_check_mempool(mempool_manager.mempool)
+
+    assert set(revalidated) == set(names[1:])
+    assert mempool_manager.get_mempool_item(names[0]) is not None
+    for name in names[1:]:
+        assert mempool_manager.get_mempool_item(name) is None
+    # the item with the height assertion is waiting for it to be satisfied
+    assert mempool_manager._pending_cache.get(names[3]) is not None
+    assert mempool_manager.seen(names[0])
+    assert not mempool_manager.seen(names[1])
+
+
 @pytest.mark.anyio
 async def test_bundle_coin_spends() -> None:
     # This tests the construction of bundle_coin_spends map for mempool items
@@ -2,18 +2,18 @@ from __future__ import annotations
 
 import logging
 from dataclasses import dataclass
-from typing import Callable, Tuple, cast
+from typing import BinaryIO, Callable, List, Tuple, cast
 
 import pytest
 from packaging.version import Version
 
 from chia.cmds.init_funcs import chia_full_version_str
 from chia.full_node.full_node_api import FullNodeAPI
-from chia.protocols.full_node_protocol import RejectBlock, RequestBlock, RequestTransaction
+from chia.protocols.full_node_protocol import NewTransaction, RejectBlock, RequestBlock, RequestTransaction
 from chia.protocols.protocol_message_types import ProtocolMessageTypes
 from chia.protocols.shared_protocol import Error, protocol_version
 from chia.protocols.wallet_protocol import RejectHeaderRequest
-from chia.server.outbound_message import make_msg
+from chia.server.outbound_message import Message, NodeType, make_msg
 from chia.server.server import ChiaServer
 from chia.server.start_full_node import create_full_node_service
 from chia.server.start_wallet import create_wallet_service
@@ -23,7 +23,7 @@ from chia.types.blockchain_format.sized_bytes import bytes32
 from chia.types.peer_info import PeerInfo
 from chia.util.api_decorators import api_request
 from chia.util.errors import ApiError, Err
-from chia.util.ints import int16, uint32
+from chia.util.ints import int16, uint32, uint64
 from tests.connection_utils import connect_and_get_peer
 from tests.util.setup_nodes import SimulatorsAndWalletsServices
 from tests.util.time_out_assert import time_out_assert
@@ -204,6 +204,40 @@ async def test_call_api_of_specific_for_missing_peer(
     assert message is None
 
 
+@pytest.mark.anyio
+async def test_send_to_all_serializes_once(
+    three_nodes: List[FullNodeAPI], self_hostname: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    server_1, server_2, server_3 = (node.full_node.server for node in three_nodes)
+    for server in (server_2, server_3):
+        assert await server_1.start_client(PeerInfo(self_hostname, server.get_port()), None)
+    connections = server_1.get_connections(NodeType.FULL_NODE)
+    assert len(connections) == 2
+    bytes_written = [connection.bytes_written for connection in connections]
+
+    serialized: List[Message] = []
+    stream_fields = Message._stream_fields
+
+    def counting_stream_fields(self: Message, f: BinaryIO) -> None:
+        serialized.append(self)
+        stream_fields(self, f)
+
+    monkeypatch.setattr(Message, "_stream_fields", counting_stream_fields)
+    message = make_msg(ProtocolMessageTypes.new_transaction, NewTransaction(bytes32([1] * 32), uint64(1), uint64(1)))
+    await server_1.send_to_all([message], NodeType.FULL_NODE)
+
+    def all_sent() -> bool:
+        return all(
+            connection.bytes_written >= before + len(bytes(message))
+            for connection, before in zip(connections, bytes_written)
+        )
+
+    await time_out_assert(10, all_sent)
+    # the peers send us other messages in the meantime, but ours was only
+    # serialized once
+    assert sum(m is message for m in serialized) == 1
+
+
 @pytest.mark.limit_consensus_modes(reason="save time")
 @pytest.mark.anyio
 async def test_get_peer_info(bt: BlockTools) -> None:
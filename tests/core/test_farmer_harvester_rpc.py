@@ -17,7 +17,7 @@ from chia.consensus.coinbase import create_puzzlehash_for_pk
 from chia.farmer.farmer import Farmer
 from chia.plot_sync.receiver import Receiver
 from chia.plotting.util import add_plot_directory
-from chia.protocols import farmer_protocol
+from chia.protocols import farmer_protocol, harvester_protocol
 from chia.protocols.harvester_protocol import Plot
 from chia.rpc.farmer_rpc_api import (
     FilterItem,
@@ -458,6 +458,30 @@ async def test_farmer_get_harvester_plots_endpoints(
             }
 
 
+@pytest.mark.anyio
+async def test_harvester_get_disk_metrics(harvester_farmer_environment: HarvesterFarmerEnvironment) -> None:
+    farmer_service, _, harvester_service, harvester_rpc_client, _ = harvester_farmer_environment
+    harvester_id = harvester_service._server.node_id
+    await wait_for_synced_receiver(farmer_service._api.farmer, harvester_id)
+    peer = next(iter(harvester_service._server.all_connections.values()))
+
+    # with no prefix bits every plot passes the filter, and is looked up
+    sp = harvester_protocol.NewSignagePointHarvester(
+        std_hash(b"1"), uint64(1), uint64(1000000), uint8(2), std_hash(b"2"), [], uint8(0)
+    )
+    await harvester_service._api.new_signage_point_harvester(sp, peer)
+
+    disks = await harvester_rpc_client.get_disk_metrics()
+    assert len(disks) > 0
+    assert sum(disk["plot_count"] for disk in disks) == harvester_service._node.plot_manager.plot_count()
+    for disk in disks:
+        latency = disk["latency"]
+        assert disk["pending"] == 0
+        assert latency["count"] == sum(latency["counts"]) >= disk["plot_count"]
+        assert len(latency["counts"]) == len(latency["buckets"]) + 1
+        assert latency["max_seconds"] <= latency["total_seconds"]
+
+
 @pytest.mark.anyio
 @pytest.mark.skip("This test causes hangs occasionally. TODO: fix this.")
 async def test_harvester_add_plot_directory(harvester_farmer_environment: HarvesterFarmerEnvironment) -> None:
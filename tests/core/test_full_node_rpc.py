@@ -9,6 +9,7 @@ from clvm.casts import int_to_bytes
 
 from chia.consensus.block_record import BlockRecord
 from chia.consensus.pot_iterations import is_overflow_block
+from chia.full_node.block_store import BLOCK_CACHE_BLOCKS, BLOCK_CACHE_SIZE
 from chia.full_node.signage_point import SignagePoint
 from chia.protocols import full_node_protocol
 from chia.rpc.full_node_rpc_api import get_average_block_time, get_nearest_transaction_block
@@ -752,3 +753,39 @@ async def test_coin_name_found_in_mempool(one_node, self_hostname):
     finally:
         client.close()
         await client.await_closed()
+
+
+@pytest.mark.anyio
+async def test_get_cache_metrics(one_node, self_hostname):
+    [full_node_service], _, bt = one_node
+    full_node_api = full_node_service._api
+
+    try:
+        client = await FullNodeRpcClient.create(
+            self_hostname,
+            full_node_service.rpc_server.listen_port,
+            full_node_service.root_path,
+            full_node_service.config,
+        )
+
+        blocks = bt.get_consecutive_blocks(3)
+        for block in blocks:
+            await full_node_api.full_node.add_block(block)
+        await client.get_block(blocks[-1].header_hash)
+
+        response = await client.fetch("get_cache_metrics", {})
+        metrics = response["metrics"]
+        assert metrics["block_store_blocks"]["entries"] == 3
+        assert metrics["block_store_blocks"]["hits"] > 0
+        # every block weighs at least its share of the cache, so it doesn't hold more than BLOCK_CACHE_BLOCKS
+        assert metrics["block_store_blocks"]["weight"] >= 3 * (BLOCK_CACHE_SIZE // BLOCK_CACHE_BLOCKS)
+        assert set(metrics["coin_store_unspent"].keys()) == {"entries", "weight", "capacity", "hits", "misses"}
+        assert "hits" in metrics["block_store_generators"]
+        # the pairing cache doesn't count its hits, misses and evictions, its lookups are the hot path
+        assert set(metrics["bls_pairings"].keys()) == {"entries", "weight", "capacity"}
+
+        response = await client.fetch("get_pairing_cache_metrics", {})
+        assert set(response["metrics"].keys()) == {"slots", "full_node", "block_validation", "mempool"}
+    finally:
+        client.close()
+        await client.await_closed()
@@ -1,10 +1,15 @@
 from __future__ import annotations
 
-from chia_rs import AugSchemeMPL, G1Element
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
 
+from chia_rs import AugSchemeMPL, G1Element, G2Element
+
+from chia.types.blockchain_format.sized_bytes import bytes48
 from chia.util import cached_bls
 from chia.util.hash import std_hash
 from chia.util.lru_cache import LRUCache
+from chia.util.shared_pairing_cache import SharedPairingCache
 
 
 def test_cached_bls():
@@ -55,3 +60,51 @@ def test_cached_bls_repeat_pk():
     assert AugSchemeMPL.aggregate_verify([G1Element.from_bytes(pk) for pk in pks], msgs, agg_sig)
 
     assert cached_bls.aggregate_verify(pks, msgs, agg_sig, force_cache=True)
+
+
+def verify_in_worker(pks: List[bytes48], msgs: List[bytes], sig: bytes) -> bool:
+    return cached_bls.aggregate_verify(pks, msgs, G2Element.from_bytes(sig), True)
+
+
+def test_shared_pairing_cache():
+    n_keys = 10
+    sks = [AugSchemeMPL.key_gen(b"b" * 31 + bytes([i])) for i in range(n_keys)]
+    pks = [bytes48(sk.get_g1()) for sk in sks]
+    msgs = [("msg-%d" % (i,)).encode() for i in range(n_keys)]
+    agg_sig = AugSchemeMPL.aggregate([AugSchemeMPL.sign(sk, msg) for sk, msg in zip(sks, msgs)])
+
+    cache = SharedPairingCache.create(1000)
+    try:
+        # the pairings are computed and cached by the worker process
+        with ProcessPoolExecutor(
+            max_workers=1, initializer=cached_bls.init_worker, initargs=("test_worker", cache.name, "mempool")
+        ) as pool:
+            assert pool.submit(verify_in_worker, pks, msgs, bytes(agg_sig)).result()
+        metrics = cache.get_metrics()
+        assert metrics["mempool"]["misses"] == n_keys
+        assert metrics["mempool"]["hits"] == 0
+
+        for pk, msg in zip(pks, msgs):
+            assert cache.get(std_hash(pk + msg)) is not None
+        assert cached_bls.aggregate_verify(pks, msgs, agg_sig, cache=cache)
+        metrics = cache.get_metrics()
+        assert metrics["full_node"]["hits"] == 2 * n_keys
+        assert metrics["full_node"]["misses"] == 0
+        assert metrics["full_node"]["hit_rate"] == 1.0
+
+        # a slot whose value doesn't match its checksum, e.g. because another
+        # process is writing to it, is a miss
+        key = std_hash(pks[0] + msgs[0])
+        offset = cache._slot_offset(key)
+        cache.shm.buf[offset + 40] ^= 1
+        assert cache.get(key) is None
+        # the miss is counted by this process, until it's added to the shared
+        # counters
+        assert cache.misses == 1
+        assert cache.get_metrics()["full_node"]["misses"] == 1
+        assert cache.misses == 0
+        # the signature still verifies
+        assert cached_bls.aggregate_verify(pks, msgs, agg_sig, cache=cache)
+        assert not cached_bls.aggregate_verify(pks[1:], msgs[1:], agg_sig, cache=cache)
+    finally:
+        cache.close()
@@ -1,8 +1,9 @@
 from __future__ import annotations
 
 import unittest
+from unittest.mock import patch
 
-from chia.util.lru_cache import LRUCache
+from chia.util.lru_cache import LRUCache, MeteredLRUCache
 
 
 class TestLRUCache(unittest.TestCase):
@@ -54,3 +55,73 @@ class TestLRUCache(unittest.TestCase):
         assert len(cache.cache) == 5
         assert cache.get(b"0") is None
         assert cache.get(b"1") == 1
+
+    def test_lru_cache_weights(self):
+        cache = MeteredLRUCache(10)
+
+        cache.put(b"0", 0, weight=4)
+        cache.put(b"1", 1, weight=4)
+        assert cache.weight == 8
+        cache.put(b"2", 2)
+        assert cache.weight == 9
+        assert cache.get(b"0") == 0
+        # evicts 1, the least recently used
+        cache.put(b"3", 3, weight=3)
+        assert cache.get(b"1") is None
+        assert cache.weight == 8
+        assert cache.evictions == 1
+        # replacing an entry replaces its weight
+        cache.put(b"0", 0, weight=1)
+        assert cache.weight == 5
+        # entries heavier than the capacity are not cached
+        cache.put(b"4", 4, weight=11)
+        assert cache.get(b"4") is None
+        assert len(cache) == 3
+        assert cache.pop(b"3") == 3
+        assert cache.weight == 2
+        cache.clear()
+        assert len(cache) == 0
+        assert cache.weight == 0
+
+    def test_lru_cache_ttl(self):
+        cache = MeteredLRUCache(5, ttl=10)
+        now = 1000.0
+        with patch("chia.util.lru_cache.time.monotonic", lambda: now):
+            cache.put(b"0", 0)
+            now += 5
+            cache.put(b"1", 1)
+            assert cache.get(b"0") == 0
+            now += 5
+            assert cache.get(b"0") is None
+            assert cache.get(b"1") == 1
+            now += 5
+            assert cache.get(b"1") is None
+            assert len(cache) == 0
+
+    def test_lru_cache_metrics(self):
+        cache = MeteredLRUCache(2)
+        cache.put(b"0", 0)
+        cache.put(b"1", 1)
+        cache.put(b"2", 2)
+        assert cache.get(b"0") is None
+        assert cache.get(b"1") == 1
+        assert cache.get(b"2") == 2
+        assert cache.get_metrics() == {
+            "entries": 2,
+            "weight": 2,
+            "capacity": 2,
+            "hits": 2,
+            "misses": 1,
+            "evictions": 1,
+        }
+        # a plain cache doesn't count anything
+        cache = LRUCache(2)
+        cache.put(b"0", 0)
+        assert cache.get(b"0") == 0
+        assert cache.get(b"1") is None
+        assert cache.get_metrics() == {"entries": 1, "weight": 1, "capacity": 2}
+        cache = MeteredLRUCache(2, ttl=10)
+        cache.put(b"0", 0)
+        assert cache.get(b"0") == 0
+        assert cache.get(b"1") is None
+        assert (cache.hits, cache.misses) == (1, 1)
@@ -3,7 +3,7 @@ from __future__ import annotations
 import io
 import re
 from dataclasses import dataclass, field, fields
-from typing import Any, Callable, Dict, List, Optional, Tuple, Type, get_type_hints
+from typing import Any, Callable, ClassVar, Dict, List, Optional, Tuple, Type, get_type_hints
 
 import pytest
 from chia_rs import G1Element
@@ -17,6 +17,7 @@ from chia.types.blockchain_format.program import Program
 from chia.types.blockchain_format.sized_bytes import bytes4, bytes32
 from chia.types.full_block import FullBlock
 from chia.types.weight_proof import SubEpochChallengeSegment
+from chia.util.hash import std_hash
 from chia.util.ints import uint8, uint32, uint64
 from chia.util.streamable import (
     ConversionError,
@@ -27,6 +28,7 @@ from chia.util.streamable import (
     Streamable,
     UnsupportedType,
     function_to_parse_one_item,
+    function_to_parse_view_one_item,
     function_to_stream_one_item,
     is_type_List,
     is_type_SpecificOptional,
@@ -473,6 +475,73 @@ def test_basic() -> None:
     assert a == TestClass.from_bytes(b)
 
 
+@streamable
+@dataclass(frozen=True)
+class ParseViewInner(Streamable):
+    a: Program
+    b: bytes4
+
+
+@streamable
+@dataclass(frozen=True)
+class ParseViewOuter(Streamable):
+    a: Optional[ParseViewInner]
+    b: List[ParseViewInner]
+    c: Tuple[bool, str, G1Element]
+
+
+def test_parse_view() -> None:
+    inner = ParseViewInner(Program.to([1, 2, 3]), bytes4(b"1234"))
+    a = ParseViewOuter(inner, [inner, inner], (True, "hello", G1Element()))
+    b = bytes(a)
+    assert a == ParseViewOuter.from_bytes(b)
+    assert a == ParseViewOuter.from_bytes_unchecked(b)
+
+    # parsing starts at the offset, and returns where the object ended
+    buf = memoryview(b"\x01\x02" + b + b"\x03")
+    parsed, pos = ParseViewOuter.parse_view(buf, 2)
+    assert parsed == a
+    assert pos == len(b) + 2
+
+    with pytest.raises(AssertionError):
+        ParseViewOuter.from_bytes_unchecked(b + b"\x00")
+
+
+@streamable
+@dataclass(frozen=True)
+class CachedBytes(Streamable):
+    a: uint32
+    b: List[bytes32]
+
+    _streamable_cache_bytes: ClassVar[bool] = True
+
+
+@streamable
+@dataclass(frozen=True)
+class CachedBytesOuter(Streamable):
+    a: CachedBytes
+    b: Optional[CachedBytes]
+
+
+def test_cached_bytes() -> None:
+    a = CachedBytes(uint32(1), [bytes32([2] * 32)])
+    b = bytes(a)
+    assert b == bytes(uint32(1)) + bytes(uint32(1)) + bytes32([2] * 32)
+    # the second time, we get the cached bytes
+    assert bytes(a) is b
+    assert a.get_hash() is a.get_hash()
+    assert a.get_hash() == std_hash(b)
+
+    # the cache doesn't affect comparisons or the json representation
+    assert a == CachedBytes.from_bytes(b)
+    assert a.to_json_dict() == CachedBytes.from_bytes(b).to_json_dict()
+
+    # nor the serialization of the objects containing it
+    outer = CachedBytesOuter(a, None)
+    assert bytes(outer) == b + bytes([0])
+    assert CachedBytesOuter.from_bytes(bytes(outer)) == outer
+
+
 def test_variable_size() -> None:
     @streamable
     @dataclass(frozen=True)
@@ -871,6 +940,9 @@ def test_streamable_inheritance_missing() -> None:
         (function_to_parse_one_item, float),
         (function_to_parse_one_item, int),
         (function_to_parse_one_item, dict),
+        (function_to_parse_view_one_item, float),
+        (function_to_parse_view_one_item, int),
+        (function_to_parse_view_one_item, dict),
         (function_to_stream_one_item, float),
         (function_to_stream_one_item, int),
         (function_to_stream_one_item, dict),
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import pytest
+
+from chia.harvester.disk_scheduler import LATENCY_BUCKETS, DiskScheduler, LatencyHistogram
+
+
+def test_latency_histogram() -> None:
+    histogram = LatencyHistogram()
+    for seconds in [0.01, 0.05, 0.07, 3.0, 100.0]:
+        histogram.record(seconds)
+    assert histogram.count() == 5
+    assert histogram.counts[0] == 2
+    assert histogram.counts[1] == 1
+    assert histogram.counts[LATENCY_BUCKETS.index(4.0)] == 1
+    assert histogram.counts[-1] == 1
+    assert histogram.max_seconds == 100.0
+    json_dict = histogram.to_json_dict()
+    assert json_dict["count"] == 5
+    assert len(json_dict["counts"]) == len(json_dict["buckets"]) + 1
+
+
+@pytest.mark.anyio
+async def test_concurrency_limit_per_disk() -> None:
+    lock = threading.Lock()
+    active: Dict[int, int] = {}
+    max_active: Dict[int, int] = {}
+
+    def lookup(device: int) -> int:
+        with lock:
+            active[device] = active.get(device, 0) + 1
+            max_active[device] = max(max_active.get(device, 0), active[device])
+        time.sleep(0.01)
+        with lock:
+            active[device] -= 1
+        return device
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        scheduler = DiskScheduler(executor, 2)
+        results = await asyncio.gather(*(scheduler.run(i % 3, lookup, i % 3) for i in range(30)))
+
+    assert results == [i % 3 for i in range(30)]
+    assert max_active == {0: 2, 1: 2, 2: 2}
+    metrics = scheduler.get_metrics()
+    assert [disk["device"] for disk in metrics] == [0, 1, 2]
+    for disk in metrics:
+        assert disk["pending"] == 0
+        assert disk["latency"]["count"] == 10
+
+
+@pytest.mark.anyio
+async def test_slow_disk_does_not_block_others() -> None:
+    slow_disk_released = threading.Event()
+    finished: List[int] = []
+
+    def lookup(device: int) -> None:
+        if device == 0:
+            slow_disk_released.wait(timeout=10)
+        finished.append(device)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        scheduler = DiskScheduler(executor, 2)
+        slow = [asyncio.create_task(scheduler.run(0, lookup, 0)) for _ in range(10)]
+        await asyncio.wait_for(asyncio.gather(*(scheduler.run(1, lookup, 1) for _ in range(10))), timeout=5)
+        assert finished == [1] * 10
+        assert scheduler.get_metrics()[0]["pending"] == 10
+        slow_disk_released.set()
+        await asyncio.gather(*slow)
+
+    assert finished.count(0) == 10
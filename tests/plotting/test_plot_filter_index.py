@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import random
+from pathlib import Path
+from typing import Dict
+
+import pytest
+
+from chia.plotting.plot_filter_index import PlotFilterIndex
+from chia.types.blockchain_format.proof_of_space import passes_plot_filter
+from chia.types.blockchain_format.sized_bytes import bytes32
+
+
+def random_bytes32(rng: random.Random) -> bytes32:
+    return bytes32(rng.getrandbits(256).to_bytes(32, "big"))
+
+
+@pytest.mark.parametrize("prefix_bits", [0, 1, 5, 8, 9, 12])
+def test_eligible_plots(prefix_bits: int) -> None:
+    rng = random.Random(prefix_bits)
+    index = PlotFilterIndex()
+    plot_ids: Dict[Path, bytes32] = {}
+    for i in range(2000):
+        path = Path(f"plot-{i}.plot")
+        plot_ids[path] = random_bytes32(rng)
+        index.add(path, plot_ids[path])
+    assert len(index) == len(plot_ids)
+    for _ in range(5):
+        challenge_hash = random_bytes32(rng)
+        sp_hash = random_bytes32(rng)
+        expected = {
+            path
+            for path, plot_id in plot_ids.items()
+            if passes_plot_filter(prefix_bits, plot_id, challenge_hash, sp_hash)
+        }
+        eligible = index.eligible_plots(prefix_bits, challenge_hash, sp_hash)
+        assert len(eligible) == len(expected)
+        assert set(eligible) == expected
+
+
+def test_add_remove_clear() -> None:
+    rng = random.Random(1)
+    index = PlotFilterIndex()
+    paths = [Path(f"plot-{i}.plot") for i in range(10)]
+    for path in paths:
+        index.add(path, random_bytes32(rng))
+    assert len(index) == 10
+    # adding an existing path updates its plot id
+    index.add(paths[3], random_bytes32(rng))
+    assert len(index) == 10
+    index.remove(paths[0])
+    index.remove(paths[5])
+    index.remove(paths[9])
+    # removing a path which isn't indexed is fine
+    index.remove(paths[9])
+    index.remove(Path("unknown.plot"))
+    remaining = [path for i, path in enumerate(paths) if i not in {0, 5, 9}]
+    assert len(index) == len(remaining)
+    assert sorted(index.eligible_plots(0, random_bytes32(rng), random_bytes32(rng))) == sorted(remaining)
+    index.clear()
+    assert len(index) == 0
+    assert index.eligible_plots(0, random_bytes32(rng), random_bytes32(rng)) == []
@@ -30,6 +30,7 @@ async def create_blockchain(
             yield bc1, wrapper
         finally:
             bc1.shut_down()
+            bc1.close()
 
 
 def persistent_blocks(
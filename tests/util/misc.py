@@ -50,7 +50,7 @@ from chia_rs import Coin
 
 import chia
 import tests
-from chia.full_node.mempool import Mempool
+from chia.full_node.mempool import Mempool, MempoolBase, SortedMempool
 from chia.types.blockchain_format.sized_bytes import bytes32
 from chia.types.condition_opcodes import ConditionOpcode
 from chia.util.hash import std_hash
@@ -484,7 +484,17 @@ def create_logger(file: TextIO = sys.stdout) -> logging.Logger:
     return logger
 
 
-def invariant_check_mempool(mempool: Mempool) -> None:
+def invariant_check_mempool(mempool: MempoolBase) -> None:
+    if isinstance(mempool, SortedMempool):
+        assert mempool._total_cost == sum(e.cost for e in mempool._entries.values())
+        assert mempool._total_fee == sum(e.fee for e in mempool._entries.values())
+        assert len(mempool._by_feerate) == len(mempool._entries) == len(mempool._items)
+        for name, entry in mempool._entries.items():
+            for coin_id in entry.spent_coin_ids:
+                assert name in mempool._by_coin_id[coin_id]
+        return
+
+    assert isinstance(mempool, Mempool)
     with mempool._db_conn:
         cursor = mempool._db_conn.execute("SELECT SUM(cost) FROM tx")
         val = cursor.fetchone()[0]
@@ -384,6 +384,96 @@ async def test_get_balance(wallet_rpc_environment: WalletRpcTestEnvironment):
     await assert_get_balance(wallet_rpc_client, wallet_node, cat_wallet)
 
 
+@pytest.mark.limit_consensus_modes(allowed=[ConsensusMode.PLAIN, ConsensusMode.HARD_FORK_2_0], reason="save time")
+@pytest.mark.anyio
+async def test_get_state_deltas(
+    wallet_rpc_environment: WalletRpcTestEnvironment, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    env = wallet_rpc_environment
+    wallet_node: WalletNode = env.wallet_1.node
+    full_node_api: FullNodeSimulator = env.full_node.api
+    client: WalletRpcClient = env.wallet_1.rpc_client
+
+    await generate_funds(full_node_api, env.wallet_1)
+    # without a cursor, only the current one is returned
+    start = await client.get_state_deltas()
+    assert start["deltas"] == [] and not start["reset"]
+    stream_id = start["stream_id"]
+
+    addr = encode_puzzle_hash(await env.wallet_2.wallet.get_new_puzzlehash(), "txch")
+    tx = await client.send_transaction(1, uint64(15600000), addr, DEFAULT_TX_CONFIG)
+    pending = await client.get_state_deltas(start["cursor"], stream_id)
+    assert not pending["reset"]
+    assert [delta["seq"] for delta in pending["deltas"]] == list(range(start["cursor"] + 1, pending["cursor"] + 1))
+    assert {"type": "transaction_added", "transaction_id": "0x" + tx.name.hex()}.items() <= pending["deltas"][0].items()
+    assert pending["deltas"][-1]["type"] == "balance"
+    assert pending["deltas"][-1]["balance"] == (await wallet_node.get_balance(uint32(1))).to_json_dict()
+
+    assert tx.spend_bundle is not None
+    await farm_transaction(full_node_api, wallet_node, tx.spend_bundle)
+    confirmed = await client.get_state_deltas(pending["cursor"], stream_id)
+    types = [delta["type"] for delta in confirmed["deltas"]]
+    assert "transaction_confirmed" in types and "coin_spent" in types and "coin_added" in types
+    spent = {delta["coin_id"] for delta in confirmed["deltas"] if delta["type"] == "coin_spent"}
+    assert spent == {"0x" + coin.name().hex() for coin in tx.removals}
+
+    # the same deltas can be fetched again, from the earlier cursor
+    assert (await client.get_state_deltas(start["cursor"], stream_id))["deltas"] == (
+        pending["deltas"] + confirmed["deltas"]
+    )
+    # nothing changed since the last cursor
+    assert (await client.get_state_deltas(confirmed["cursor"], stream_id))["deltas"] == []
+    # a cursor from another stream, or one that is not known yet, has to start over
+    assert (await client.get_state_deltas(start["cursor"], "00" * 32))["reset"]
+    assert (await client.get_state_deltas(confirmed["cursor"] + 1, stream_id))["reset"]
+
+    # the state changes of the wallet push the deltas to the daemon
+    rpc_server: Optional[RpcServer] = env.wallet_1.service.rpc_server
+    assert rpc_server is not None
+    rpc_api = cast(WalletRpcApi, rpc_server.rpc_api)
+    state_deltas = rpc_api.state_deltas
+    assert state_deltas is not None
+    diff = state_deltas._diff
+    diffed: List[int] = []
+
+    async def counting_diff(wallet_id: int, snapshot: Any) -> List[Dict[str, Any]]:
+        diffed.append(wallet_id)
+        return await diff(wallet_id, snapshot)
+
+    await generate_funds(full_node_api, env.wallet_1)
+    monkeypatch.setattr(state_deltas, "_diff", counting_diff)
+    # a burst of events is covered by the update the first one starts, and the one after it
+    payload_lists = await asyncio.gather(
+        *(rpc_api._state_changed("coin_added", {"state": "coin_added", "wallet_id": 1}) for _ in range(5))
+    )
+    assert diffed == [1, 1]
+    pushed = [
+        payload for payloads in payload_lists for payload in payloads if payload["destination"] == "wallet_deltas"
+    ]
+    assert len(pushed) == 1
+    assert pushed[0]["command"] == "state_deltas"
+    assert pushed[0]["data"]["deltas"][0]["seq"] == confirmed["cursor"] + 1
+    assert (await client.get_state_deltas(confirmed["cursor"], stream_id))["cursor"] == pushed[0]["data"]["cursor"]
+
+    # the balance also depends on the derivation paths, a change of them alone makes it be compared again
+    snapshot = state_deltas._snapshots[1]
+    await diff(1, snapshot)
+    snapshot.balance = None
+    assert await diff(1, snapshot) == []
+    wallet_node.wallet_state_manager.puzzle_store.generations.bump(1)
+    assert [delta["type"] for delta in await diff(1, snapshot)] == ["balance"]
+
+    # while the wallet syncs, the balance isn't recorded, all of the wallets are compared again once it's done
+    snapshot.balance = None
+    wallet_node.wallet_state_manager.puzzle_store.generations.bump(1)
+    wallet_node.wallet_state_manager._sync_target = uint32(1000)
+    assert await diff(1, snapshot) == []
+    assert snapshot.balance is None
+    wallet_node.wallet_state_manager._sync_target = None
+    assert [delta["type"] for delta in await state_deltas.changed(None)] == ["balance"]
+    assert snapshot.balance is not None
+
+
 @pytest.mark.limit_consensus_modes(allowed=[ConsensusMode.PLAIN, ConsensusMode.HARD_FORK_2_0], reason="save time")
 @pytest.mark.anyio
 async def test_get_farmed_amount(wallet_rpc_environment: WalletRpcTestEnvironment):
@@ -1668,6 +1758,12 @@ async def test_key_and_address_endpoints(wallet_rpc_environment: WalletRpcTestEn
 
     assert (await client.get_height_info()) > 0
 
+    metrics = (await client.fetch("get_cache_metrics", {}))["metrics"]
+    assert "hits" in metrics["coin_store_total_count"]
+    assert "hits" in metrics["puzzle_store_wallet_identifier"]
+    for peer_metrics in metrics["peer_requests"].values():
+        assert "entries" in peer_metrics["blocks"]
+
     ph = await wallet.get_new_puzzlehash()
     addr = encode_puzzle_hash(ph, "txch")
     tx_amount = uint64(15600000)
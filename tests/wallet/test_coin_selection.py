@@ -13,6 +13,7 @@ from chia.types.blockchain_format.sized_bytes import bytes32
 from chia.util.hash import std_hash
 from chia.util.ints import uint32, uint64, uint128
 from chia.wallet.coin_selection import (
+    UnspentCoinIndex,
     check_for_exact_match,
     knapsack_coin_algorithm,
     select_coins,
@@ -587,3 +588,46 @@ class TestCoinSelection:
                 logging.getLogger("test"),
                 target_amount,
             )
+
+    def test_unspent_coin_index(self, a_hash: bytes32) -> None:
+        coin_amounts = [3, 320, 6, 20, 160, 20, 150, 80, 1]
+        coin_list: List[WalletCoinRecord] = [
+            WalletCoinRecord(
+                Coin(a_hash, std_hash(bytes([i])), uint64(a)), uint32(1), uint32(1), False, True, WalletType(0), 1
+            )
+            for i, a in enumerate(coin_amounts)
+        ]
+        index = UnspentCoinIndex.from_records(coin_list)
+        assert len(index) == len(coin_list)
+        assert index.total == sum(coin_amounts)
+        assert [record.coin.amount for record in index.records] == sorted(coin_amounts, reverse=True)
+        assert index.by_name == {record.name(): record for record in coin_list}
+
+        def amounts(records: List[WalletCoinRecord]) -> List[int]:
+            return [record.coin.amount for record in records]
+
+        assert amounts(index.largest(3)) == [320, 160, 150]
+        assert amounts(index.largest(100)) == sorted(coin_amounts, reverse=True)
+        assert amounts(index.largest(0)) == []
+        # the bounds are inclusive
+        assert amounts(index.largest(3, max_amount=150)) == [150, 80, 20]
+        assert amounts(index.largest(10, min_amount=20, max_amount=159)) == [150, 80, 20, 20]
+        assert amounts(index.largest(10, min_amount=321)) == []
+        assert amounts(index.largest(10, max_amount=0)) == []
+        assert amounts(index.largest(4, excluded_amounts={160, 80})) == [320, 150, 20, 20]
+        excluded = {coin_list[1].name(), coin_list[3].name()}
+        assert amounts(index.largest(3, excluded_coin_ids=excluded)) == [160, 150, 80]
+        assert amounts(index.largest(10, excluded_coin_ids=excluded, min_amount=20)) == [160, 150, 80, 20]
+
+        # coins are added and removed in place, the index stays sorted
+        index.remove(coin_list[1].name())
+        index.remove(coin_list[1].name())
+        new_record = WalletCoinRecord(
+            Coin(a_hash, std_hash(b"new"), uint64(20)), uint32(2), uint32(0), False, False, WalletType(0), 1
+        )
+        index.add(new_record)
+        index.add(new_record)
+        expected = [r for r in coin_list if r != coin_list[1]] + [new_record]
+        assert index == UnspentCoinIndex.from_records(sorted(expected, key=lambda r: r.coin.amount, reverse=True))
+        assert amounts(index.largest(3)) == [160, 150, 80]
+        assert index.total == sum(coin_amounts) - 320 + 20
@@ -266,6 +266,55 @@ async def test_get_unspent_coins_for_wallet() -> None:
         assert await store.get_unspent_coins_for_wallet(1, coin_type=CoinType.CLAWBACK) == {record_8}
 
 
+@pytest.mark.anyio
+async def test_get_unspent_coin_index() -> None:
+    async with DBConnection(1) as db_wrapper:
+        store = await WalletCoinStore.create(db_wrapper)
+
+        async def assert_index_matches_store() -> None:
+            index = await store.get_unspent_coin_index(0)
+            records = await store.get_unspent_coins_for_wallet(0)
+            assert set(index.by_name) == {record.name() for record in records}
+            assert index.total == sum(record.coin.amount for record in records)
+            assert [record.coin.amount for record in index.records] == sorted(
+                (record.coin.amount for record in records), reverse=True
+            )
+
+        for record in [record_1, record_2, record_4, record_5]:
+            await store.add_coin_record(record)
+        index = await store.get_unspent_coin_index(0)
+        await assert_index_matches_store()
+        assert set(index.by_name) == {coin_1.name(), coin_2.name()}
+
+        # the index is kept up to date by the writes, rather than loaded again
+        await store.set_spent(coin_1.name(), uint32(12))
+        await store.add_coin_record(record_3)
+        await store.add_coin_record(replace(record_8, coin_type=CoinType.NORMAL, wallet_id=0))
+        assert await store.get_unspent_coin_index(0) is index
+        await assert_index_matches_store()
+        # coin_4 and coin_1 are unspent again
+        await store.rollback_to_block(11)
+        await assert_index_matches_store()
+        assert coin_4.name() in index.by_name
+        await store.delete_coin_record(coin_4.name())
+        await assert_index_matches_store()
+        await store.rollback_to_block(4)
+        assert await store.get_unspent_coin_index(0) is index
+        await assert_index_matches_store()
+        assert set(index.by_name) == {coin_1.name(), coin_8.name()}
+
+        # a write that's rolled back drops the index
+        with pytest.raises(ValueError):
+            async with db_wrapper.writer():
+                await store.add_coin_record(record_2)
+                raise ValueError()
+        assert await store.get_unspent_coin_index(0) is not index
+        await assert_index_matches_store()
+
+        await store.delete_wallet(uint32(0))
+        await assert_index_matches_store()
+
+
 @pytest.mark.anyio
 async def test_get_all_unspent_coins() -> None:
     async with DBConnection(1) as db_wrapper:
@@ -6,14 +6,14 @@ import sys
 import time
 import types
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, List, Optional
 
 import pytest
 
 from chia.protocols import wallet_protocol
 from chia.protocols.protocol_message_types import ProtocolMessageTypes
 from chia.protocols.wallet_protocol import CoinState
-from chia.server.outbound_message import Message, make_msg
+from chia.server.outbound_message import Message, NodeType, make_msg
 from chia.simulator.block_tools import test_constants
 from chia.types.blockchain_format.sized_bytes import bytes32
 from chia.types.full_block import FullBlock
@@ -25,7 +25,10 @@ from chia.util.errors import Err
 from chia.util.ints import uint8, uint32, uint64, uint128
 from chia.util.keychain import Keychain, KeyData, generate_mnemonic
 from chia.util.misc import to_batches
+from chia.wallet.util.peer_request_cache import PeerRequestCache
 from chia.wallet.util.tx_config import DEFAULT_TX_CONFIG
+from chia.wallet.util.wallet_types import WalletType
+from chia.wallet.wallet_coin_record import WalletCoinRecord
 from chia.wallet.wallet_node import Balance, WalletNode
 from tests.conftest import ConsensusMode
 from tests.util.misc import CoinGenerator
@@ -470,6 +473,110 @@ async def test_get_balance(
     assert await wallet_node.get_balance(wallet_id) == expected_more_balance
 
 
+@pytest.mark.limit_consensus_modes(reason="consensus rules irrelevant")
+@pytest.mark.anyio
+async def test_get_balance_cached(simulator_and_wallet: OldSimulatorsAndWallets, self_hostname: str) -> None:
+    [full_node_api], [(wallet_node, wallet_server)], bt = simulator_and_wallet
+    await wallet_server.start_client(PeerInfo(self_hostname, full_node_api.full_node.server.get_port()), None)
+    wallet = wallet_node.wallet_state_manager.main_wallet
+    wallet_id = wallet.id()
+    generated_funds = await full_node_api.farm_blocks_to_wallet(2, wallet)
+    balance = await wallet_node.get_balance(wallet_id)
+    assert balance.confirmed_wallet_balance == generated_funds
+    assert wallet_id in wallet_node._balance_cache_keys
+
+    # make sure the cached balance is used as long as nothing changes
+    stale_balance = dataclasses.replace(balance, confirmed_wallet_balance=uint128(1))
+    wallet_node._balance_cache[wallet_id] = stale_balance
+    wallet_node.config["testing"] = False
+    assert await wallet_node.get_balance(wallet_id) == stale_balance
+    # the consistency check, which is enabled in tests, catches it
+    wallet_node.config["testing"] = True
+    with pytest.raises(RuntimeError, match="out of date"):
+        await wallet_node.get_balance(wallet_id)
+
+    # a new transaction changes the unconfirmed balance
+    [tx] = await wallet.generate_signed_transaction(uint64(10), bytes32(b"\0" * 32), DEFAULT_TX_CONFIG, fee=uint64(5))
+    await wallet_node.wallet_state_manager.add_pending_transactions([tx])
+    balance = await wallet_node.get_balance(wallet_id)
+    assert balance.confirmed_wallet_balance == generated_funds
+    assert balance.unconfirmed_wallet_balance == generated_funds - 15
+    assert balance.pending_coin_removal_count == len(tx.removals)
+
+    # resending it, and writes to the records of other wallets, don't change anything the balance depends on
+    key = wallet_node._balance_cache_key(wallet_id)
+    wallet_state_manager = wallet_node.wallet_state_manager
+    assert await wallet_state_manager.tx_store.increment_sent(tx.name, "peer", MempoolInclusionStatus.SUCCESS, None)
+    await wallet_state_manager.coin_store.add_coin_record(
+        WalletCoinRecord(CoinGenerator().get().coin, uint32(1), uint32(0), False, False, WalletType.CAT, wallet_id + 1)
+    )
+    assert wallet_node._balance_cache_key(wallet_id) == key
+    assert await wallet_node.get_balance(wallet_id) == balance
+
+    # and so does confirming it
+    await full_node_api.process_transaction_records([tx])
+    await full_node_api.wait_for_wallet_synced(wallet_node)
+    balance = await wallet_node.get_balance(wallet_id)
+    assert balance.confirmed_wallet_balance == generated_funds - 15
+    assert balance.unconfirmed_wallet_balance == generated_funds - 15
+    assert balance.pending_coin_removal_count == 0
+
+
+@pytest.mark.limit_consensus_modes(reason="consensus rules irrelevant")
+@pytest.mark.anyio
+async def test_prefetch_state_validation_data(
+    simulator_and_wallet: OldSimulatorsAndWallets, self_hostname: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    [full_node_api], [(wallet_node, wallet_server)], _ = simulator_and_wallet
+    await wallet_server.start_client(PeerInfo(self_hostname, full_node_api.full_node.server.get_port()), None)
+    wallet = wallet_node.wallet_state_manager.main_wallet
+    await full_node_api.farm_blocks_to_wallet(3, wallet)
+    [tx] = await wallet.generate_signed_transaction(uint64(10), bytes32(b"\0" * 32), DEFAULT_TX_CONFIG)
+    await wallet_node.wallet_state_manager.add_pending_transactions([tx])
+    await full_node_api.process_transaction_records([tx])
+    await full_node_api.wait_for_wallet_synced(wallet_node)
+
+    coin_records = (await wallet_node.wallet_state_manager.coin_store.get_coin_records()).records
+    coin_states = [
+        CoinState(
+            record.coin,
+            None if record.spent_block_height == 0 else record.spent_block_height,
+            record.confirmed_block_height,
+        )
+        for record in coin_records
+    ]
+    created_heights = {uint32(record.confirmed_block_height) for record in coin_records}
+    heights = created_heights | {uint32(record.spent_block_height) for record in coin_records if record.spent}
+    assert len(coin_states) > len(created_heights) > 1
+    assert any(record.spent for record in coin_records)
+
+    [peer] = wallet_node.server.get_connections(NodeType.FULL_NODE)
+    requests: List[str] = []
+    call_api = peer.call_api
+
+    async def recording_call_api(request_method: Any, message: Any, timeout: int = 60) -> Any:
+        requests.append(request_method.__name__)
+        return await call_api(request_method, message, timeout)
+
+    monkeypatch.setattr(peer, "call_api", recording_call_api)
+    cache = PeerRequestCache()
+    await wallet_node.prefetch_state_validation_data(coin_states, peer, cache, None)
+    # the blocks are requested in ranges, and the additions once per block
+    num_ranges = len({height // 32 for height in heights})
+    assert sorted(requests) == ["request_additions"] * len(created_heights) + ["request_block_headers"] * num_ranges
+    for record in coin_records:
+        block = cache.get_block(uint32(record.confirmed_block_height))
+        assert block is not None
+        assert cache.in_additions_in_block(block.header_hash, record.coin.puzzle_hash)
+        if record.spent:
+            assert cache.get_block(uint32(record.spent_block_height)) is not None
+
+    # everything is cached now
+    requests.clear()
+    await wallet_node.prefetch_state_validation_data(coin_states, peer, cache, None)
+    assert requests == []
+
+
 @pytest.mark.anyio
 async def test_add_states_from_peer_reorg_failure(
     simulator_and_wallet: OldSimulatorsAndWallets, self_hostname: str, caplog: pytest.LogCaptureFixture
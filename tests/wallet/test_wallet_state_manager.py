@@ -1,7 +1,8 @@
 from __future__ import annotations
 
+from concurrent.futures.process import ProcessPoolExecutor
 from contextlib import asynccontextmanager
-from typing import AsyncIterator
+from typing import Any, AsyncIterator, Dict, List
 
 import pytest
 
@@ -11,6 +12,7 @@ from chia.types.blockchain_format.coin import Coin
 from chia.types.blockchain_format.sized_bytes import bytes32
 from chia.types.peer_info import PeerInfo
 from chia.util.ints import uint32, uint64
+from chia.wallet import wallet_state_manager as wallet_state_manager_module
 from chia.wallet.derivation_record import DerivationRecord
 from chia.wallet.derive_keys import master_sk_to_wallet_sk, master_sk_to_wallet_sk_unhardened
 from chia.wallet.util.wallet_types import WalletType
@@ -83,6 +85,44 @@ async def test_get_private_key_failure(simulator_and_wallet: OldSimulatorsAndWal
         await wallet_state_manager.get_private_key(bytes32(b"1" * 32))
 
 
+@pytest.mark.parametrize("use_pool", [True, False])
+@pytest.mark.anyio
+async def test_create_more_puzzle_hashes(
+    simulator_and_wallet: OldSimulatorsAndWallets, monkeypatch: pytest.MonkeyPatch, use_pool: bool
+) -> None:
+    _, [(wallet_node, _)], _ = simulator_and_wallet
+    wallet_state_manager: WalletStateManager = wallet_node.wallet_state_manager
+    shutdowns: List[Dict[str, Any]] = []
+    if use_pool:
+        monkeypatch.setattr(wallet_state_manager_module, "DERIVATION_POOL_MIN_KEYS", 10)
+        monkeypatch.setattr(wallet_state_manager_module, "DERIVATION_POOL_BATCH_SIZE", 7)
+        shutdown = ProcessPoolExecutor.shutdown
+
+        def record_shutdown(pool: ProcessPoolExecutor, **kwargs: Any) -> None:
+            shutdowns.append(kwargs)
+            shutdown(pool, **kwargs)
+
+        monkeypatch.setattr(ProcessPoolExecutor, "shutdown", record_shutdown)
+    monkeypatch.setattr(wallet_state_manager_module, "DERIVATION_RECORDS_BATCH_SIZE", 30)
+    last = await wallet_state_manager.puzzle_store.get_last_derivation_path()
+    assert last is not None
+    await wallet_state_manager.create_more_puzzle_hashes(num_additional_phs=100)
+    # the pool is shut down without blocking the event loop on its workers
+    assert shutdowns == ([{"wait": False, "cancel_futures": True}] if use_pool else [])
+    new_last = await wallet_state_manager.puzzle_store.get_last_derivation_path()
+    assert new_last is not None and new_last > last + 50
+
+    wallet = wallet_state_manager.main_wallet
+    for index in [0, last, last + 1, last + 7, new_last]:
+        for hardened in [True, False]:
+            conversion_method = master_sk_to_wallet_sk if hardened else master_sk_to_wallet_sk_unhardened
+            pubkey = conversion_method(wallet_state_manager.private_key, uint32(index)).get_g1()
+            record = await wallet_state_manager.puzzle_store.get_derivation_record(uint32(index), wallet.id(), hardened)
+            assert record is not None
+            assert record.pubkey == pubkey
+            assert record.puzzle_hash == wallet.puzzle_hash_for_pk(pubkey)
+
+
 @pytest.mark.anyio
 async def test_determine_coin_type(simulator_and_wallet: OldSimulatorsAndWallets, self_hostname: str) -> None:
     full_nodes, wallets, _ = simulator_and_wallet